@@ -6,6 +6,8 @@ from .blueprints.web import web_bp
 from .blueprints.auth import auth_bp
 from .blueprints.chatbot import chatbot_bp
 from .blueprints.api import api_bp
+from .services import cart_expiry_service
+from . import sql_instrumentation, sqlite_profile
 
 
 def create_app(config_class=Config):
@@ -14,6 +16,8 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
 
     db.init_app(app)
+    sqlite_profile.init_app(app, db)
+    sql_instrumentation.init_app(app)
     login_manager.init_app(app)
     login_manager.login_message_category = "info"
 
@@ -66,4 +70,7 @@ def create_app(config_class=Config):
     app.register_blueprint(chatbot_bp, url_prefix="/chatbot")
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    if app.config.get("CART_SWEEPER_ENABLED"):
+        app.extensions["cart_sweeper"] = cart_expiry_service.start_cart_sweeper(app)
+
     return app
@@ -15,6 +15,10 @@ from .product_tools import get_product_info_executor
 
 from .user_tools import get_user_profile_info_executor
 
+# Tools that read only shared catalog data, never the signed-in user's. Agent
+# answers that used nothing else may be shared between users.
+CATALOG_TOOL_NAMES = frozenset({get_product_info_executor.__name__})
+
 
 def get_all_adk_tools():
     """
@@ -1,25 +1,31 @@
-from app.services import cart_service, product_service
+from google.adk.tools import ToolContext
 
+from app.services import cart_service, product_service, tool_cache_service
+from .context import get_session_user_id
+from .product_tools import product_not_found_message
 
-def add_item_to_cart_executor(user_id: int, product_name: str, quantity: int) -> str:
+
+def add_item_to_cart_executor(
+    tool_context: ToolContext, product_name: str, quantity: int
+) -> str:
     """
     Adds a specified quantity of a product to the user's shopping cart.
     Use this when the user explicitly asks to add something.
 
     Args:
-        user_id: The ID of the current user.
-        product_name: The name of the product to add (e.g., 'Apple', 'Banana'). Be specific.
+        product_name: The name of the product to add (e.g., 'Apple', 'Banana'). Close or partial names are matched to the nearest product.
         quantity: The number of units of the product to add.
 
     Returns:
         A string confirming the action or an error message.
     """
+    user_id = get_session_user_id(tool_context)
     if quantity <= 0:
         return "Please specify a positive quantity to add."
 
-    product = product_service.find_product_by_name(product_name)
+    product, suggestions = product_service.match_product(product_name)
     if not product:
-        return f"Sorry, I couldn't find a product named '{product_name}'."
+        return product_not_found_message(product_name, suggestions)
 
     try:
         message = cart_service.add_to_cart(user_id, product.id, quantity)
@@ -30,50 +36,56 @@ def add_item_to_cart_executor(user_id: int, product_name: str, quantity: int) ->
         return "An unexpected error occurred while trying to add the item to your cart."
 
 
-def view_cart_executor(user_id: int) -> str:
+def _format_cart(user_id: int) -> str:
+    items = cart_service.get_cart_contents(user_id)
+    if not items:
+        return "Your shopping cart is currently empty."
+
+    cart_details = ["Here's what's in your cart:"]
+    total_price = 0.0
+    for item in items:
+        item_total = item.quantity * item.product.price
+        cart_details.append(
+            f"- {item.quantity} x {item.product.name} (@ ₹{item.product.price:.2f} each) = ₹{item_total:.2f}"
+        )
+        total_price += item_total
+
+    cart_details.append(f"\nTotal: ₹{total_price:.2f}")
+    return "\n".join(cart_details)
+
+
+def view_cart_executor(tool_context: ToolContext) -> str:
     """
     Retrieves the user's cart contents and formats it as a string.
 
-    Args:
-        user_id: The ID of the current user.
-
     Returns:
         A string listing cart items or a message if the cart is empty.
     """
+    user_id = get_session_user_id(tool_context)
     try:
-        items = cart_service.get_cart_contents(user_id)
-        if not items:
-            return "Your shopping cart is currently empty."
-
-        cart_details = ["Here's what's in your cart:"]
-        total_price = 0.0
-        for item in items:
-            item_total = item.quantity * item.product.price
-            cart_details.append(
-                f"- {item.quantity} x {item.product.name} (@ ₹{item.product.price:.2f} each) = ₹{item_total:.2f}"
-            )
-            total_price += item_total
-
-        cart_details.append(f"\nTotal: ₹{total_price:.2f}")
-        return "\n".join(cart_details)
+        return tool_cache_service.cached_read(
+            user_id, "view_cart", (), lambda: _format_cart(user_id)
+        )
     except Exception:
         return "An unexpected error occurred while trying to view your cart."
 
 
-def remove_item_from_cart_executor(user_id: int, product_name: str) -> str:
+def remove_item_from_cart_executor(tool_context: ToolContext, product_name: str) -> str:
     """
     Removes an item entirely from the user's cart.
 
     Args:
-        user_id: The ID of the current user.
         product_name: The name of the product to remove.
 
     Returns:
         A string confirming the action or an error message.
     """
-    product = product_service.find_product_by_name(product_name)
+    user_id = get_session_user_id(tool_context)
+    product, suggestions = product_service.match_product(product_name)
     if not product:
-        return f"Sorry, I couldn't find a product named '{product_name}' in the system to remove."
+        return product_not_found_message(
+            product_name, suggestions, suffix=" in the system to remove"
+        )
 
     try:
         message = cart_service.remove_from_cart(user_id, product.id)
@@ -0,0 +1,21 @@
+from google.adk.tools import ToolContext
+
+
+def get_session_user_id(tool_context: ToolContext) -> int:
+    """
+    Returns the id of the signed-in user the current agent session belongs to.
+
+    The ADK session is opened by the server under the user's id, so tools never
+    take the user id from the model (or the prompt).
+    """
+    return int(tool_context.user_id)
+
+
+class ServerToolContext:
+    """
+    Stand-in for ToolContext when the server calls a tool executor directly
+    (see services/intent_service.py) instead of through the agent.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = str(user_id)
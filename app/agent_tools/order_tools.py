@@ -1,52 +1,132 @@
-from app.services import order_service
+from datetime import datetime, timedelta
 
+from google.adk.tools import ToolContext
 
-def view_orders_executor(user_id: int) -> str:
+from app.services import order_service, tool_cache_service
+from .context import get_session_user_id
+
+# Keeps the tool output (and so the prompt) bounded however long the history is.
+MAX_ORDERS_SHOWN = 10
+MAX_ITEMS_SHOWN_PER_ORDER = 5
+
+
+def _parse_tool_date(value: str, field_name: str):
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid {field_name} '{value}'. Use the format YYYY-MM-DD.")
+
+
+def _format_order_summary(user_id, statuses, start, end, limit, filter_text):
+    summary = order_service.get_order_summary(
+        user_id, statuses=statuses, start_date=start, end_date=end, limit=limit
+    )
+    if not summary.order_count:
+        if filter_text:
+            return f"No orders found{filter_text}."
+        return "You haven't placed any orders yet."
+
+    breakdown = ", ".join(
+        f"{count} {order_status.value}"
+        for order_status, count in sorted(
+            summary.status_counts.items(), key=lambda pair: -pair[1]
+        )
+    )
+    response = [
+        f"Order summary{filter_text}: {summary.order_count} order(s), "
+        f"total ₹{summary.total_spent:.2f}.",
+        f"By status: {breakdown}.",
+        f"Placed between {summary.first_order_at.strftime('%Y-%m-%d')} "
+        f"and {summary.last_order_at.strftime('%Y-%m-%d')}.",
+        f"\nMost recent {len(summary.recent_orders)} order(s):",
+    ]
+    for order in summary.recent_orders:
+        response.append(
+            f"- Order #{order.id} | {order.status.value} | "
+            f"{order.created_at.strftime('%Y-%m-%d %H:%M')} | ₹{order.total_amount:.2f}"
+        )
+        for item in order.items[:MAX_ITEMS_SHOWN_PER_ORDER]:
+            response.append(
+                f"    {item.quantity} x {item.product_name} (@ ₹{item.price_per_unit:.2f} each)"
+            )
+        hidden = len(order.items) - MAX_ITEMS_SHOWN_PER_ORDER
+        if hidden > 0:
+            response.append(f"    ...and {hidden} more item(s)")
+    if summary.order_count > len(summary.recent_orders):
+        response.append(
+            f"({summary.order_count - len(summary.recent_orders)} older order(s) not shown.)"
+        )
+    return "\n".join(response)
+
+
+def view_orders_executor(
+    tool_context: ToolContext,
+    status: str = "",
+    start_date: str = "",
+    end_date: str = "",
+    limit: int = 5,
+) -> str:
     """
-    Retrieves the user's order history and formats it.
+    Summarizes the user's order history: order count, total spent and a
+    breakdown by status, followed by details of the most recent orders.
+    Use the optional filters to answer questions such as "do I have pending
+    orders?" or "what did I buy last month?".
 
     Args:
-        user_id: The ID of the current user.
+        status: Optional comma-separated order statuses to include, e.g.
+            "pending" or "shipped,delivered". Valid statuses: pending,
+            processing, shipped, delivered, cancelled, return_requested, returned.
+        start_date: Optional earliest order date to include (YYYY-MM-DD).
+        end_date: Optional latest order date to include (YYYY-MM-DD, inclusive).
+        limit: How many of the most recent matching orders to detail (max 10).
 
     Returns:
-        A string listing orders or a message if no orders exist.
+        A string summarizing the matching orders or a message if none exist.
     """
+    user_id = get_session_user_id(tool_context)
+    try:
+        statuses = order_service.parse_order_statuses((status or "").split(","))
+        start = _parse_tool_date(start_date, "start_date") if start_date else None
+        end = _parse_tool_date(end_date, "end_date") if end_date else None
+        if end:
+            end += timedelta(days=1)  # Include the whole end day
+        limit = max(1, min(int(limit or 5), MAX_ORDERS_SHOWN))
+    except (TypeError, ValueError) as e:
+        return str(e)
+
+    filters = []
+    if statuses:
+        filters.append("status " + " or ".join(s.value for s in statuses))
+    if start_date:
+        filters.append(f"from {start_date}")
+    if end_date:
+        filters.append(f"until {end_date}")
+    filter_text = f" ({', '.join(filters)})" if filters else ""
+
     try:
-        orders = order_service.get_user_orders(user_id)
-        if not orders:
-            return "You haven't placed any orders yet."
-
-        response = ["Here are your orders:"]
-        for order in orders:
-            response.append(f"\n--- Order #{order.id} ---")
-            response.append(f"Status: {order.status.value}")
-            response.append(f"Placed on: {order.created_at.strftime('%Y-%m-%d %H:%M')}")
-            response.append(f"Total: ₹{order.total_amount:.2f}")
-            response.append("Items:")
-            items = order_service.get_order_items(order.id)
-            if items:
-                for item in items:
-                    response.append(
-                        f"  - {item.quantity} x {item.product.name} (@ ₹{item.price_per_unit:.2f} each)"
-                    )
-            else:
-                response.append("  (No item details available)")
-        return "\n".join(response)
+        return tool_cache_service.cached_read(
+            user_id,
+            "view_orders",
+            (tuple(statuses), start, end, limit),
+            lambda: _format_order_summary(
+                user_id, statuses, start, end, limit, filter_text
+            ),
+        )
     except Exception:
         return "An error occurred while retrieving your order history."
 
 
-def cancel_order_executor(user_id: int, order_id: int) -> str:
+def cancel_order_executor(tool_context: ToolContext, order_id: int) -> str:
     """
     Attempts to cancel an order.
 
     Args:
-        user_id: The ID of the current user.
         order_id: The specific ID of the order to cancel.
 
     Returns:
         A string confirming cancellation or an error/status message.
     """
+    user_id = get_session_user_id(tool_context)
     try:
         message = order_service.cancel_user_order(user_id, order_id)
         return message
@@ -56,17 +136,17 @@ def cancel_order_executor(user_id: int, order_id: int) -> str:
         return "An unexpected error occurred while trying to cancel the order."
 
 
-def request_return_executor(user_id: int, order_id: int) -> str:
+def request_return_executor(tool_context: ToolContext, order_id: int) -> str:
     """
     Initiates a return request for a delivered order.
 
     Args:
-        user_id: The ID of the current user.
         order_id: The ID of the delivered order.
 
     Returns:
         A string confirming the return request or an error/status message.
     """
+    user_id = get_session_user_id(tool_context)
     try:
         message = order_service.request_order_return(user_id, order_id)
         return message
@@ -76,16 +156,14 @@ def request_return_executor(user_id: int, order_id: int) -> str:
         return "An unexpected error occurred while trying to request the return."
 
 
-def proceed_to_checkout_executor(user_id: int) -> str:
+def proceed_to_checkout_executor(tool_context: ToolContext) -> str:
     """
     Initiates the checkout process by creating an order from the cart.
 
-    Args:
-        user_id: The ID of the current user.
-
     Returns:
         A string confirming checkout and order creation or an error message.
     """
+    user_id = get_session_user_id(tool_context)
     try:
         return order_service.proceed_to_checkout(user_id)
     except ValueError as e:
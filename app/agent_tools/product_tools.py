@@ -1,6 +1,15 @@
 from app.services import product_service
 
 
+def product_not_found_message(product_name: str, suggestions, suffix: str = "") -> str:
+    """Builds the 'not found' reply, listing close matches so the model can retry directly."""
+    message = f"Sorry, I couldn't find a product named '{product_name}'{suffix}."
+    if suggestions:
+        options = ", ".join(f"'{name}'" for name in suggestions)
+        message += f" Did you mean: {options}?"
+    return message
+
+
 def get_product_info_executor(product_name: str) -> str:
     """
     Retrieves and formats information about a specific product.
@@ -13,9 +22,9 @@ def get_product_info_executor(product_name: str) -> str:
         A string with product details or a message if not found.
     """
     try:
-        product = product_service.find_product_by_name(product_name)
+        product, suggestions = product_service.match_product(product_name)
         if not product:
-            return f"Sorry, I couldn't find information for a product named '{product_name}'."
+            return product_not_found_message(product_name, suggestions)
 
         response = [f"Here's the information for {product.name}:"]
         if product.description:
@@ -0,0 +1,136 @@
+# ASGI front end for the Flask app.
+#
+# Chat turns (POST /chatbot/chat and its streaming variant) are served natively
+# on the ASGI server's event loop, so a chat waiting on the model holds no
+# worker thread and many concurrent chats share one loop. Every other request
+# is passed to the Flask WSGI app, which runs in a thread pool. Start it with:
+#
+#     uvicorn asgi:app --workers 1
+
+import asyncio
+import io
+import logging
+
+from uvicorn.middleware.wsgi import WSGIMiddleware, build_environ
+
+from .blueprints.chatbot.routes import (
+    SSE_HEADERS,
+    handle_chat_message_async,
+    stream_chat_message_async,
+)
+from . import create_app, sql_instrumentation
+from .config import Config
+from .services import chat_message_service
+
+logger = logging.getLogger(__name__)
+
+# POST paths served on the event loop, and their async handlers.
+ASYNC_ROUTES = {
+    "/chatbot/chat": handle_chat_message_async,
+    "/chatbot/chat/stream": stream_chat_message_async,
+}
+
+# Threads serving the regular (WSGI) pages.
+WSGI_WORKER_THREADS = 10
+
+
+class ChatStoreASGI:
+    """Routes chat turns to the async handlers and everything else to Flask."""
+
+    def __init__(self, flask_app, wsgi_workers: int = WSGI_WORKER_THREADS):
+        self.flask_app = flask_app
+        self.wsgi_app = WSGIMiddleware(flask_app, workers=wsgi_workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"] in ASYNC_ROUTES
+        ):
+            await self._serve_async(ASYNC_ROUTES[scope["path"]], scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Store queued chat messages before the server exits.
+                await asyncio.to_thread(chat_message_service.flush_pending)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _serve_async(self, handler, scope, receive, send):
+        body = io.BytesIO()
+        message = {"more_body": True}
+        while message.get("more_body", False):
+            message = await receive()
+            body.write(message.get("body", b""))
+        body.seek(0)
+
+        environ = build_environ(scope, message, body)
+        # Flask contexts live in context variables, so each request task gets its
+        # own; the context stays pushed while a stream is being sent.
+        with self.flask_app.request_context(environ):
+            # The handlers skip before_request hooks; the SQL log is closed by
+            # the teardown hook when the context is popped.
+            sql_instrumentation.start_request_log()
+            chunks = None
+            try:
+                rv = await handler()
+                if hasattr(rv, "__aiter__"):
+                    chunks = rv
+                    response = self.flask_app.response_class(
+                        mimetype="text/event-stream", headers=SSE_HEADERS
+                    )
+                else:
+                    response = self.flask_app.make_response(rv)
+                response = self.flask_app.process_response(response)
+            except Exception as e:
+                logger.error(
+                    f"Unhandled exception serving {scope['path']}: {e}", exc_info=True
+                )
+                chunks = None
+                response = self.flask_app.make_response(
+                    (
+                        {
+                            "error": "An internal error occurred processing your message."
+                        },
+                        500,
+                    )
+                )
+
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [
+                        (name.lower().encode("latin1"), value.encode("latin1"))
+                        for name, value in response.headers.to_wsgi_list()
+                    ],
+                }
+            )
+            if chunks is None:
+                await send({"type": "http.response.body", "body": response.get_data()})
+                return
+            try:
+                async for chunk in chunks:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk.encode("utf-8"),
+                            "more_body": True,
+                        }
+                    )
+                await send({"type": "http.response.body", "body": b""})
+            finally:
+                # Stops the agent turn if the client went away mid-stream.
+                await chunks.aclose()
+
+
+def create_asgi_app(config_class=Config):
+    return ChatStoreASGI(create_app(config_class))
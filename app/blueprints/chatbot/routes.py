@@ -1,8 +1,18 @@
+import json
 import logging
-import asyncio
-from flask import request, jsonify, current_app, render_template, flash
+from flask import (
+    Response,
+    request,
+    jsonify,
+    current_app,
+    render_template,
+    flash,
+    stream_with_context,
+)
 from flask_login import login_required, current_user
 from . import chatbot_bp
+from app.event_loop import get_background_loop
+from app.extensions import db
 from app.services import chatbot_service
 
 logger = logging.getLogger(__name__)
@@ -10,39 +20,46 @@ logger = logging.getLogger(__name__)
 INITIAL_CHAT_LIMIT = 50
 
 
-@chatbot_bp.route("/chat", methods=["POST"])
-@login_required
-def handle_chat_message():
+def _parse_chat_request():
     """
-    API endpoint to handle incoming chat messages from the user via AJAX.
+    Validates a chat message request.
+
+    Returns:
+        tuple: (handler kwargs, None) if the request is valid, otherwise
+        (None, error response).
     """
     if not request.is_json:
         logger.warning("Non-JSON request received at /chat endpoint.")
-        return jsonify({"error": "Request must be JSON"}), 400
+        return None, (jsonify({"error": "Request must be JSON"}), 400)
 
     data = request.get_json()
     user_message = data.get("message")
 
     if not user_message:
         logger.warning("Missing 'message' in JSON payload for /chat.")
-        return jsonify({"error": "Missing 'message' in request body"}), 400
+        return None, (jsonify({"error": "Missing 'message' in request body"}), 400)
 
     user_id = current_user.id
-    api_key = current_app.config.get("GOOGLE_API_KEY")
+    api_key = chatbot_service.get_api_key()
 
     if not api_key:
         logger.error("GOOGLE_API_KEY is not configured in the application.")
-        return (
+        return None, (
             jsonify({"error": "Chatbot service is not configured (API key missing)."}),
             500,
         )
 
     logger.info(f"Received chat message from user {user_id}: '{user_message}'")
+    return {"user_id": user_id, "user_message": user_message, "api_key": api_key}, None
+
+
+async def _respond_to_chat(user_id, user_message, api_key):
+    # Nothing needs the request's DB connection until the turn is saved, so
+    # give it back to the pool instead of holding it while the turn is awaited.
+    db.session.close()
     try:
-        agent_response = asyncio.run(
-            chatbot_service.handle_message_async(
-                user_id=user_id, user_message=user_message, api_key=api_key
-            )
+        agent_response = await chatbot_service.handle_message_async(
+            user_id=user_id, user_message=user_message, api_key=api_key
         )
         logger.info(f"Sending response to user {user_id}: '{agent_response}'")
         return jsonify({"response": agent_response})
@@ -57,6 +74,96 @@ def handle_chat_message():
         )
 
 
+@chatbot_bp.route("/chat", methods=["POST"])
+@login_required
+def handle_chat_message():
+    """
+    API endpoint to handle incoming chat messages from the user via AJAX.
+    The agent turn runs on the shared background event loop; this worker
+    thread waits for it.
+    """
+    chat_args, error = _parse_chat_request()
+    if error is not None:
+        return error
+    return get_background_loop().run(_respond_to_chat(**chat_args))
+
+
+async def handle_chat_message_async():
+    """
+    Same as handle_chat_message, but awaited directly on the server's event
+    loop by the ASGI entry point (app/asgi.py), so a waiting chat holds no thread.
+    Must be called inside a request context for /chatbot/chat.
+    """
+    if not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    chat_args, error = _parse_chat_request()
+    if error is not None:
+        return error
+    return await _respond_to_chat(**chat_args)
+
+
+# Keep proxies (e.g. nginx) from buffering the event stream.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _format_sse(turn_event) -> str:
+    return f"event: {turn_event['type']}\ndata: {json.dumps(turn_event)}\n\n"
+
+
+async def _chat_event_stream(user_id, user_message, api_key):
+    db.session.close()
+    try:
+        async for turn_event in chatbot_service.stream_message_async(
+            user_id=user_id, user_message=user_message, api_key=api_key
+        ):
+            if turn_event["type"] == "final":
+                logger.info(
+                    f"Sending response to user {user_id}: '{turn_event['text']}'"
+                )
+            yield _format_sse(turn_event)
+    except Exception as e:
+        logger.error(
+            f"Unhandled exception in stream_chat_message for user {user_id}: {e}",
+            exc_info=True,
+        )
+        yield _format_sse(
+            {
+                "type": "error",
+                "error": "An internal error occurred processing your message.",
+            }
+        )
+
+
+@chatbot_bp.route("/chat/stream", methods=["POST"])
+@login_required
+def stream_chat_message():
+    """
+    Streaming variant of handle_chat_message. Responds with Server-Sent Events
+    (see chatbot_service.stream_message_async for the event types) so the
+    browser can show tool progress and partial text while the turn runs.
+    """
+    chat_args, error = _parse_chat_request()
+    if error is not None:
+        return error
+    events = get_background_loop().iterate(_chat_event_stream(**chat_args))
+    return Response(
+        stream_with_context(events), mimetype="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+async def stream_chat_message_async():
+    """
+    Same as stream_chat_message for the ASGI entry point. Returns an error
+    response, or an async iterator of SSE chunks to send as they are produced.
+    """
+    if not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    chat_args, error = _parse_chat_request()
+    if error is not None:
+        return error
+    return _chat_event_stream(**chat_args)
+
+
 @chatbot_bp.route("/", methods=["GET"])
 @login_required
 def chat_interface_page():
@@ -67,13 +174,16 @@ def chat_interface_page():
     logger.info(f"Loading chat interface for user {user_id}.")
 
     chat_history_list_for_sidebar = []
+    next_cursor = None
     total_messages = 0
 
     try:
         # Fetch latest messages for the sidebar, ordered descending (latest first)
-        chat_history_list_for_sidebar = chatbot_service.get_chat_history(
-            user_id, limit=INITIAL_CHAT_LIMIT, offset=0
+        history_page = chatbot_service.get_chat_history_page(
+            user_id, limit=INITIAL_CHAT_LIMIT
         )
+        chat_history_list_for_sidebar = history_page.items
+        next_cursor = history_page.next_cursor
         total_messages = chatbot_service.count_chat_history(user_id)
         logger.debug(
             f"Loaded {len(chat_history_list_for_sidebar)} of {total_messages} messages for user {user_id} for sidebar."
@@ -92,6 +202,7 @@ def chat_interface_page():
         chat_history_for_sidebar=chat_history_list_for_sidebar,
         total_messages=total_messages,
         loaded_messages_count=len(chat_history_list_for_sidebar),
+        next_cursor=next_cursor,
         initial_limit=INITIAL_CHAT_LIMIT,
     )
 
@@ -99,15 +210,36 @@ def chat_interface_page():
 @chatbot_bp.route("/load_more_chats", methods=["GET"])
 @login_required
 def load_more_chats():
+    """
+    Returns the next page of older chat messages. Clients pass the `next_cursor`
+    from the previous page as `cursor`; the legacy `offset` parameter is still
+    honoured when no cursor is given.
+    """
     user_id = current_user.id
-    offset = request.args.get("offset", 0, type=int)
+    cursor = request.args.get("cursor")
+    offset = request.args.get("offset", type=int)
 
-    logger.info(f"Loading more chats for user {user_id} with offset {offset}.")
+    logger.info(
+        f"Loading more chats for user {user_id} (cursor {cursor!r}, offset {offset})."
+    )
     try:
-        # Fetches older messages, still ordered latest first within the batch
-        more_messages = chatbot_service.get_chat_history(
-            user_id, limit=INITIAL_CHAT_LIMIT, offset=offset
-        )
+        next_cursor = None
+        if cursor or offset is None:
+            try:
+                history_page = chatbot_service.get_chat_history_page(
+                    user_id, cursor=cursor, limit=INITIAL_CHAT_LIMIT
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            more_messages = history_page.items
+            next_cursor = history_page.next_cursor
+            has_more = history_page.has_more
+        else:
+            # Fetches older messages, still ordered latest first within the batch
+            more_messages = chatbot_service.get_chat_history(
+                user_id, limit=INITIAL_CHAT_LIMIT, offset=offset
+            )
+            has_more = len(more_messages) == INITIAL_CHAT_LIMIT
         messages_data = [
             {
                 "id": msg.id,
@@ -121,7 +253,8 @@ def load_more_chats():
         return jsonify(
             {
                 "messages": messages_data,
-                "has_more": len(more_messages) == INITIAL_CHAT_LIMIT,
+                "has_more": has_more,
+                "next_cursor": next_cursor,
             }
         )
     except Exception as e:
@@ -139,7 +272,7 @@ def clear_chat_history_route():
     try:
         success = chatbot_service.clear_chat_history(user_id)
         if success:
-            chatbot_service.clear_user_runner_cache(user_id)
+            get_background_loop().run(chatbot_service.reset_adk_session(user_id))
             logger.info(f"Chat history cleared successfully for user {user_id}.")
             return jsonify({"success": True, "message": "Chat history cleared."})
         else:
@@ -1,10 +1,30 @@
+from datetime import datetime, timedelta
+
 from flask import render_template, request, redirect, url_for, flash
 from flask_login import current_user, login_required
 from . import web_bp
-from app.services import cart_service, order_service, browse_service
+from app.services import (
+    cart_service,
+    order_service,
+    browse_service,
+    facet_service,
+    user_stats_service,
+)
 from app.models import Product, CartItem
 from app.extensions import db
 
+ORDERS_PER_PAGE = 10
+PROFILE_RECENT_ORDERS = 5
+
+
+def _set_item_prices(cart_items):
+    """Sets the line total shown for each item (cart totals come from UserStats)."""
+    for item in cart_items:
+        # Handle a missing product (unlikely with FK constraints)
+        item.total_item_price = (
+            item.quantity * item.product.price if item.product else 0
+        )
+
 
 @web_bp.route("/")
 def index():
@@ -19,14 +39,11 @@ def index():
     total_price = 0.0
 
     if current_user.is_authenticated:
-        cart_items = cart_service.get_cart_contents(current_user.id)
-        if cart_items:
-            for item in cart_items:
-                if item.product:
-                    item.total_item_price = item.quantity * item.product.price
-                    total_price += item.total_item_price
-                else:
-                    item.total_item_price = 0
+        stats = user_stats_service.get_user_stats(current_user.id)
+        total_price = stats.cart_total
+        if stats.cart_item_count:
+            cart_items = cart_service.get_cart_contents(current_user.id)
+            _set_item_prices(cart_items)
 
     return render_template(
         "index.html.jinja2",
@@ -40,16 +57,17 @@ def index():
 @web_bp.route("/profile")
 @login_required
 def profile():
-    cart_items = cart_service.get_cart_contents(current_user.id)
-    total_price = 0.0
-    for item in cart_items:
-        if item.product:
-            item.total_item_price = item.quantity * item.product.price
-            total_price += item.total_item_price
-        else:
-            item.total_item_price = 0
+    stats = user_stats_service.get_user_stats(current_user.id)
+    cart_items = []
+    if stats.cart_item_count:
+        cart_items = cart_service.get_cart_contents(current_user.id)
+        _set_item_prices(cart_items)
 
-    user_orders = order_service.get_user_orders(current_user.id)
+    recent_orders = order_service.get_order_history(
+        current_user.id,
+        per_page=PROFILE_RECENT_ORDERS,
+        include_items=False,
+    )
     robohash_url = (
         f"https://robohash.org/{current_user.id}.png?size=150x150&gravatar=hashed"
     )
@@ -59,8 +77,9 @@ def profile():
         title="Your Profile",
         user=current_user,
         cart_items=cart_items,
-        total_price=total_price,
-        orders=user_orders,
+        total_price=stats.cart_total,
+        orders=recent_orders.items,
+        orders_total=stats.order_count,
         robohash_url=robohash_url,
     )
 
@@ -69,7 +88,9 @@ def profile():
 @login_required
 def browse_products():
     """Displays products available in the warehouse with filtering."""
-    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor", None)
+    before = request.args.get("before", None)
+    page = max(request.args.get("page", 1, type=int), 1)
     per_page = 20
 
     search_term = request.args.get("search", None)
@@ -79,19 +100,34 @@ def browse_products():
     in_stock_only = request.args.get("in_stock") == "on"
     min_rating = request.args.get("min_rating", None)
 
-    products_pagination = browse_service.get_filtered_products(
+    filters = dict(
         search_term=search_term,
         categories=selected_categories,
         min_price=min_price,
         max_price=max_price,
         in_stock_only=in_stock_only,
         min_rating=min_rating,
-        page=page,
         per_page=per_page,
     )
-
-    products = products_pagination.items
+    if search_term:
+        # Relevance order has no stable sort key to seek on: page searches by number
+        products_page = browse_service.get_filtered_products(page=page, **filters)
+    else:
+        try:
+            products_page = browse_service.get_filtered_products_page(
+                cursor=cursor, before=before, **filters
+            )
+        except ValueError:
+            # Stale or tampered cursor: start again from the first page
+            flash("That page is no longer available. Showing the first page.", "info")
+            products_page = browse_service.get_filtered_products_page(**filters)
+        if not products_page.has_prev:
+            page = 1
+
+    products = products_page.items
     all_categories = browse_service.get_all_categories()
+    facet_filters = {k: v for k, v in filters.items() if k != "per_page"}
+    facets = facet_service.get_facets(**facet_filters)
 
     current_filters = {
         "search": search_term or "",
@@ -106,8 +142,11 @@ def browse_products():
         "browse_products.html.jinja2",
         title="Browse Products",
         products=products,
-        pagination=products_pagination,
+        pagination=products_page,
+        numbered_pages=bool(search_term),
+        page=page,
         all_categories=all_categories,
+        facets=facets,
         current_filters=current_filters,
     )
 
@@ -148,22 +187,13 @@ def add_to_cart_manual():
 def view_cart():
     """Displays the user's current shopping cart."""
     cart_items = cart_service.get_cart_contents(current_user.id)
-    total_price = 0.0
-    for item in cart_items:
-        # Ensure product exists before calculating price
-        if item.product:
-            item.total_item_price = item.quantity * item.product.price
-            total_price += item.total_item_price
-        else:
-            # Handle case where product might be missing (though unlikely with FK constraints)
-            item.total_item_price = 0
-            # Optionally log this situation or remove the cart item
+    _set_item_prices(cart_items)
 
     return render_template(
         "cart.html.jinja2",
         title="Your Shopping Cart",
         cart_items=cart_items,
-        total_price=total_price,
+        total_price=cart_service.get_cart_total(current_user.id),
     )
 
 
@@ -216,20 +246,49 @@ def proceed_to_checkout_web():
 @web_bp.route("/orders")
 @login_required
 def orders():
-    """Displays the user's order history."""
-    user_orders = order_service.get_user_orders(current_user.id)
-
-    # Load order items for each order
-    for order in user_orders:
-        items = order_service.get_order_items(order.id)
-        # Eagerly load items to avoid lazy loading issues in template
-        order.items = items
+    """Displays the user's order history, one page at a time."""
+    cursor = request.args.get("cursor", None)
+    start_date = _parse_date_arg("from")
+    end_date = _parse_date_arg("to")
+    if end_date:
+        # Make the end date inclusive
+        end_date += timedelta(days=1)
+
+    history_args = dict(
+        per_page=ORDERS_PER_PAGE, start_date=start_date, end_date=end_date
+    )
+    try:
+        orders_page = order_service.get_order_history(
+            current_user.id, cursor=cursor, **history_args
+        )
+    except ValueError:
+        cursor = None
+        orders_page = order_service.get_order_history(current_user.id, **history_args)
 
     return render_template(
-        "orders.html.jinja2", title="Your Orders", orders=user_orders
+        "orders.html.jinja2",
+        title="Your Orders",
+        orders=orders_page.items,
+        pagination=orders_page,
+        is_first_page=not cursor,
+        date_filters={
+            "from": request.args.get("from", ""),
+            "to": request.args.get("to", ""),
+        },
     )
 
 
+def _parse_date_arg(name):
+    """Parses a YYYY-MM-DD query argument, ignoring missing or invalid values."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
 @web_bp.route("/orders/<int:order_id>/cancel", methods=["POST"])
 @login_required
 def cancel_order(order_id):
@@ -12,3 +12,86 @@ class Config:
     ) or "sqlite:///" + os.path.join(basedir, "instance", "app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+
+    # Chat history and agent sessions (the "chat" bind, models.CHAT_BIND_KEY)
+    # are stored in their own file with its own write lock. Point it at the
+    # main database URL to keep everything in one file.
+    SQLALCHEMY_BINDS = {
+        "chat": os.environ.get("CHAT_DATABASE_URL")
+        or "sqlite:///" + os.path.join(basedir, "instance", "chat.db")
+    }
+
+    # Production SQLite profile (see app/sqlite_profile.py): WAL and the pragmas
+    # below on every connection, read-only service calls served by a separate
+    # pool of read-only connections, and ORM writes through one writer lock.
+    SQLITE_PRODUCTION_PROFILE = os.environ.get("SQLITE_PRODUCTION_PROFILE") == "1"
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    SQLITE_SYNCHRONOUS = "NORMAL"
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+    SQLITE_READ_POOL_SIZE = 8
+    # Per-bind overrides of the SQLITE_* settings above, e.g.
+    # {"chat": {"SQLITE_CACHE_SIZE_KB": 16 * 1024}}.
+    SQLITE_BIND_SETTINGS = {}
+
+    # Chat model name; "fake" selects the offline scripted model
+    # (app/fake_llm.py) for load tests, which needs no API key. Its latency is
+    # drawn from a fixed, uniform, exponential or lognormal distribution.
+    CHAT_MODEL = os.environ.get("CHAT_MODEL")
+    CHAT_FAKE_LLM_LATENCY = float(os.environ.get("CHAT_FAKE_LLM_LATENCY", "1.0"))
+    CHAT_FAKE_LLM_LATENCY_DISTRIBUTION = os.environ.get(
+        "CHAT_FAKE_LLM_LATENCY_DISTRIBUTION", "fixed"
+    )
+    CHAT_FAKE_LLM_LATENCY_SPREAD = 0.5
+    CHAT_FAKE_LLM_SEED = None
+    # JSON file of script rules (see fake_llm.DEFAULT_SCRIPT); default script if unset.
+    CHAT_FAKE_LLM_SCRIPT = os.environ.get("CHAT_FAKE_LLM_SCRIPT")
+
+    # Use the SQLite FTS5 product index for browse search (falls back to ILIKE).
+    PRODUCT_SEARCH_FTS = True
+
+    # Serve browse filtering from an in-process NumPy snapshot of the catalog.
+    CATALOG_SNAPSHOT_ENABLED = False
+
+    # Release stock held by cart items older than the TTL in a background thread.
+    CART_SWEEPER_ENABLED = os.environ.get("CART_SWEEPER_ENABLED") == "1"
+    CART_RESERVATION_TTL_SECONDS = 24 * 60 * 60
+    CART_SWEEP_INTERVAL_SECONDS = 5 * 60
+    CART_SWEEP_BATCH_SIZE = 500
+
+    # Replace all but the last few turns of an agent session with a rolling
+    # summary once it passes either limit (tokens estimated at ~4 chars each),
+    # and cut tool results of earlier turns to a short digest in prompts.
+    CHAT_COMPACTION_ENABLED = True
+    CHAT_COMPACTION_MAX_EVENTS = 40
+    CHAT_COMPACTION_MAX_TOKENS = 4000
+    CHAT_COMPACTION_KEEP_TURNS = 3
+    CHAT_SUMMARY_MAX_CHARS = 3000
+    CHAT_TOOL_DIGEST_CHARS = 200
+
+    # Answer plain commands ("show my cart", "cancel order 12") by calling the
+    # matching tool directly instead of the model; set to 0 to disable.
+    CHAT_INTENT_FAST_PATH = os.environ.get("CHAT_INTENT_FAST_PATH", "1") != "0"
+
+    # Share agent answers to generic catalog questions between users until the
+    # catalog changes (see services/response_cache_service.py).
+    CHAT_RESPONSE_CACHE = True
+
+    # Cache the cart, order and profile tools per user until that user's cart
+    # or orders change (see services/tool_cache_service.py).
+    CHAT_TOOL_CACHE = True
+
+    # Store chat messages from a background writer in batched transactions
+    # instead of committing them before every reply (see
+    # services/chat_message_service.py).
+    CHAT_MESSAGE_WRITE_BEHIND = True
+
+    # Count the SQL statements of every request and agent turn and flag
+    # statements repeated SQL_N_PLUS_ONE_THRESHOLD times or more as suspected
+    # N+1 queries (see app/sql_instrumentation.py). X-SQL-* response headers
+    # are added in debug mode or with SQL_INSTRUMENTATION_HEADERS.
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "1") != "0"
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+    SQL_INSTRUMENTATION_HEADERS = False
+    # Log every summary at INFO instead of DEBUG (suspected N+1 is always WARNING).
+    SQL_INSTRUMENTATION_LOG_ALL = os.environ.get("SQL_INSTRUMENTATION_LOG_ALL") == "1"
@@ -0,0 +1,120 @@
+# A single long-lived asyncio event loop running in a daemon thread.
+#
+# Sync request handlers submit agent coroutines here instead of calling
+# asyncio.run() per request, which creates and tears down a loop each time and
+# strands loop-bound state (HTTP client pools, ADK runners). Coroutines from
+# every request thread multiplex on this one loop. Submitted coroutines run
+# with a copy of the caller's context variables, so the Flask app and request
+# contexts (and with them db.session) stay available inside them.
+
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+
+class BackgroundEventLoop:
+    """An asyncio event loop served by its own daemon thread."""
+
+    def __init__(self, name: str = "agent-event-loop"):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        self.loop.run_forever()
+        # Cancel whatever is still pending once the loop has been stopped.
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True)
+            )
+        self.loop.close()
+
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+        logger.info(f"Started background event loop '{self.name}'.")
+        return self
+
+    def is_running(self) -> bool:
+        return self._thread.is_alive() and not self.loop.is_closed()
+
+    def submit(self, coro):
+        """Schedules `coro` on the loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """
+        Runs `coro` on the loop and blocks the calling thread until it finishes.
+
+        Raises:
+            TimeoutError: If `timeout` seconds pass first (the coroutine is cancelled).
+            Exception: Whatever the coroutine raised.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen):
+        """
+        Drives the async generator `agen` on the loop and yields its items in the
+        calling thread as they are produced. Closing the returned generator (for
+        example when an HTTP client disconnects) cancels `agen`.
+        """
+        items = queue.SimpleQueue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((False, item))
+            finally:
+                await agen.aclose()
+                items.put((True, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                done, item = items.get()
+                if done:
+                    break
+                yield item
+            future.result()  # Re-raise whatever ended the generator early
+        finally:
+            future.cancel()
+
+    def stop(self, timeout: float = 5.0):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+def get_background_loop() -> BackgroundEventLoop:
+    """Returns the process-wide background loop, starting it on first use."""
+    global _background_loop
+    if _background_loop is None or not _background_loop.is_running():
+        with _background_loop_lock:
+            if _background_loop is None or not _background_loop.is_running():
+                _background_loop = BackgroundEventLoop().start()
+    return _background_loop
+
+
+@atexit.register
+def _stop_background_loop():
+    if _background_loop is not None:
+        _background_loop.stop()
@@ -0,0 +1,253 @@
+# Offline stand-in for the chat model, for load tests and benchmarks.
+#
+# Select it with CHAT_MODEL = "fake" (see Config): the whole chat pipeline -
+# runner, tools, session store and DB writes - then runs without calling
+# Gemini. The model answers from a script: the first rule whose pattern
+# matches the user's command decides which tools it calls and what it replies,
+# after a latency drawn from a configurable distribution.
+
+import asyncio
+import json
+import random
+import re
+from typing import AsyncGenerator, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types as genai_types
+from pydantic import PrivateAttr
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Rules are tried in order against the lowercased command. Argument values are
+# templates filled from the pattern's named groups ("{product_name}"); values
+# that come out as digits are passed as integers. "{tool_result}" in a reply
+# is replaced by the text the tools returned.
+DEFAULT_SCRIPT = [
+    {
+        "pattern": r"\badd (?:(?P<quantity>\d+) )?(?P<product_name>.+?) to (?:my |the )?cart",
+        "tool_calls": {
+            "add_item_to_cart_executor": {
+                "product_name": "{product_name}",
+                "quantity": "{quantity}",
+            }
+        },
+        "defaults": {"quantity": "1"},
+        "reply": "Done! {tool_result}",
+    },
+    {
+        "pattern": r"\b(?:remove|delete) (?:the )?(?P<product_name>.+?) from (?:my |the )?cart",
+        "tool_calls": {
+            "remove_item_from_cart_executor": {"product_name": "{product_name}"}
+        },
+        "reply": "{tool_result}",
+    },
+    {
+        "pattern": r"\bcheck ?out\b",
+        "tool_calls": {"proceed_to_checkout_executor": {}},
+        "reply": "{tool_result}",
+    },
+    {
+        "pattern": r"\bcart\b",
+        "tool_calls": {"view_cart_executor": {}},
+        "reply": "Here is your cart. {tool_result}",
+    },
+    {
+        "pattern": r"\border",
+        "tool_calls": {"view_orders_executor": {}},
+        "reply": "Here are your orders. {tool_result}",
+    },
+    {
+        "pattern": r"\b(?:about|price of|much is|much does|stock of) (?:the )?(?P<product_name>.+?)(?: cost| in stock)?$",
+        "tool_calls": {"get_product_info_executor": {"product_name": "{product_name}"}},
+        "reply": "{tool_result}",
+    },
+    {
+        "pattern": r"\bwho am i\b|\bmy name\b|\bprofile\b",
+        "tool_calls": {"get_user_profile_info_executor": {}},
+        "reply": "{tool_result}",
+    },
+]
+
+
+class FakeLlm(BaseLlm):
+    """
+    A stand-in model that answers with fixed text after `latency` seconds. When
+    streaming, the words of the reply arrive evenly spread over that time.
+
+    If `tool_calls` is set (tool name -> arguments), the first model call of a
+    turn asks for those tools instead and the reply follows their results.
+    `script` (a list of rules, see DEFAULT_SCRIPT) picks the tool calls and
+    reply per command instead; commands no rule matches fall back to
+    `tool_calls` and `reply`.
+
+    `latency_distribution` draws each call's latency around `latency`:
+    "fixed", "uniform" (within +/- latency_spread * latency), "exponential"
+    (mean latency) or "lognormal" (median latency, sigma latency_spread).
+    Draws come from a generator seeded with `seed`.
+
+    `seconds_per_1k_prompt_tokens` adds latency proportional to the prompt size
+    (estimated at 4 characters per token), like a real model's prompt
+    processing. The estimate is also reported as usage metadata.
+    """
+
+    model: str = "fake-llm"
+    latency: float = 1.0
+    latency_distribution: str = "fixed"
+    latency_spread: float = 0.5
+    seed: Optional[int] = None
+    reply: str = "This is a canned answer from the fake model."
+    tool_calls: Dict[str, dict] = {}
+    script: List[dict] = []
+    seconds_per_1k_prompt_tokens: float = 0.0
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _rules: list = PrivateAttr(default=None)
+
+    def model_post_init(self, context):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution '{self.latency_distribution}'. "
+                f"Valid distributions: {', '.join(LATENCY_DISTRIBUTIONS)}."
+            )
+        self._rng = random.Random(self.seed)
+        self._rules = [
+            (re.compile(rule["pattern"]), rule) for rule in self.script or ()
+        ]
+
+    def draw_latency(self) -> float:
+        """Returns the base latency of one model call."""
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            spread = self.latency * self.latency_spread
+            return max(
+                0.0, self._rng.uniform(self.latency - spread, self.latency + spread)
+            )
+        if self.latency_distribution == "exponential":
+            return self._rng.expovariate(1 / self.latency)
+        if self.latency_distribution == "lognormal":
+            return self.latency * self._rng.lognormvariate(0.0, self.latency_spread)
+        return self.latency
+
+    def plan_turn(self, command: str):
+        """Returns the (tool calls, reply template) the model uses for a command."""
+        text = " ".join(command.lower().split()).rstrip("?!. ")
+        for pattern, rule in self._rules:
+            match = pattern.search(text)
+            if match is None:
+                continue
+            groups = {**rule.get("defaults", {})}
+            groups.update({k: v for k, v in match.groupdict().items() if v})
+            tool_calls = {
+                name: {key: _fill(value, groups) for key, value in (args or {}).items()}
+                for name, args in rule.get("tool_calls", {}).items()
+            }
+            return tool_calls, rule.get("reply", self.reply)
+        return self.tool_calls, self.reply
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        prompt_tokens = _prompt_tokens(llm_request)
+        usage = genai_types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens
+        )
+        latency = self.draw_latency() + self.seconds_per_1k_prompt_tokens * (
+            prompt_tokens / 1000
+        )
+        tool_calls, reply = self.plan_turn(_latest_command(llm_request))
+
+        tool_results = _tool_results(llm_request)
+        if tool_calls and not tool_results:
+            await asyncio.sleep(latency)
+            yield LlmResponse(
+                content=genai_types.Content(
+                    role="model",
+                    parts=[
+                        genai_types.Part(
+                            function_call=genai_types.FunctionCall(name=name, args=args)
+                        )
+                        for name, args in tool_calls.items()
+                    ],
+                ),
+                usage_metadata=usage,
+            )
+            return
+
+        reply = reply.replace("{tool_result}", " ".join(tool_results))
+        if stream:
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                await asyncio.sleep(latency / len(words))
+                yield LlmResponse(
+                    content=_model_content(word if i == 0 else f" {word}"),
+                    partial=True,
+                )
+        else:
+            await asyncio.sleep(latency)
+        yield LlmResponse(content=_model_content(reply), usage_metadata=usage)
+
+
+def _fill(value, groups):
+    if not isinstance(value, str):
+        return value
+    value = value.format(**groups)
+    return int(value) if value.isdigit() else value
+
+
+def _latest_command(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents):
+        if content.role != "user":
+            continue
+        for part in content.parts or []:
+            if part.text:
+                try:
+                    return str(json.loads(part.text).get("command", ""))
+                except (ValueError, AttributeError):
+                    return part.text
+    return ""
+
+
+def _tool_results(llm_request: LlmRequest) -> List[str]:
+    last: List = llm_request.contents[-1].parts if llm_request.contents else []
+    results = []
+    for part in last or []:
+        if part.function_response:
+            response = part.function_response.response or {}
+            results.append(str(response.get("result", response)))
+    return results
+
+
+def _prompt_tokens(llm_request: LlmRequest) -> int:
+    chars = len(str(llm_request.config.system_instruction or ""))
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(str(part.function_call.args))
+            elif part.function_response:
+                chars += len(str(part.function_response.response))
+    return chars // 4
+
+
+def _model_content(text):
+    return genai_types.Content(role="model", parts=[genai_types.Part(text=text)])
+
+
+def create_from_config(config) -> FakeLlm:
+    """Builds the fake model from the app's CHAT_FAKE_LLM_* settings."""
+    script = DEFAULT_SCRIPT
+    script_path = config.get("CHAT_FAKE_LLM_SCRIPT")
+    if script_path:
+        with open(script_path) as f:
+            script = json.load(f)
+    return FakeLlm(
+        latency=config.get("CHAT_FAKE_LLM_LATENCY", 1.0),
+        latency_distribution=config.get("CHAT_FAKE_LLM_LATENCY_DISTRIBUTION", "fixed"),
+        latency_spread=config.get("CHAT_FAKE_LLM_LATENCY_SPREAD", 0.5),
+        seed=config.get("CHAT_FAKE_LLM_SEED"),
+        script=script,
+    )
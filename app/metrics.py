@@ -0,0 +1,86 @@
+# Minimal in-process metrics: named counters and rolling distributions.
+#
+# Values are per process and reset on restart; they are meant for logs,
+# benchmarks and quick inspection, not as a monitoring backend.
+
+import statistics
+import threading
+from collections import deque
+
+DEFAULT_WINDOW = 1000
+
+_counters = {}
+_distributions = {}
+_lock = threading.Lock()
+
+
+class Distribution:
+    """The most recent `window` samples of a numeric measurement."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.count = 0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        with self._lock:
+            self.count += 1
+            self._samples.append(value)
+
+    def summary(self) -> dict:
+        """Returns count (all time) and mean/p50/p95/max/last over the window."""
+        with self._lock:
+            samples = list(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": count}
+        ordered = sorted(samples)
+        return {
+            "count": count,
+            "mean": statistics.fmean(samples),
+            "p50": statistics.median(ordered),
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+            "last": samples[-1],
+        }
+
+
+def increment(name: str, amount: int = 1):
+    """Adds `amount` to the counter `name`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def get_counter(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def record(name: str, value):
+    """Adds a sample to the distribution `name`."""
+    distribution = _distributions.get(name)
+    if distribution is None:
+        with _lock:
+            distribution = _distributions.setdefault(name, Distribution())
+    distribution.record(value)
+
+
+def get_summary(name: str) -> dict:
+    distribution = _distributions.get(name)
+    return distribution.summary() if distribution else {"count": 0}
+
+
+def snapshot() -> dict:
+    """Returns every counter and distribution summary, keyed by name."""
+    with _lock:
+        counters = dict(_counters)
+        distributions = dict(_distributions)
+    return {
+        "counters": counters,
+        "distributions": {name: d.summary() for name, d in distributions.items()},
+    }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _distributions.clear()
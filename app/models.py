@@ -14,10 +14,15 @@ from sqlalchemy import (
     DateTime,
     Enum as SQLAlchemyEnum,
     UniqueConstraint,
+    Index,
 )
 
 from app.extensions import db
 
+# Chat history and agent sessions live in their own database (SQLALCHEMY_BINDS),
+# so chat writes do not wait on the lock of the store's main database.
+CHAT_BIND_KEY = "chat"
+
 
 class MessageSender(enum.Enum):
     USER = "user"
@@ -56,6 +61,7 @@ class User(UserMixin, db.Model):
         cascade="all, delete-orphan",
         lazy="dynamic",
         order_by="ChatMessage.timestamp",
+        primaryjoin="User.id == foreign(ChatMessage.user_id)",
     )
 
     def __init__(
@@ -135,7 +141,9 @@ class CartItem(db.Model):
         ForeignKey("products.id"), nullable=False, index=True
     )
     quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
-    added_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    added_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.now, index=True
+    )
 
     __table_args__ = (
         UniqueConstraint("user_id", "product_id", name="uq_user_product_cart"),
@@ -178,6 +186,8 @@ class Order(db.Model):
     )
     total_amount: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
 
+    __table_args__ = (Index("ix_orders_user_created", "user_id", "created_at"),)
+
     user: Mapped["User"] = relationship(back_populates="orders")
     items: Mapped[List["OrderItem"]] = relationship(
         back_populates="order", cascade="all, delete-orphan", lazy="dynamic"
@@ -231,13 +241,36 @@ class OrderItem(db.Model):
         return f"<OrderItem OrderID:{self.order_id} ProductID:{self.product_id} Qty:{self.quantity}>"
 
 
+class UserStats(db.Model):
+    """
+    Per-user counters kept up to date by the cart and order services (see
+    services/user_stats_service.py), so pages do not aggregate on every load.
+    """
+
+    __tablename__ = "user_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    # Distinct products in the cart, and their total at current prices.
+    cart_item_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cart_total: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    # Every order placed; spend excludes cancelled orders.
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    lifetime_spend: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+
+    def __repr__(self) -> str:
+        return (
+            f"<UserStats User:{self.user_id} Cart:{self.cart_item_count} "
+            f"Orders:{self.order_count}>"
+        )
+
+
 class ChatMessage(db.Model):
     __tablename__ = "chat_messages"
+    __bind_key__ = CHAT_BIND_KEY
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id"), nullable=False, index=True
-    )
+    # References users.id, which lives in the main database (no foreign key).
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
     timestamp: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.now, index=True
     )
@@ -246,7 +279,10 @@ class ChatMessage(db.Model):
     )
     message_text: Mapped[str] = mapped_column(Text, nullable=False)
 
-    user: Mapped["User"] = relationship(back_populates="chat_messages")
+    user: Mapped["User"] = relationship(
+        back_populates="chat_messages",
+        primaryjoin="User.id == foreign(ChatMessage.user_id)",
+    )
 
     def __init__(
         self,
@@ -264,3 +300,61 @@ class ChatMessage(db.Model):
         return (
             f"<ChatMessage ID:{self.id} User:{self.user_id} Sender:{self.sender.value}>"
         )
+
+
+class ChatUserStats(db.Model):
+    """
+    Per-user chat message counter, stored next to chat_messages so it changes
+    in the same transaction as the messages (see services/user_stats_service.py).
+    """
+
+    __tablename__ = "chat_user_stats"
+    __bind_key__ = CHAT_BIND_KEY
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<ChatUserStats User:{self.user_id} Messages:{self.message_count}>"
+
+
+class AgentSession(db.Model):
+    """An ADK conversation session (see services/agent_session_service.py)."""
+
+    __tablename__ = "agent_sessions"
+    __bind_key__ = CHAT_BIND_KEY
+
+    app_name: Mapped[str] = mapped_column(String(128), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    state: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    # Increases with every stored change (appended events, compaction).
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_update_time: Mapped[float] = mapped_column(Float, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<AgentSession {self.app_name}/{self.user_id}/{self.session_id}>"
+
+
+class AgentSessionEvent(db.Model):
+    """One serialized ADK event of an AgentSession, in append order."""
+
+    __tablename__ = "agent_session_events"
+    __bind_key__ = CHAT_BIND_KEY
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    app_name: Mapped[str] = mapped_column(String(128), nullable=False)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    session_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    event_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    timestamp: Mapped[float] = mapped_column(Float, nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_agent_session_events_session", "app_name", "user_id", "session_id", "id"
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AgentSessionEvent {self.id} Session:{self.session_id}>"
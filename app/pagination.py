@@ -0,0 +1,126 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import tuple_
+
+
+@dataclass
+class CursorPage:
+    """A single page of keyset-paginated results."""
+
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values) -> str:
+    """Encodes the sort-key values of a page's first or last row as an opaque token."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, order_columns) -> list:
+    """
+    Decodes a cursor token back into sort-key values for `order_columns`.
+
+    Raises:
+        ValueError: If the token is malformed or does not match the ordering.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid pagination cursor.") from e
+
+    if not isinstance(values, list) or len(values) != len(order_columns):
+        raise ValueError("Invalid pagination cursor.")
+
+    decoded = []
+    for column, value in zip(order_columns, values):
+        if value is not None and column.type.python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError("Invalid pagination cursor.") from e
+        decoded.append(value)
+    return decoded
+
+
+def paginate_by_cursor(
+    query,
+    order_columns,
+    cursor: Optional[str] = None,
+    per_page: int = 20,
+    descending: bool = False,
+    with_total: bool = False,
+    before: Optional[str] = None,
+) -> CursorPage:
+    """
+    Paginates `query` by seeking past the last row of the previous page instead
+    of using OFFSET, so every page costs the same and concurrent inserts never
+    cause rows to be skipped or repeated.
+
+    Args:
+        query: The (filtered, unordered) query to paginate.
+        order_columns: Columns forming a unique sort key, e.g. (Product.name, Product.id).
+            The last column must be unique (usually the primary key).
+        cursor (str, optional): Token from a previous page's `next_cursor`.
+        per_page (int): Maximum number of items per page.
+        descending (bool): Sort newest/largest first.
+        with_total (bool): Also run a COUNT(*) over the whole result set.
+        before (str, optional): Token from a later page's `prev_cursor`; returns
+            the page ending just before it instead. Takes precedence over `cursor`.
+
+    Returns:
+        CursorPage: The page items, the cursors for the next and previous pages
+            and optional total.
+
+    Raises:
+        ValueError: If `cursor` is invalid.
+    """
+    total = query.order_by(None).count() if with_total else None
+
+    # A previous page is read backwards from its boundary, then put back in order.
+    backwards = bool(before)
+    scan_descending = descending != backwards
+    boundary = before or cursor
+    if boundary:
+        values = decode_cursor(boundary, order_columns)
+        key = tuple_(*order_columns)
+        query = query.filter(
+            key < tuple_(*values) if scan_descending else key > tuple_(*values)
+        )
+
+    ordering = [c.desc() if scan_descending else c.asc() for c in order_columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def row_cursor(row):
+        return encode_cursor(getattr(row, c.key) for c in order_columns)
+
+    # The page a boundary came from lies after it (backwards) or before it.
+    has_next = more or backwards
+    has_prev = more if backwards else bool(cursor)
+    next_cursor = row_cursor(rows[-1]) if rows and has_next else None
+    prev_cursor = row_cursor(rows[0]) if rows and has_prev else None
+
+    return CursorPage(
+        items=rows, next_cursor=next_cursor, total=total, prev_cursor=prev_cursor
+    )
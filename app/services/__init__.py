@@ -1,6 +1,12 @@
 from . import auth_service
+from . import catalog_service
+from . import resolver_service
 from . import product_service
+from . import search_service
+from . import inventory_service
 from . import cart_service
+from . import cart_expiry_service
 from . import order_service
 from . import chatbot_service
 from . import browse_service
+from . import facet_service
@@ -0,0 +1,522 @@
+# ADK session service backed by the application database.
+#
+# Conversations survive restarts and are shared by every worker process. Hot
+# sessions are cached in process; appending an event only updates the cache
+# and queues the row, and a writer thread inserts queued events in batches
+# behind the response path. A read checks the stored revision (one
+# primary-key lookup) unless the cached copy was loaded or checked less than
+# REVISION_CHECK_INTERVAL_SECONDS ago, so a session changed by another worker
+# is reloaded from the database instead of served stale.
+#
+# The service runs on the shared event loop (the ASGI loop under uvicorn), so
+# every database access happens in a worker thread (asyncio.to_thread) and a
+# slow or locked database never stalls the other chat turns on the loop.
+
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import namedtuple
+from typing import Any, Optional
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.errors.session_not_found_error import SessionNotFoundError
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+from sqlalchemy import delete, insert, select, update
+
+from app.cache import LRUCache
+from app.extensions import db
+from app.models import CHAT_BIND_KEY, AgentSession, AgentSessionEvent
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_SIZE = 2048
+# How long appended events may wait before the writer thread stores them.
+FLUSH_INTERVAL_SECONDS = 0.05
+# Wake the writer early once this many events are queued.
+MAX_BATCH_EVENTS = 500
+# A batch that fails this many times is dropped (and logged) instead of retried.
+MAX_WRITE_ATTEMPTS = 2
+# A cached session loaded or checked this recently is served without checking
+# its revision; a turn reads its session several times within this window.
+REVISION_CHECK_INTERVAL_SECONDS = 1.0
+
+_sessions = AgentSession.__table__
+_events = AgentSessionEvent.__table__
+
+
+def _get_engine():
+    """The engine of the chat database, where the session tables live."""
+    return db.engines[CHAT_BIND_KEY]
+
+
+_CachedSession = namedtuple("_CachedSession", ["session", "revision", "checked_at"])
+_PendingEvent = namedtuple(
+    "_PendingEvent", ["engine", "key", "row", "state", "attempts"]
+)
+
+
+def _session_filter(table, app_name, user_id, session_id):
+    return (
+        (table.c.app_name == app_name)
+        & (table.c.user_id == user_id)
+        & (table.c.session_id == session_id)
+    )
+
+
+def _persistent_state(state) -> str:
+    return json.dumps(
+        {k: v for k, v in state.items() if not k.startswith(State.TEMP_PREFIX)},
+        default=str,
+    )
+
+
+def _copy_session(session: Session, config: Optional[GetSessionConfig] = None):
+    copied = session.model_copy(deep=False)
+    copied.events = list(session.events)
+    copied.state = dict(session.state)
+    if config is not None:
+        if config.num_recent_events is not None:
+            copied.events = (
+                copied.events[-config.num_recent_events :]
+                if config.num_recent_events
+                else []
+            )
+        if config.after_timestamp:
+            copied.events = [
+                e for e in copied.events if e.timestamp >= config.after_timestamp
+            ]
+    return copied
+
+
+class PersistentSessionService(BaseSessionService):
+    """
+    Stores ADK sessions in the `agent_sessions` and `agent_session_events`
+    tables of the current app's chat database (the CHAT_BIND_KEY bind).
+
+    app:- and user:-scoped state is stored with the session it was written in.
+    """
+
+    def __init__(self, cache_size: int = SESSION_CACHE_SIZE):
+        self._cache = LRUCache(max_entries=cache_size)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+
+    # --- Cache and rehydration ---
+
+    def _key(self, app_name, user_id, session_id):
+        return (str(_get_engine().url), app_name, user_id, session_id)
+
+    def _has_pending(self, key) -> bool:
+        with self._pending_lock:
+            return any(p.key == key for p in self._pending)
+
+    def _load(self, key, app_name, user_id, session_id):
+        """Reads a session and its events from the database and caches it."""
+        if self._has_pending(key):
+            self.flush_pending()
+        with _get_engine().connect() as conn:
+            row = conn.execute(
+                select(
+                    _sessions.c.state,
+                    _sessions.c.revision,
+                    _sessions.c.last_update_time,
+                ).where(_session_filter(_sessions, app_name, user_id, session_id))
+            ).first()
+            if row is None:
+                self._cache.pop(key)
+                return None
+            payloads = conn.scalars(
+                select(_events.c.payload)
+                .where(_session_filter(_events, app_name, user_id, session_id))
+                .order_by(_events.c.id)
+            ).all()
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=json.loads(row.state),
+            events=[Event.model_validate_json(p) for p in payloads],
+            last_update_time=row.last_update_time,
+        )
+        self._cache.set(key, _CachedSession(session, row.revision, time.monotonic()))
+        return session
+
+    def _get_recently_checked(self, key):
+        """Returns the cached session if its revision was checked very recently."""
+        cached = self._cache.get(key)
+        if (
+            cached is not None
+            and time.monotonic() - cached.checked_at < REVISION_CHECK_INTERVAL_SECONDS
+        ):
+            return cached.session
+        return None
+
+    def _get_current(self, app_name, user_id, session_id):
+        """
+        Returns the cached session if no other process has changed it since it
+        was cached, otherwise reloads it. Blocking: call it in a worker thread.
+        """
+        key = self._key(app_name, user_id, session_id)
+        with _get_engine().connect() as conn:
+            stored_revision = conn.scalar(
+                select(_sessions.c.revision).where(
+                    _session_filter(_sessions, app_name, user_id, session_id)
+                )
+            )
+        if stored_revision is None:
+            self._discard(key)
+            return None
+        cached = self._cache.get(key)
+        if cached is not None and stored_revision <= cached.revision:
+            self._cache.set(key, cached._replace(checked_at=time.monotonic()))
+            return cached.session
+        logger.debug(f"Rehydrating ADK session {session_id} from the database.")
+        return self._load(key, app_name, user_id, session_id)
+
+    def _discard(self, key):
+        self._cache.pop(key)
+        with self._pending_lock:
+            self._pending = [p for p in self._pending if p.key != key]
+
+    # --- BaseSessionService ---
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (session_id or "").strip() or uuid.uuid4().hex
+        now = time.time()
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=dict(state or {}),
+            last_update_time=now,
+        )
+        key = self._key(app_name, user_id, session_id)
+        await asyncio.to_thread(self._insert_session, session)
+        self._cache.set(key, _CachedSession(session, 0, time.monotonic()))
+        return _copy_session(session)
+
+    def _insert_session(self, session: Session):
+        app_name, user_id, session_id = session.app_name, session.user_id, session.id
+        with _get_engine().begin() as conn:
+            exists = conn.scalar(
+                select(_sessions.c.revision).where(
+                    _session_filter(_sessions, app_name, user_id, session_id)
+                )
+            )
+            if exists is not None:
+                raise AlreadyExistsError(
+                    f"Session with id {session_id} already exists."
+                )
+            conn.execute(
+                insert(_sessions).values(
+                    app_name=app_name,
+                    user_id=user_id,
+                    session_id=session_id,
+                    state=_persistent_state(session.state),
+                    revision=0,
+                    last_update_time=session.last_update_time,
+                )
+            )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session = self._get_recently_checked(self._key(app_name, user_id, session_id))
+        if session is None:
+            session = await asyncio.to_thread(
+                self._get_current, app_name, user_id, session_id
+            )
+        return None if session is None else _copy_session(session, config)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        rows = await asyncio.to_thread(self._list_rows, app_name, user_id)
+        return ListSessionsResponse(
+            sessions=[
+                Session(
+                    app_name=app_name,
+                    user_id=row.user_id,
+                    id=row.session_id,
+                    state=json.loads(row.state),
+                    last_update_time=row.last_update_time,
+                )
+                for row in rows
+            ]
+        )
+
+    def _list_rows(self, app_name, user_id):
+        self.flush_pending()
+        query = select(
+            _sessions.c.user_id,
+            _sessions.c.session_id,
+            _sessions.c.state,
+            _sessions.c.last_update_time,
+        ).where(_sessions.c.app_name == app_name)
+        if user_id is not None:
+            query = query.where(_sessions.c.user_id == user_id)
+        with _get_engine().connect() as conn:
+            return conn.execute(
+                query.order_by(
+                    _sessions.c.last_update_time,
+                    _sessions.c.user_id,
+                    _sessions.c.session_id,
+                )
+            ).all()
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        self._discard(self._key(app_name, user_id, session_id))
+        await asyncio.to_thread(self._delete_rows, app_name, user_id, session_id)
+
+    def _delete_rows(self, app_name, user_id, session_id):
+        with _get_engine().begin() as conn:
+            conn.execute(
+                delete(_events).where(
+                    _session_filter(_events, app_name, user_id, session_id)
+                )
+            )
+            conn.execute(
+                delete(_sessions).where(
+                    _session_filter(_sessions, app_name, user_id, session_id)
+                )
+            )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+
+        key = self._key(session.app_name, session.user_id, session.id)
+        cached = self._cache.get(key)
+        if cached is None:
+            stored = await asyncio.to_thread(
+                self._load, key, session.app_name, session.user_id, session.id
+            )
+            if stored is None:
+                raise SessionNotFoundError(f"Session {session.id} not found.")
+            cached = self._cache.get(key)
+        stored = cached.session
+        if any(e == event for e in stored.events if e.id == event.id):
+            return event  # Re-delivered event
+
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        if stored is not session:
+            self._update_session_state(stored, event)
+            stored.events.append(event)
+            stored.last_update_time = event.timestamp
+        self._cache.set(key, cached._replace(revision=cached.revision + 1))
+
+        self._enqueue(
+            _PendingEvent(
+                engine=_get_engine(),
+                key=key,
+                row={
+                    "app_name": session.app_name,
+                    "user_id": session.user_id,
+                    "session_id": session.id,
+                    "event_id": event.id,
+                    "timestamp": event.timestamp,
+                    "payload": event.model_dump_json(exclude_none=True),
+                },
+                state=_persistent_state(stored.state),
+                attempts=0,
+            )
+        )
+        return event
+
+    async def compact_session(
+        self, session: Session, keep_from: int, summary_event: Event
+    ) -> bool:
+        """
+        Replaces the first `keep_from` events of a session with `summary_event`.
+
+        The summary takes over the database row of the last replaced event, so
+        it keeps its place in the event order.
+
+        Returns:
+            bool: False if the session changed or disappeared since `session`
+            was read, in which case nothing is replaced.
+        """
+        if keep_from <= 0:
+            return False
+        stored = await asyncio.to_thread(
+            self._compact_rows, session, keep_from, summary_event
+        )
+        if stored is None:
+            return False
+
+        key = self._key(session.app_name, session.user_id, session.id)
+        cached = self._cache.get(key)
+        stored.events[:keep_from] = [summary_event]
+        if cached is not None:
+            self._cache.set(key, cached._replace(revision=cached.revision + 1))
+        return True
+
+    def _compact_rows(self, session: Session, keep_from: int, summary_event: Event):
+        """
+        Replaces the stored rows for compact_session(). Returns the cached
+        session to update, or None if nothing was replaced.
+        """
+        self.flush_pending()
+        stored = self._get_current(session.app_name, session.user_id, session.id)
+        if (
+            stored is None
+            or len(stored.events) < keep_from
+            or stored.events[keep_from - 1].id != session.events[keep_from - 1].id
+        ):
+            return None
+
+        where_session = _session_filter(
+            _events, session.app_name, session.user_id, session.id
+        )
+        with _get_engine().begin() as conn:
+            event_ids = conn.scalars(
+                select(_events.c.id)
+                .where(where_session)
+                .order_by(_events.c.id)
+                .limit(keep_from)
+            ).all()
+            if len(event_ids) < keep_from:
+                return None
+            conn.execute(
+                update(_events)
+                .where(_events.c.id == event_ids[-1])
+                .values(
+                    event_id=summary_event.id,
+                    timestamp=summary_event.timestamp,
+                    payload=summary_event.model_dump_json(exclude_none=True),
+                )
+            )
+            conn.execute(
+                delete(_events).where(where_session, _events.c.id < event_ids[-1])
+            )
+            conn.execute(
+                update(_sessions)
+                .where(
+                    _session_filter(
+                        _sessions, session.app_name, session.user_id, session.id
+                    )
+                )
+                .values(revision=_sessions.c.revision + 1)
+            )
+        return stored
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self.flush_pending)
+
+    # --- Write-behind ---
+
+    def _enqueue(self, pending_event):
+        with self._pending_lock:
+            self._pending.append(pending_event)
+            queued = len(self._pending)
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run_writer, name="agent-session-writer", daemon=True
+                )
+                self._writer.start()
+                atexit.register(self.flush_pending)
+        if queued >= MAX_BATCH_EVENTS:
+            self._wakeup.set()
+
+    def _run_writer(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush_pending()
+            except Exception as e:
+                logger.error(f"ADK session writer failed: {e}", exc_info=True)
+
+    def flush_pending(self) -> int:
+        """
+        Writes every queued event now: one UPDATE per session and one
+        executemany INSERT for the events of each database.
+
+        Returns:
+            int: The number of events written.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            by_engine = {}
+            for pending_event in batch:
+                by_engine.setdefault(pending_event.engine, []).append(pending_event)
+
+            written = 0
+            for engine, pending_events in by_engine.items():
+                try:
+                    written += self._write_batch(engine, pending_events)
+                except Exception as e:
+                    retry = [
+                        p._replace(attempts=p.attempts + 1)
+                        for p in pending_events
+                        if p.attempts + 1 < MAX_WRITE_ATTEMPTS
+                    ]
+                    logger.error(
+                        f"Failed to store {len(pending_events)} ADK session events "
+                        f"({len(retry)} will be retried): {e}",
+                        exc_info=True,
+                    )
+                    with self._pending_lock:
+                        self._pending[:0] = retry
+            return written
+
+    def _write_batch(self, engine, pending_events) -> int:
+        sessions = {}
+        for pending_event in pending_events:
+            counts = sessions.setdefault(pending_event.key, [0, None, None])
+            counts[0] += 1
+            counts[1] = pending_event.state
+            counts[2] = pending_event.row["timestamp"]
+
+        with engine.begin() as conn:
+            live_keys = set()
+            for key, (count, state, last_update_time) in sessions.items():
+                _, app_name, user_id, session_id = key
+                result = conn.execute(
+                    update(_sessions)
+                    .where(_session_filter(_sessions, app_name, user_id, session_id))
+                    .values(
+                        revision=_sessions.c.revision + count,
+                        state=state,
+                        last_update_time=last_update_time,
+                    )
+                )
+                if result.rowcount == 1:
+                    live_keys.add(key)
+            # Events of sessions deleted in the meantime are dropped.
+            rows = [p.row for p in pending_events if p.key in live_keys]
+            if rows:
+                conn.execute(insert(_events), rows)
+        return len(rows)
@@ -1,40 +1,33 @@
 from app.models import Product
+from app.cache import LRUCache
 from app.extensions import db
+from app.pagination import paginate_by_cursor
+from app.services import catalog_service, search_service
+from app.sqlite_profile import read_only
 
 DEFAULT_PER_PAGE = 20
+CATEGORIES_CACHE_TTL_SECONDS = 300
 
+_categories_cache = LRUCache(max_entries=8, ttl_seconds=CATEGORIES_CACHE_TTL_SECONDS)
 
-def get_filtered_products(
+
+def build_filtered_query(
     search_term=None,
     categories=None,
     min_price=None,
     max_price=None,
     in_stock_only=False,
     min_rating=None,
-    page=1,
-    per_page=DEFAULT_PER_PAGE,
+    ranked_search=True,
 ):
-    """
-    Fetches products based on various filter criteria and handles pagination.
-
-    Args:
-        search_term (str, optional): Term to search in product names.
-        categories (list, optional): List of category names to filter by.
-        min_price (float, optional): Minimum product price.
-        max_price (float, optional): Maximum product price.
-        in_stock_only (bool, optional): If True, only return products with quantity > 0.
-        min_rating (float, optional): Minimum product rating.
-        page (int, optional): Current page number for pagination.
-        per_page (int, optional): Number of items per page.
-
-    Returns:
-        Pagination: A Flask-SQLAlchemy Pagination object containing the filtered products.
-    """
+    """Builds the filtered Product query shared by pagination and facets."""
     query = Product.query
 
-    # Apply search term filter (case-insensitive)
+    # Apply full-text search filter (ranked by relevance when indexed)
     if search_term:
-        query = query.filter(Product.name.ilike(f"%{search_term}%"))
+        query = search_service.apply_search_filter(
+            query, search_term, ranked=ranked_search
+        )
 
     # Apply category filter
     if categories:
@@ -71,8 +64,48 @@ def get_filtered_products(
         except (ValueError, TypeError):
             pass  # Ignore invalid rating
 
-    # Order results (e.g., by name)
-    query = query.order_by(Product.name)
+    return query
+
+
+@read_only()
+def get_filtered_products(
+    search_term=None,
+    categories=None,
+    min_price=None,
+    max_price=None,
+    in_stock_only=False,
+    min_rating=None,
+    page=1,
+    per_page=DEFAULT_PER_PAGE,
+):
+    """
+    Fetches products based on various filter criteria and handles pagination.
+
+    Args:
+        search_term (str, optional): Term to search in product names, descriptions
+            and categories. Matches are ranked by relevance, then by name.
+        categories (list, optional): List of category names to filter by.
+        min_price (float, optional): Minimum product price.
+        max_price (float, optional): Maximum product price.
+        in_stock_only (bool, optional): If True, only return products with quantity > 0.
+        min_rating (float, optional): Minimum product rating.
+        page (int, optional): Current page number for pagination.
+        per_page (int, optional): Number of items per page.
+
+    Returns:
+        Pagination: A Flask-SQLAlchemy Pagination object containing the filtered products.
+    """
+    query = build_filtered_query(
+        search_term=search_term,
+        categories=categories,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        min_rating=min_rating,
+    )
+
+    # Order results by name (after relevance, if searching); id keeps pages stable
+    query = query.order_by(Product.name, Product.id)
 
     # Apply pagination
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -80,13 +113,87 @@ def get_filtered_products(
     return pagination
 
 
+@read_only()
+def get_filtered_products_page(
+    search_term=None,
+    categories=None,
+    min_price=None,
+    max_price=None,
+    in_stock_only=False,
+    min_rating=None,
+    cursor=None,
+    per_page=DEFAULT_PER_PAGE,
+    with_total=False,
+    before=None,
+):
+    """
+    Fetches one page of filtered products using keyset pagination on (name, id).
+
+    Takes the same filters as `get_filtered_products`. Unlike page numbers, the
+    cost of a page does not grow with its depth. Search matches are ordered by
+    name rather than relevance so that the sort key stays stable across pages;
+    use `get_filtered_products` to page searches in relevance order.
+    Without a search term, the in-memory catalog snapshot is used when enabled.
+
+    Args:
+        cursor (str, optional): The `next_cursor` of the previous page.
+        per_page (int, optional): Number of items per page.
+        with_total (bool, optional): Also count all matching products.
+        before (str, optional): The `prev_cursor` of the next page, to page back.
+
+    Returns:
+        CursorPage: The products, the cursors for the next and previous pages
+            and the optional total.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    if not search_term and catalog_service.is_enabled():
+        return catalog_service.get_snapshot().page(
+            categories=categories,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock_only=in_stock_only,
+            min_rating=min_rating,
+            cursor=cursor,
+            per_page=per_page,
+            with_total=with_total,
+            before=before,
+        )
+
+    query = build_filtered_query(
+        search_term=search_term,
+        categories=categories,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        min_rating=min_rating,
+        ranked_search=False,
+    )
+    return paginate_by_cursor(
+        query,
+        (Product.name, Product.id),
+        cursor=cursor,
+        per_page=per_page,
+        with_total=with_total,
+        before=before,
+    )
+
+
+@read_only()
 def get_all_categories():
     """
     Fetches a list of unique product categories from the database.
+    The list is cached until the catalog version changes.
 
     Returns:
         list: A list of unique category names, sorted alphabetically.
     """
+    cache_key = (str(db.engine.url), catalog_service.get_catalog_version())
+    return _categories_cache.get_or_set(cache_key, _load_all_categories)
+
+
+def _load_all_categories():
     categories = (
         db.session.query(Product.category).distinct().order_by(Product.category).all()
     )
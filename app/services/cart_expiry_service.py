@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app.extensions import db
+from app.models import CartItem
+from app.services import inventory_service, tool_cache_service, user_stats_service
+
+logger = logging.getLogger(__name__)
+
+# Pause between batches so other writers can take the SQLite write lock.
+BATCH_PAUSE_SECONDS = 0.05
+
+_cart_items = CartItem.__table__
+
+
+def release_expired_reservations(
+    ttl_seconds: int, batch_size: int = 500, max_batches: int = None
+) -> int:
+    """
+    Deletes cart items added more than `ttl_seconds` ago and returns their
+    stock to the products.
+
+    Works in set-based batches: each batch is one DELETE ... RETURNING plus
+    one bulk stock release, committed on its own so the write lock is only
+    held briefly.
+
+    Returns:
+        int: The number of cart items released.
+    """
+    cutoff = datetime.now() - timedelta(seconds=ttl_seconds)
+    expired_ids = (
+        select(_cart_items.c.id)
+        .where(_cart_items.c.added_at < cutoff)
+        .order_by(_cart_items.c.added_at)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    released = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            removed = db.session.execute(
+                delete(_cart_items)
+                .where(_cart_items.c.id.in_(expired_ids))
+                .returning(
+                    _cart_items.c.user_id,
+                    _cart_items.c.product_id,
+                    _cart_items.c.quantity,
+                )
+            ).all()
+            quantities = {}
+            for user_id, product_id, quantity in removed:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+                tool_cache_service.note_user_data_change(user_id)
+            inventory_service.release_stock_bulk(quantities)
+            user_stats_service.refresh_cart_stats(
+                {user_id for user_id, _, _ in removed}
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        released += len(removed)
+        batches += 1
+        if len(removed) < batch_size:
+            break
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+    if released:
+        logger.info(f"Released {released} expired cart reservations.")
+    return released
+
+
+def start_cart_sweeper(app):
+    """
+    Starts a daemon thread that periodically releases expired cart
+    reservations using the app's CART_* settings.
+
+    Returns:
+        threading.Event: Set it to stop the sweeper.
+    """
+    stop_event = threading.Event()
+    interval = app.config["CART_SWEEP_INTERVAL_SECONDS"]
+
+    def run():
+        while not stop_event.wait(interval):
+            with app.app_context():
+                try:
+                    release_expired_reservations(
+                        app.config["CART_RESERVATION_TTL_SECONDS"],
+                        batch_size=app.config["CART_SWEEP_BATCH_SIZE"],
+                    )
+                except Exception as e:
+                    logger.error(f"Cart sweeper run failed: {e}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name="cart-sweeper", daemon=True)
+    thread.start()
+    logger.info(f"Started cart reservation sweeper (every {interval}s).")
+    return stop_event
@@ -1,70 +1,89 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
 from app.models import Product, CartItem
 from app.extensions import db
+from app.services import inventory_service, tool_cache_service, user_stats_service
 
 
 def add_to_cart(user_id: int, product_id: int, quantity: int) -> str:
     if quantity <= 0:
         raise ValueError("Quantity must be positive.")
 
-    product = Product.query.get(product_id)
-    if not product:
+    product_name = db.session.scalar(
+        db.select(Product.name).where(Product.id == product_id)
+    )
+    if product_name is None:
         raise ValueError(f"Product with ID {product_id} not found.")
 
-    cart_item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-
-    if cart_item:
-        new_quantity = cart_item.quantity + quantity
-        if product.quantity_in_stock < (
-            new_quantity - cart_item.quantity
-        ):  # Check only additional quantity
-            raise ValueError(
-                f"Not enough stock for {product.name}. Only {product.quantity_in_stock} more available."
-            )
-        cart_item.quantity = new_quantity
-        product.quantity_in_stock -= quantity
-        message = (
-            f"Updated {product.name} quantity to {cart_item.quantity} in your cart."
-        )
-    else:
-        if product.quantity_in_stock < quantity:
+    try:
+        if not inventory_service.reserve_stock(product_id, quantity):
+            available = inventory_service.get_available_stock(product_id) or 0
+            db.session.rollback()
             raise ValueError(
-                f"Not enough stock for {product.name}. Only {product.quantity_in_stock} available."
+                f"Not enough stock for {product_name}. Only {available} available."
             )
-        cart_item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
-        product.quantity_in_stock -= quantity
-        db.session.add(cart_item)
-        message = f"Added {quantity} x {product.name} to your cart."
 
-    db.session.add(product)
-    try:
+        # Insert the cart row, or add to its quantity if the product is already there.
+        # Adding again also restarts the item's reservation (the cart sweeper's TTL).
+        upsert = sqlite_insert(CartItem.__table__).values(
+            user_id=user_id,
+            product_id=product_id,
+            quantity=quantity,
+            added_at=datetime.now(),
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=["user_id", "product_id"],
+            set_={
+                "quantity": CartItem.__table__.c.quantity + upsert.excluded.quantity,
+                "added_at": upsert.excluded.added_at,
+            },
+        ).returning(CartItem.__table__.c.quantity)
+        new_quantity = db.session.execute(upsert).scalar_one()
+        user_stats_service.refresh_cart_stats([user_id])
+        tool_cache_service.note_user_data_change(user_id)
         db.session.commit()
-        return message
+    except ValueError:
+        raise
     except Exception:
         db.session.rollback()
         raise ValueError("Could not update cart due to a database error.")
 
+    if new_quantity == quantity:
+        return f"Added {quantity} x {product_name} to your cart."
+    return f"Updated {product_name} quantity to {new_quantity} in your cart."
 
-def remove_from_cart(user_id: int, product_id: int) -> str:
-    cart_item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
 
-    if not cart_item:
-        raise ValueError("Item not found in your cart.")
-
-    product = Product.query.get(product_id)
-    item_name = f"Product ID {product_id}"
-    if product:
-        product.quantity_in_stock += cart_item.quantity
-        db.session.add(product)
-        item_name = product.name
-
-    db.session.delete(cart_item)
+def remove_from_cart(user_id: int, product_id: int) -> str:
     try:
+        removed_quantity = db.session.execute(
+            delete(CartItem.__table__)
+            .where(CartItem.__table__.c.user_id == user_id)
+            .where(CartItem.__table__.c.product_id == product_id)
+            .returning(CartItem.__table__.c.quantity)
+        ).scalar()
+        if removed_quantity is None:
+            db.session.rollback()
+            raise ValueError("Item not found in your cart.")
+
+        inventory_service.release_stock(product_id, removed_quantity)
+        user_stats_service.refresh_cart_stats([user_id])
+        tool_cache_service.note_user_data_change(user_id)
+        product_name = db.session.scalar(
+            db.select(Product.name).where(Product.id == product_id)
+        )
         db.session.commit()
-        return f"Removed {item_name} from your cart."
+    except ValueError:
+        raise
     except Exception:
         db.session.rollback()
         raise ValueError("Could not update cart due to a database error.")
 
+    item_name = product_name or f"Product ID {product_id}"
+    return f"Removed {item_name} from your cart."
+
 
 def get_cart_contents(user_id: int):
     return (
@@ -76,22 +95,19 @@ def get_cart_contents(user_id: int):
 
 
 def clear_cart(user_id: int):
-    cart_items = CartItem.query.filter_by(user_id=user_id).all()
-    if not cart_items:
-        return
-
-    product_ids_quantities = {item.product_id: item.quantity for item in cart_items}
-
-    CartItem.query.filter_by(user_id=user_id).delete()
-
-    products_to_update = Product.query.filter(
-        Product.id.in_(product_ids_quantities.keys())
-    ).all()
-    for product in products_to_update:
-        product.quantity_in_stock += product_ids_quantities.get(product.id, 0)
-        db.session.add(product)
-
+    """Empties a user's cart and returns the reserved stock to the products."""
     try:
+        removed = db.session.execute(
+            delete(CartItem.__table__)
+            .where(CartItem.__table__.c.user_id == user_id)
+            .returning(CartItem.__table__.c.product_id, CartItem.__table__.c.quantity)
+        ).all()
+        if removed:
+            inventory_service.release_stock_bulk(
+                {product_id: quantity for product_id, quantity in removed}
+            )
+            user_stats_service.refresh_cart_stats([user_id])
+            tool_cache_service.note_user_data_change(user_id)
         db.session.commit()
     except Exception:
         db.session.rollback()
@@ -99,6 +115,4 @@ def clear_cart(user_id: int):
 
 
 def get_cart_total(user_id: int) -> float:
-    items = get_cart_contents(user_id)
-    total = sum(item.quantity * item.product.price for item in items)
-    return total
+    return user_stats_service.get_user_stats(user_id).cart_total
@@ -0,0 +1,359 @@
+# Optional in-process, column-oriented snapshot of the product catalog.
+#
+# With CATALOG_SNAPSHOT_ENABLED (and NumPy installed), browse requests without a
+# search term are answered from NumPy arrays instead of SQLite: filters become
+# vectorized masks and name ordering comes from the load order. The snapshot is
+# kept current from committed ORM writes; code that changes products with bulk
+# SQL must call invalidate(). This module also owns the catalog version that
+# caches of catalog-derived data (facets, agent answers) use as their key.
+
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Product
+from app.pagination import CursorPage, decode_cursor, encode_cursor
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Read-only stand-in for Product rows served from the snapshot.
+CatalogProduct = namedtuple(
+    "CatalogProduct",
+    ["id", "name", "description", "price", "quantity_in_stock", "rating", "category"],
+)
+
+_SNAPSHOT_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.price,
+    Product.quantity_in_stock,
+    Product.rating,
+    Product.category,
+)
+
+_snapshots = {}
+_catalog_versions = {}
+_change_listeners = []
+_snapshots_lock = threading.Lock()
+
+
+class CatalogSnapshot:
+    """Array-backed copy of the `products` table for one database."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._needs_reload = True
+        self._stale_ids = set()
+
+    def _load(self):
+        rows = db.session.execute(
+            db.select(*_SNAPSHOT_COLUMNS).order_by(Product.name, Product.id)
+        ).all()
+        count = len(rows)
+
+        # Rows are stored in (name, id) order, so the name permutation is the identity.
+        self.ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=count)
+        self.names = [r.name for r in rows]
+        self.descriptions = [r.description for r in rows]
+        self.sort_keys = [(r.name, r.id) for r in rows]
+        self.price = np.fromiter((r.price for r in rows), dtype=np.float64, count=count)
+        self.stock = np.fromiter(
+            (r.quantity_in_stock for r in rows), dtype=np.int64, count=count
+        )
+        self.rating = np.fromiter(
+            (r.rating or 0.0 for r in rows), dtype=np.float64, count=count
+        )
+        self.categories = sorted({r.category for r in rows})
+        self._category_codes = {c: i for i, c in enumerate(self.categories)}
+        self.category_code = np.fromiter(
+            (self._category_codes[r.category] for r in rows),
+            dtype=np.int32,
+            count=count,
+        )
+        self.alive = np.ones(count, dtype=bool)
+        self._row_by_id = {
+            product_id: i for i, product_id in enumerate(self.ids.tolist())
+        }
+        self._needs_reload = False
+        self._stale_ids.clear()
+        logger.info(f"Loaded catalog snapshot with {count} products.")
+
+    def _refresh(self):
+        """Brings the snapshot up to date before a read (caller holds the lock)."""
+        if not self._needs_reload and self._stale_ids:
+            stale_ids = list(self._stale_ids)
+            self._stale_ids.clear()
+            rows = db.session.execute(
+                db.select(*_SNAPSHOT_COLUMNS).where(Product.id.in_(stale_ids))
+            ).all()
+            found = set()
+            for row in rows:
+                found.add(row.id)
+                self._apply_row(row._asdict())
+            for product_id in stale_ids:
+                if product_id not in found:
+                    self._apply_delete(product_id)
+        if self._needs_reload:
+            self._load()
+
+    def _apply_row(self, values):
+        row = self._row_by_id.get(values["id"])
+        if row is None or self.names[row] != values["name"]:
+            # New or renamed product: the name ordering changes, rebuild it.
+            self._needs_reload = True
+            return
+        category_code = self._category_codes.get(values["category"])
+        if category_code is None:
+            self._needs_reload = True
+            return
+        self.descriptions[row] = values["description"]
+        self.price[row] = values["price"]
+        self.stock[row] = values["quantity_in_stock"]
+        self.rating[row] = values["rating"] or 0.0
+        self.category_code[row] = category_code
+
+    def _apply_delete(self, product_id):
+        row = self._row_by_id.get(product_id)
+        if row is not None:
+            self.alive[row] = False
+
+    def apply_changes(self, changed, deleted_ids):
+        """Applies committed product writes without touching the database."""
+        with self._lock:
+            if self._needs_reload:
+                return
+            for values in changed.values():
+                self._apply_row(values)
+            for product_id in deleted_ids:
+                self._apply_delete(product_id)
+
+    def invalidate(self, product_ids=None):
+        """Marks products (or, with no ids, the whole catalog) as changed outside the ORM."""
+        with self._lock:
+            if product_ids is None:
+                self._needs_reload = True
+            else:
+                self._stale_ids.update(product_ids)
+
+    def _mask(self, categories, min_price, max_price, in_stock_only, min_rating):
+        mask = self.alive & (self.stock > 0)
+        if categories:
+            if not isinstance(categories, list):
+                categories = [categories]
+            codes = [
+                self._category_codes[c] for c in categories if c in self._category_codes
+            ]
+            mask &= np.isin(self.category_code, codes)
+        for value, column, compare in (
+            (min_price, self.price, np.greater_equal),
+            (max_price, self.price, np.less_equal),
+            (min_rating, self.rating, np.greater_equal),
+        ):
+            if value is None:
+                continue
+            try:
+                mask &= compare(column, float(value))
+            except (ValueError, TypeError):
+                pass  # Ignore invalid bounds, like the SQL path
+        return mask
+
+    def page(
+        self,
+        categories=None,
+        min_price=None,
+        max_price=None,
+        in_stock_only=False,
+        min_rating=None,
+        cursor=None,
+        per_page=20,
+        with_total=False,
+        before=None,
+    ):
+        """
+        Evaluates browse filters against the snapshot.
+
+        Returns the same CursorPage (and cursor format) as the SQL keyset path.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        with self._lock:
+            self._refresh()
+            boundary = None
+            if before or cursor:
+                name, product_id = decode_cursor(
+                    before or cursor, (Product.name, Product.id)
+                )
+                bisect = bisect_left if before else bisect_right
+                try:
+                    boundary = bisect(self.sort_keys, (name, product_id))
+                except TypeError as e:
+                    raise ValueError("Invalid pagination cursor.") from e
+
+            mask = self._mask(
+                categories, min_price, max_price, in_stock_only, min_rating
+            )
+            if before:
+                rows = np.flatnonzero(mask[:boundary])[-(per_page + 1) :]
+                more = len(rows) > per_page
+                rows = rows[-per_page:]
+                has_next, has_prev = True, more
+            else:
+                start = boundary or 0
+                rows = np.flatnonzero(mask[start:])[: per_page + 1] + start
+                more = len(rows) > per_page
+                rows = rows[:per_page]
+                has_next, has_prev = more, bool(cursor)
+            total = int(np.count_nonzero(mask)) if with_total else None
+
+            next_cursor = prev_cursor = None
+            if len(rows):
+                if has_next:
+                    next_cursor = encode_cursor(self.sort_keys[rows[-1]])
+                if has_prev:
+                    prev_cursor = encode_cursor(self.sort_keys[rows[0]])
+
+            items = [
+                CatalogProduct(
+                    id=int(self.ids[i]),
+                    name=self.names[i],
+                    description=self.descriptions[i],
+                    price=float(self.price[i]),
+                    quantity_in_stock=int(self.stock[i]),
+                    rating=float(self.rating[i]),
+                    category=self.categories[self.category_code[i]],
+                )
+                for i in rows.tolist()
+            ]
+        return CursorPage(
+            items=items, next_cursor=next_cursor, total=total, prev_cursor=prev_cursor
+        )
+
+
+def is_enabled() -> bool:
+    """Returns True if browse reads should be served from the snapshot."""
+    if not current_app.config.get("CATALOG_SNAPSHOT_ENABLED", False):
+        return False
+    if np is None:
+        logger.warning("CATALOG_SNAPSHOT_ENABLED is set but NumPy is not installed.")
+        return False
+    return True
+
+
+def get_snapshot() -> CatalogSnapshot:
+    """Returns the snapshot for the current database, creating it on first use."""
+    key = str(db.engine.url)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.setdefault(key, CatalogSnapshot())
+    return snapshot
+
+
+def get_catalog_version() -> int:
+    """
+    Returns a counter that increases whenever products are committed in this
+    process. Caches of catalog-derived data use it as their invalidation key.
+    """
+    return _catalog_versions.get(str(db.engine.url), 0)
+
+
+def _bump_catalog_version(url_key):
+    with _snapshots_lock:
+        _catalog_versions[url_key] = _catalog_versions.get(url_key, 0) + 1
+
+
+def register_change_listener(on_commit, on_invalidate):
+    """
+    Subscribes another in-process catalog structure to product changes.
+
+    Args:
+        on_commit: Called as on_commit(url_key, changed, deleted_ids) after a
+            commit, where `changed` maps product id -> column values.
+        on_invalidate: Called as on_invalidate(url_key, product_ids) when
+            products were changed by SQL outside the ORM (None means all).
+    """
+    _change_listeners.append((on_commit, on_invalidate))
+
+
+def invalidate(product_ids=None):
+    """Tells catalog caches that products were changed by SQL outside the ORM."""
+    _invalidate(str(db.engine.url), product_ids)
+
+
+def note_bulk_update(product_ids):
+    """
+    Records products changed by SQL in the current transaction. Catalog caches
+    are invalidated for them once the transaction commits.
+    """
+    db.session.info.setdefault("catalog_stale_ids", set()).update(product_ids)
+
+
+def _invalidate(key, product_ids):
+    _bump_catalog_version(key)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        snapshot.invalidate(product_ids)
+    for _, on_invalidate in _change_listeners:
+        on_invalidate(key, product_ids)
+
+
+# --- Incremental refresh from ORM writes ---
+# Product values are captured at flush time and applied only once the
+# transaction commits, so rolled-back changes never reach the snapshot.
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_product_changes(session, flush_context):
+    changed = deleted_ids = None
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Product) and obj.id is not None:
+            if changed is None:
+                changed, deleted_ids = session.info.setdefault(
+                    "catalog_changes", ({}, set())
+                )
+            changed[obj.id] = {c.key: getattr(obj, c.key) for c in _SNAPSHOT_COLUMNS}
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            if changed is None:
+                changed, deleted_ids = session.info.setdefault(
+                    "catalog_changes", ({}, set())
+                )
+            changed.pop(obj.id, None)
+            deleted_ids.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_product_changes(session):
+    stale_ids = session.info.pop("catalog_stale_ids", None)
+    if stale_ids:
+        _invalidate(str(session.get_bind().url), stale_ids)
+
+    changes = session.info.pop("catalog_changes", None)
+    if not changes or not (changes[0] or changes[1]):
+        return
+    key = str(session.get_bind().url)
+    _bump_catalog_version(key)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        snapshot.apply_changes(*changes)
+    for on_commit, _ in _change_listeners:
+        on_commit(key, *changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_product_changes(session):
+    session.info.pop("catalog_changes", None)
+    session.info.pop("catalog_stale_ids", None)
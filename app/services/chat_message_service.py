@@ -0,0 +1,176 @@
+# Write-behind storage of chat messages.
+#
+# Every chat turn stores two ChatMessage rows. Committing them before the
+# reply is returned made every turn pay for a write transaction (and its
+# fsync). Instead, queue_message() queues the row and a writer thread inserts
+# queued rows in one transaction per database, every FLUSH_INTERVAL_SECONDS
+# or as soon as MAX_BATCH_MESSAGES are waiting. The queue is flushed at exit.
+#
+# Reads of a user's history call flush_user() first, so a user always sees
+# their own messages even before the writer has stored them. Messages queued
+# in another worker process become visible once that process flushes.
+
+import atexit
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app import metrics
+from app.extensions import db
+from app.models import CHAT_BIND_KEY, ChatMessage, MessageSender
+from app.services import user_stats_service
+
+logger = logging.getLogger(__name__)
+
+# How long queued messages may wait before the writer thread stores them.
+FLUSH_INTERVAL_SECONDS = 0.5
+# Wake the writer early once this many messages are queued.
+MAX_BATCH_MESSAGES = 500
+# A batch that fails this many times is dropped (and logged) instead of retried.
+MAX_WRITE_ATTEMPTS = 3
+
+_PendingMessage = namedtuple("_PendingMessage", ["engine", "row", "attempts"])
+
+_pending = []
+_pending_lock = threading.Lock()
+# Held while a batch is written, so flush_user() and discard_user() wait for
+# rows that were already taken off the queue.
+_write_lock = threading.Lock()
+_wakeup = threading.Event()
+_writer = None
+
+
+def is_enabled() -> bool:
+    return current_app.config.get("CHAT_MESSAGE_WRITE_BEHIND", True)
+
+
+def queue_message(
+    user_id: int,
+    sender: MessageSender,
+    message_text: str,
+    timestamp: Optional[datetime] = None,
+):
+    """
+    Stores a chat message: queued for the writer thread when write-behind is
+    enabled, otherwise inserted and committed right away.
+    """
+    row = {
+        "user_id": user_id,
+        "sender": sender,
+        "message_text": message_text,
+        "timestamp": timestamp or datetime.now(),
+    }
+    if not is_enabled():
+        db.session.add(ChatMessage(**row))
+        user_stats_service.record_messages(db.session, {user_id: 1})
+        db.session.commit()
+        return
+    _enqueue(_PendingMessage(db.engines[CHAT_BIND_KEY], row, 0))
+
+
+def _enqueue(pending_message):
+    global _writer
+    with _pending_lock:
+        _pending.append(pending_message)
+        queued = len(_pending)
+        if _writer is None:
+            _writer = threading.Thread(
+                target=_run_writer, name="chat-message-writer", daemon=True
+            )
+            _writer.start()
+            atexit.register(flush_pending)
+    if queued >= MAX_BATCH_MESSAGES:
+        _wakeup.set()
+
+
+def _run_writer():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL_SECONDS)
+        _wakeup.clear()
+        try:
+            flush_pending()
+        except Exception as e:
+            logger.error(f"Chat message writer failed: {e}", exc_info=True)
+
+
+def flush_pending() -> int:
+    """
+    Writes every queued message now, with one executemany INSERT (and one
+    update of the users' message counters) per database.
+
+    Returns:
+        int: The number of messages written.
+    """
+    global _pending
+    with _write_lock:
+        with _pending_lock:
+            batch, _pending = _pending, []
+        if not batch:
+            return 0
+
+        by_engine = {}
+        for pending_message in batch:
+            by_engine.setdefault(pending_message.engine, []).append(pending_message)
+
+        written = 0
+        for engine, pending_messages in by_engine.items():
+            try:
+                message_counts = {}
+                for p in pending_messages:
+                    user_id = p.row["user_id"]
+                    message_counts[user_id] = message_counts.get(user_id, 0) + 1
+                with engine.begin() as conn:
+                    conn.execute(
+                        insert(ChatMessage.__table__),
+                        [p.row for p in pending_messages],
+                    )
+                    user_stats_service.record_messages(conn, message_counts)
+                written += len(pending_messages)
+                metrics.increment("chat.message_write_transactions")
+            except Exception as e:
+                retry = [
+                    p._replace(attempts=p.attempts + 1)
+                    for p in pending_messages
+                    if p.attempts + 1 < MAX_WRITE_ATTEMPTS
+                ]
+                logger.error(
+                    f"Failed to store {len(pending_messages)} chat messages "
+                    f"({len(retry)} will be retried): {e}",
+                    exc_info=True,
+                )
+                with _pending_lock:
+                    _pending[:0] = retry
+        metrics.increment("chat.messages_written", written)
+        return written
+
+
+def flush_user(user_id: int):
+    """Stores the queued messages of a user before their history is read."""
+    with _pending_lock:
+        queued = any(p.row["user_id"] == user_id for p in _pending)
+    if queued:
+        flush_pending()
+    else:
+        # Wait for a batch that may be being written right now.
+        with _write_lock:
+            pass
+
+
+def discard_user(user_id: int) -> int:
+    """
+    Drops the queued messages of a user (when their history is cleared).
+
+    Returns:
+        int: The number of messages dropped.
+    """
+    global _pending
+    with _write_lock, _pending_lock:
+        kept = [p for p in _pending if p.row["user_id"] != user_id]
+        dropped = len(_pending) - len(kept)
+        _pending = kept
+    return dropped
@@ -0,0 +1,290 @@
+# Keeps the prompt of long conversations bounded.
+#
+# After a turn, a session that has passed CHAT_COMPACTION_MAX_EVENTS events or
+# CHAT_COMPACTION_MAX_TOKENS estimated tokens has everything except its last
+# CHAT_COMPACTION_KEEP_TURNS user turns replaced by one summary event. The
+# summary is built without a model call: one short line per message and tool
+# call, appended to the previous summary (oldest lines are dropped once it
+# passes CHAT_SUMMARY_MAX_CHARS). Before every model call, tool results of
+# earlier turns are cut to CHAT_TOOL_DIGEST_CHARS, and the prompt size is
+# recorded in app.metrics.
+
+import json
+import logging
+import time
+
+from flask import current_app
+from google.adk.events.event import Event
+from google.genai import types as genai_types
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token for English text; good enough to compare prompt sizes.
+CHARS_PER_TOKEN = 4
+SUMMARY_METADATA_KEY = "chatstore_summary"
+SUMMARY_HEADER = (
+    "Summary of the earlier conversation "
+    "(older messages were removed to keep the context short):"
+)
+MESSAGE_DIGEST_CHARS = 300
+
+
+def digest(text: str, limit: int) -> str:
+    """Collapses whitespace and cuts `text` to at most `limit` characters."""
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def _part_text(part) -> str:
+    if part.text:
+        return part.text
+    if part.function_call:
+        return json.dumps(part.function_call.args or {}, default=str)
+    if part.function_response:
+        return json.dumps(part.function_response.response or {}, default=str)
+    return ""
+
+
+def estimate_tokens(contents) -> int:
+    """Estimates the tokens of a list of genai Contents."""
+    chars = sum(
+        len(_part_text(part))
+        for content in contents
+        if content is not None
+        for part in content.parts or ()
+    )
+    return chars // CHARS_PER_TOKEN
+
+
+def is_summary_event(event) -> bool:
+    return bool(
+        event.custom_metadata and event.custom_metadata.get(SUMMARY_METADATA_KEY)
+    )
+
+
+def _is_user_message(event) -> bool:
+    return (
+        event.author == "user"
+        and event.content is not None
+        and any(part.text for part in event.content.parts or ())
+        and not is_summary_event(event)
+    )
+
+
+def _command_text(text: str) -> str:
+    """Unwraps the {"command": ...} JSON the agent receives user messages in."""
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(value, dict) and "command" in value:
+        return str(value["command"])
+    return text
+
+
+def _response_text(response) -> str:
+    if isinstance(response, dict) and set(response) == {"result"}:
+        return str(response["result"])
+    return json.dumps(response, default=str)
+
+
+def _summary_lines(events, tool_digest_chars):
+    lines = []
+    for event in events:
+        if is_summary_event(event):
+            text = event.content.parts[0].text
+            lines.extend(line for line in text.splitlines()[1:] if line)
+            continue
+        for part in (event.content.parts if event.content else None) or ():
+            if part.function_call:
+                args = json.dumps(part.function_call.args or {}, default=str)
+                lines.append(
+                    f"- Tool call {part.function_call.name}: "
+                    f"{digest(args, tool_digest_chars)}"
+                )
+            elif part.function_response:
+                result = _response_text(part.function_response.response)
+                lines.append(
+                    f"- Tool result {part.function_response.name}: "
+                    f"{digest(result, tool_digest_chars)}"
+                )
+            elif part.text and not part.thought:
+                if event.author == "user":
+                    text = digest(_command_text(part.text), MESSAGE_DIGEST_CHARS)
+                    lines.append(f"- User: {text}")
+                else:
+                    lines.append(
+                        f"- Assistant: {digest(part.text, MESSAGE_DIGEST_CHARS)}"
+                    )
+    return lines
+
+
+def build_summary_event(events, max_chars: int, tool_digest_chars: int) -> Event:
+    """
+    Summarizes `events` (which may start with an earlier summary) into a single
+    user-authored event that is placed where they were.
+    """
+    lines = _summary_lines(events, tool_digest_chars)
+    size = len(SUMMARY_HEADER)
+    kept = []
+    for line in reversed(lines):
+        size += len(line) + 1
+        if size > max_chars:
+            break
+        kept.append(line)
+    kept.reverse()
+    return Event(
+        author="user",
+        invocation_id=events[-1].invocation_id,
+        timestamp=events[-1].timestamp,
+        content=genai_types.Content(
+            role="user",
+            parts=[genai_types.Part(text="\n".join([SUMMARY_HEADER, *kept]))],
+        ),
+        custom_metadata={SUMMARY_METADATA_KEY: True},
+    )
+
+
+def plan_compaction(events, max_events: int, max_tokens: int, keep_turns: int) -> int:
+    """
+    Returns how many leading events to replace with a summary, or 0 if the
+    session is within its limits (or too short to compact).
+    """
+    if len(events) <= max_events and (
+        estimate_tokens(e.content for e in events) <= max_tokens
+    ):
+        return 0
+    turn_starts = [i for i, event in enumerate(events) if _is_user_message(event)]
+    if len(turn_starts) <= keep_turns:
+        return 0
+    keep_from = turn_starts[-keep_turns] if keep_turns else len(events)
+    if keep_from <= 1 and is_summary_event(events[0]):
+        return 0
+    return keep_from
+
+
+async def maybe_compact_session(session_service, app_name, user_id, session_id):
+    """
+    Compacts a stored session if it has passed the configured limits.
+
+    Returns:
+        bool: True if older events were replaced by a summary.
+    """
+    if not current_app.config["CHAT_COMPACTION_ENABLED"]:
+        return False
+    session = await session_service.get_session(
+        app_name=app_name, user_id=user_id, session_id=session_id
+    )
+    if session is None:
+        return False
+    keep_from = plan_compaction(
+        session.events,
+        current_app.config["CHAT_COMPACTION_MAX_EVENTS"],
+        current_app.config["CHAT_COMPACTION_MAX_TOKENS"],
+        current_app.config["CHAT_COMPACTION_KEEP_TURNS"],
+    )
+    if not keep_from:
+        return False
+
+    start = time.perf_counter()
+    summary_event = build_summary_event(
+        session.events[:keep_from],
+        current_app.config["CHAT_SUMMARY_MAX_CHARS"],
+        current_app.config["CHAT_TOOL_DIGEST_CHARS"],
+    )
+    compacted = await session_service.compact_session(session, keep_from, summary_event)
+    if compacted:
+        metrics.increment("chat.compactions")
+        metrics.record("chat.compaction_seconds", time.perf_counter() - start)
+        logger.info(
+            f"Compacted ADK session {session_id}: {keep_from} events -> 1 summary, "
+            f"{len(session.events) - keep_from} kept."
+        )
+    return compacted
+
+
+def digest_stale_tool_outputs(llm_request, limit: int) -> int:
+    """
+    Cuts the tool results of earlier turns in a model request to `limit`
+    characters. Results of the current turn (after the latest user message)
+    are left intact. Replaced parts are copies; session events are untouched.
+
+    Returns:
+        int: The number of tool results shortened.
+    """
+    contents = llm_request.contents
+    current_turn = 0
+    for i, content in enumerate(contents):
+        if content.role == "user" and any(part.text for part in content.parts or ()):
+            current_turn = i
+
+    shortened = 0
+    for i in range(current_turn):
+        content = contents[i]
+        parts = content.parts or []
+        if not any(
+            part.function_response
+            and len(_response_text(part.function_response.response)) > limit
+            for part in parts
+        ):
+            continue
+        new_parts = []
+        for part in parts:
+            response = part.function_response
+            if response and len(_response_text(response.response)) > limit:
+                part = genai_types.Part(
+                    function_response=genai_types.FunctionResponse(
+                        id=response.id,
+                        name=response.name,
+                        response={
+                            "result": digest(_response_text(response.response), limit)
+                        },
+                    )
+                )
+                shortened += 1
+            new_parts.append(part)
+        contents[i] = genai_types.Content(role=content.role, parts=new_parts)
+    return shortened
+
+
+def _instruction_chars(llm_request) -> int:
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if instruction is None:
+        return 0
+    if isinstance(instruction, str):
+        return len(instruction)
+    return sum(len(_part_text(part)) for part in instruction.parts or ())
+
+
+def prepare_llm_request(callback_context, llm_request):
+    """
+    before_model_callback: digests stale tool outputs (when compaction is
+    enabled) and records the size of the prompt about to be sent.
+    """
+    if current_app.config["CHAT_COMPACTION_ENABLED"]:
+        shortened = digest_stale_tool_outputs(
+            llm_request, current_app.config["CHAT_TOOL_DIGEST_CHARS"]
+        )
+        if shortened:
+            metrics.increment("chat.tool_outputs_digested", shortened)
+    prompt_tokens = (
+        estimate_tokens(llm_request.contents)
+        + _instruction_chars(llm_request) // CHARS_PER_TOKEN
+    )
+    metrics.record("chat.prompt_tokens_estimated", prompt_tokens)
+    metrics.record("chat.prompt_contents", len(llm_request.contents))
+    logger.debug(
+        f"Model request: {len(llm_request.contents)} contents, "
+        f"~{prompt_tokens} tokens."
+    )
+    return None
+
+
+def record_model_usage(callback_context, llm_response):
+    """after_model_callback: records the prompt tokens reported by the model."""
+    usage = llm_response.usage_metadata
+    if usage is not None and usage.prompt_token_count:
+        metrics.record("chat.prompt_tokens", usage.prompt_token_count)
+    return None
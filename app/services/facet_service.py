@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sqlalchemy import Integer, case, cast, func
+
+from app.cache import LRUCache
+from app.extensions import db
+from app.models import Product
+from app.services import browse_service, catalog_service
+from app.sqlite_profile import read_only
+
+# Lower edges of the price histogram buckets (₹); the last bucket is open-ended.
+PRICE_BUCKET_EDGES = (0, 500, 1000, 5000, 10000, 50000)
+RATING_THRESHOLDS = (4, 3, 2, 1)
+FACET_CACHE_TTL_SECONDS = 300
+
+_facet_cache = LRUCache(max_entries=512, ttl_seconds=FACET_CACHE_TTL_SECONDS)
+
+
+@dataclass
+class PriceBucket:
+    min_price: float
+    max_price: float  # None for the open-ended last bucket
+    count: int
+
+
+@dataclass
+class Facets:
+    """Match counts for the browse filters, given the other active filters."""
+
+    total: int = 0
+    category_counts: Dict[str, int] = field(default_factory=dict)
+    price_buckets: List[PriceBucket] = field(default_factory=list)
+    rating_counts: Dict[int, int] = field(default_factory=dict)
+
+
+def _price_bucket_expression():
+    whens = [
+        (Product.price < upper, index)
+        for index, upper in enumerate(PRICE_BUCKET_EDGES[1:])
+    ]
+    return case(*whens, else_=len(PRICE_BUCKET_EDGES) - 1)
+
+
+@read_only()
+def get_facets(
+    search_term=None,
+    categories=None,
+    min_price=None,
+    max_price=None,
+    in_stock_only=False,
+    min_rating=None,
+):
+    """
+    Computes browse facets for the current filter set with a single grouped query.
+
+    Category counts ignore the category filter itself, so users can see how
+    many products every other category would add. Price buckets and rating
+    counts ("N stars & up") honour all active filters.
+
+    Results are cached per filter set until the catalog version changes.
+
+    Returns:
+        Facets: Counts per category, price bucket and minimum rating.
+    """
+    if categories and not isinstance(categories, list):
+        categories = [categories]
+    cache_key = (
+        str(db.engine.url),
+        catalog_service.get_catalog_version(),
+        (search_term or "").strip().lower(),
+        tuple(sorted(categories or ())),
+        min_price,
+        max_price,
+        in_stock_only,
+        min_rating,
+    )
+    return _facet_cache.get_or_set(
+        cache_key,
+        lambda: _compute_facets(
+            search_term, categories, min_price, max_price, in_stock_only, min_rating
+        ),
+    )
+
+
+def _compute_facets(
+    search_term, categories, min_price, max_price, in_stock_only, min_rating
+):
+    price_bucket = _price_bucket_expression().label("price_bucket")
+    rating_bucket = cast(Product.rating, Integer).label("rating_bucket")
+    query = browse_service.build_filtered_query(
+        search_term=search_term,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        min_rating=min_rating,
+        ranked_search=False,
+    )
+    rows = (
+        query.with_entities(
+            Product.category, price_bucket, rating_bucket, func.count(Product.id)
+        )
+        .group_by(Product.category, price_bucket, rating_bucket)
+        .all()
+    )
+
+    selected = set(categories or ())
+    facets = Facets()
+    bucket_counts = [0] * len(PRICE_BUCKET_EDGES)
+    rating_counts = dict.fromkeys(RATING_THRESHOLDS, 0)
+    for category, bucket, rating, count in rows:
+        facets.category_counts[category] = (
+            facets.category_counts.get(category, 0) + count
+        )
+        if selected and category not in selected:
+            continue
+        facets.total += count
+        bucket_counts[bucket] += count
+        for threshold in RATING_THRESHOLDS:
+            if rating >= threshold:
+                rating_counts[threshold] += count
+
+    for index, count in enumerate(bucket_counts):
+        upper = (
+            PRICE_BUCKET_EDGES[index + 1]
+            if index + 1 < len(PRICE_BUCKET_EDGES)
+            else None
+        )
+        facets.price_buckets.append(
+            PriceBucket(
+                min_price=PRICE_BUCKET_EDGES[index], max_price=upper, count=count
+            )
+        )
+    facets.rating_counts = rating_counts
+    return facets
@@ -0,0 +1,228 @@
+# Deterministic fast path for plain chat commands.
+#
+# Messages such as "show my cart", "my shipped orders" or "cancel order 12"
+# map one-to-one onto an agent tool. They are matched against anchored
+# patterns and answered by calling the tool executor directly, without a
+# model round trip. Anything that is not an exact, high-confidence match
+# (extra words, unknown statuses, "remove everything") goes to the agent.
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from flask import current_app
+
+from app import metrics
+from app.agent_tools import (
+    add_item_to_cart_executor,
+    cancel_order_executor,
+    get_user_profile_info_executor,
+    proceed_to_checkout_executor,
+    remove_item_from_cart_executor,
+    request_return_executor,
+    view_cart_executor,
+    view_orders_executor,
+)
+from app.agent_tools.context import ServerToolContext
+from app.models import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+_QUANTITY_WORDS = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+_STATUS_WORDS = {status.value: status.value for status in OrderStatus}
+_STATUS_WORDS["canceled"] = OrderStatus.CANCELLED.value
+_VAGUE_PRODUCTS = {"all", "everything", "it", "that", "this", "them", "items", "stuff"}
+
+_POLITE_PREFIX_RE = re.compile(r"^(?:(?:please|can you|could you|kindly|pls)\s+)+")
+_POLITE_SUFFIX_RE = re.compile(r"(?:\s+(?:please|pls|thanks|thank you))+$")
+
+
+@dataclass
+class Intent:
+    """A chat command that can be answered by one tool call."""
+
+    name: str
+    executor: Callable
+    arguments: dict = field(default_factory=dict)
+
+    @property
+    def tool_name(self) -> str:
+        return self.executor.__name__
+
+    def run(self, user_id: int) -> str:
+        """Calls the tool executor on behalf of `user_id` and returns its reply."""
+        return self.executor(ServerToolContext(user_id), **self.arguments)
+
+
+def _no_arguments(match):
+    return {}
+
+
+def _order_status(match):
+    status = match.group("status")
+    if not status:
+        return {}
+    status = _STATUS_WORDS.get(status)
+    return None if status is None else {"status": status}
+
+
+def _product_and_quantity(match):
+    product = match.group("product").strip()
+    if product in _VAGUE_PRODUCTS:
+        return None
+    quantity = match.group("quantity")
+    if quantity is None:
+        quantity = 1
+    elif quantity.isdigit():
+        quantity = int(quantity)
+    else:
+        quantity = _QUANTITY_WORDS[quantity]
+    return {"product_name": product, "quantity": quantity}
+
+
+def _product(match):
+    product = match.group("product").strip()
+    return None if product in _VAGUE_PRODUCTS else {"product_name": product}
+
+
+def _order_id(match):
+    return {"order_id": int(match.group("order_id"))}
+
+
+_QUANTITY = r"(?:(?P<quantity>\d{1,3}|" + "|".join(_QUANTITY_WORDS) + r")\s+)?"
+
+# (intent name, executor, full-match pattern, argument extractor). An
+# extractor returning None rejects the match.
+_ROUTES = [
+    (
+        "view_cart",
+        view_cart_executor,
+        r"(?:(?:show|view|see|display|check|open)(?: me)? )?"
+        r"(?:my|the) (?:shopping )?cart"
+        r"|(?:show|view|see|display|check|open) cart"
+        r"|cart"
+        r"|what(?:'s| is) in (?:my|the) (?:shopping )?cart",
+        _no_arguments,
+    ),
+    (
+        "view_orders",
+        view_orders_executor,
+        r"(?:(?:show|view|see|list|display|check)(?: me)? (?:all )?(?:of )?"
+        r"|(?:what|where) are )?my (?:(?P<status>[a-z]+) )?orders"
+        r"|(?:my )?order history|orders",
+        _order_status,
+    ),
+    (
+        "checkout",
+        proceed_to_checkout_executor,
+        r"(?:(?:proceed|go) to )?check ?out(?: now)?|place (?:my|the|an) order",
+        _no_arguments,
+    ),
+    (
+        "profile",
+        get_user_profile_info_executor,
+        r"who am i|what(?:'s| is) my name"
+        r"|(?:(?:show|view)(?: me)? )?my (?:profile|account details)",
+        _no_arguments,
+    ),
+    (
+        "add_to_cart",
+        add_item_to_cart_executor,
+        r"add " + _QUANTITY + r"(?P<product>[a-z0-9][a-z0-9 '&.-]*?)"
+        r" to (?:(?:my|the) )?cart",
+        _product_and_quantity,
+    ),
+    (
+        "remove_from_cart",
+        remove_item_from_cart_executor,
+        r"(?:remove|delete) (?:the )?(?P<product>[a-z0-9][a-z0-9 '&.-]*?)"
+        r" from (?:(?:my|the) )?cart",
+        _product,
+    ),
+    (
+        "cancel_order",
+        cancel_order_executor,
+        r"cancel (?:my )?order (?:number |no\.? )?#?(?P<order_id>\d+)",
+        _order_id,
+    ),
+    (
+        "request_return",
+        request_return_executor,
+        r"(?:return|request (?:a )?return (?:for|of)) (?:my )?order"
+        r" (?:number |no\.? )?#?(?P<order_id>\d+)",
+        _order_id,
+    ),
+]
+_COMPILED_ROUTES = [
+    (name, executor, re.compile(pattern), extract)
+    for name, executor, pattern, extract in _ROUTES
+]
+
+
+def normalize_message(message: str) -> str:
+    """Lowercases a message and strips courtesy words and trailing punctuation."""
+    text = " ".join((message or "").lower().split())
+    text = text.rstrip("?!. ")
+    text = _POLITE_SUFFIX_RE.sub("", _POLITE_PREFIX_RE.sub("", text))
+    return text.rstrip("?!., ")
+
+
+def match_intent(message: str) -> Optional[Intent]:
+    """
+    Returns the Intent a message unambiguously asks for, or None if it should
+    be handled by the agent.
+    """
+    text = normalize_message(message)
+    if not text or len(text) > 120:
+        return None
+    for name, executor, pattern, extract in _COMPILED_ROUTES:
+        match = pattern.fullmatch(text)
+        if match is None:
+            continue
+        arguments = extract(match)
+        if arguments is None:
+            return None
+        return Intent(name=name, executor=executor, arguments=arguments)
+    return None
+
+
+def is_enabled() -> bool:
+    return current_app.config.get("CHAT_INTENT_FAST_PATH", True)
+
+
+def route_message(message: str) -> Optional[Intent]:
+    """
+    Matches a chat message if the fast path is enabled, and counts hits and
+    misses in app.metrics (chat.fast_path.hits / .misses / .<intent>).
+    """
+    if not is_enabled():
+        return None
+    intent = match_intent(message)
+    if intent is None:
+        metrics.increment("chat.fast_path.misses")
+    else:
+        metrics.increment("chat.fast_path.hits")
+        metrics.increment(f"chat.fast_path.{intent.name}")
+        logger.debug(f"Chat fast path matched '{intent.name}' {intent.arguments}.")
+    return intent
+
+
+def get_hit_rate() -> float:
+    """Returns the share of routed chat messages answered by the fast path."""
+    hits = metrics.get_counter("chat.fast_path.hits")
+    total = hits + metrics.get_counter("chat.fast_path.misses")
+    return hits / total if total else 0.0
@@ -0,0 +1,83 @@
+from sqlalchemy import bindparam, update
+
+from app.extensions import db
+from app.models import Product
+from app.services import catalog_service
+
+# Stock is changed only through single guarded UPDATE statements, so concurrent
+# requests can never oversell or lose an update: the database checks and
+# decrements in one step, and the rowcount tells us whether it succeeded.
+# None of these functions commit; callers commit together with their own rows.
+
+_products = Product.__table__
+
+_reserve_statement = (
+    update(_products)
+    .where(_products.c.id == bindparam("product_id"))
+    .where(_products.c.quantity_in_stock >= bindparam("quantity"))
+    .values(quantity_in_stock=_products.c.quantity_in_stock - bindparam("quantity"))
+)
+
+_release_statement = (
+    update(_products)
+    .where(_products.c.id == bindparam("product_id"))
+    .values(quantity_in_stock=_products.c.quantity_in_stock + bindparam("quantity"))
+)
+
+
+def reserve_stock(product_id: int, quantity: int) -> bool:
+    """
+    Atomically takes `quantity` units of a product out of stock.
+
+    Returns:
+        bool: True if the stock was reserved, False if the product does not
+        exist or has fewer than `quantity` units left.
+    """
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive.")
+    result = db.session.execute(
+        _reserve_statement, {"product_id": product_id, "quantity": quantity}
+    )
+    if result.rowcount != 1:
+        return False
+    catalog_service.note_bulk_update([product_id])
+    return True
+
+
+def release_stock(product_id: int, quantity: int) -> bool:
+    """
+    Returns `quantity` units of a product to stock.
+
+    Returns:
+        bool: True if the product exists and was updated.
+    """
+    return release_stock_bulk({product_id: quantity}) == 1
+
+
+def release_stock_bulk(quantities) -> int:
+    """
+    Returns stock for many products in one executemany round trip.
+
+    Args:
+        quantities (dict): Product id mapped to the number of units to release.
+
+    Returns:
+        int: The number of products updated.
+    """
+    params = [
+        {"product_id": product_id, "quantity": quantity}
+        for product_id, quantity in quantities.items()
+        if quantity > 0
+    ]
+    if not params:
+        return 0
+    result = db.session.execute(_release_statement, params)
+    catalog_service.note_bulk_update([p["product_id"] for p in params])
+    return result.rowcount
+
+
+def get_available_stock(product_id: int):
+    """Returns the current stock of a product, or None if it does not exist."""
+    return db.session.scalar(
+        db.select(Product.quantity_in_stock).where(Product.id == product_id)
+    )
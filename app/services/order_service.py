@@ -1,11 +1,24 @@
+from dataclasses import dataclass, field
 from datetime import datetime
-from app.models import User, Product, Order, OrderItem, OrderStatus
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, update
+
+from app.models import Product, CartItem, Order, OrderItem, OrderStatus
 from app.extensions import db
-from app.services import cart_service
+from app.pagination import CursorPage, paginate_by_cursor
+from app.services import inventory_service, tool_cache_service, user_stats_service
+from app.sqlite_profile import read_only
 
 
 def create_order_from_cart(user_id: int) -> Order:
-    """Create a new order from user's cart items.
+    """Create a new order from user's cart items in a single transaction.
+
+    The cart is emptied with one DELETE ... RETURNING, prices are read with one
+    query and the order items are written with one executemany, so the number
+    of statements does not depend on the cart size. The stock reserved by the
+    cart moves to the order. Any failure rolls everything back, leaving the
+    cart untouched.
 
     Args:
         user_id: The ID of the user placing the order
@@ -14,76 +27,284 @@ def create_order_from_cart(user_id: int) -> Order:
         The newly created Order object
 
     Raises:
-        ValueError: If user not found, cart is empty, or database error occurs
+        ValueError: If the cart is empty, a product is missing, or a database error occurs
     """
-    user = User.query.get(user_id)
-    if not user:
-        raise ValueError(f"User with ID {user_id} not found.")
-
-    cart_items = cart_service.get_cart_contents(user_id)
-    if not cart_items:
-        raise ValueError("Cannot create order: Cart is empty.")
-
+    cart_items = CartItem.__table__
     try:
-        # Validate products first
-        for item in cart_items:
-            product = Product.query.get(item.product_id)
-            if not product or product.id != item.product.id:
-                raise ValueError(
-                    f"Product data inconsistency for product ID {item.product_id}."
-                )
-            if product.quantity_in_stock < 0:
-                raise ValueError(
-                    f"Inventory issue detected for {product.name}. Please contact support."
+        removed = db.session.execute(
+            delete(cart_items)
+            .where(cart_items.c.user_id == user_id)
+            .returning(cart_items.c.product_id, cart_items.c.quantity)
+        ).all()
+        if not removed:
+            db.session.rollback()
+            raise ValueError("Cannot create order: Cart is empty.")
+
+        quantities = {}
+        for product_id, quantity in removed:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        prices = dict(
+            db.session.execute(
+                db.select(Product.id, Product.price).where(
+                    Product.id.in_(quantities.keys())
                 )
+            ).all()
+        )
+        missing = set(quantities) - set(prices)
+        if missing:
+            db.session.rollback()
+            raise ValueError(
+                f"Product data inconsistency for product ID {min(missing)}."
+            )
 
-        # Calculate total first to avoid creating an order if there's an issue
-        total_amount = 0.0
-        for item in cart_items:
-            price_at_order = item.product.price
-            item_total = item.quantity * price_at_order
-            total_amount += item_total
-
-        # Create the order with the correct total
+        total_amount = sum(
+            quantity * prices[product_id] for product_id, quantity in quantities.items()
+        )
         new_order = Order(
             user_id=user_id,
             status=OrderStatus.PENDING,
             total_amount=total_amount,
         )
-
-        # Add order to session
         db.session.add(new_order)
         db.session.flush()  # Assign ID
 
-        # Create order items
-        for item in cart_items:
-            order_item = OrderItem(
-                order_id=new_order.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                price_per_unit=item.product.price,
-            )
-            db.session.add(order_item)
-
-        # Commit the order and items
+        db.session.execute(
+            insert(OrderItem.__table__),
+            [
+                {
+                    "order_id": new_order.id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "price_per_unit": prices[product_id],
+                }
+                for product_id, quantity in quantities.items()
+            ],
+        )
+        user_stats_service.refresh_cart_stats([user_id])
+        user_stats_service.record_order_placed(user_id, total_amount)
+        tool_cache_service.note_user_data_change(user_id)
         db.session.commit()
-
-        # Clear the cart after successful order creation
-        cart_service.clear_cart(user_id)
-
         return new_order
 
+    except ValueError:
+        raise
     except Exception as e:
         db.session.rollback()
         raise ValueError(f"Could not create order due to a database error: {str(e)}")
 
 
+@read_only()
 def get_user_orders(user_id: int):
     return (
         Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
     )
 
 
+# Shown for order items whose product has since been deleted.
+DELETED_PRODUCT_NAME = "Product no longer available"
+
+
+@dataclass
+class OrderHistoryItem:
+    product_id: int
+    product_name: str
+    quantity: int
+    price_per_unit: float
+
+    @property
+    def subtotal(self) -> float:
+        return self.quantity * self.price_per_unit
+
+
+@dataclass
+class OrderHistoryEntry:
+    """Read model of an order with its items, detached from the session."""
+
+    id: int
+    status: OrderStatus
+    created_at: datetime
+    total_amount: float
+    items: List[OrderHistoryItem] = field(default_factory=list)
+
+
+@dataclass
+class OrderSummary:
+    """Aggregate view of a user's (filtered) orders plus the most recent ones."""
+
+    order_count: int = 0
+    total_spent: float = 0.0
+    status_counts: Dict[OrderStatus, int] = field(default_factory=dict)
+    first_order_at: Optional[datetime] = None
+    last_order_at: Optional[datetime] = None
+    recent_orders: List[OrderHistoryEntry] = field(default_factory=list)
+
+
+def parse_order_statuses(statuses) -> List[OrderStatus]:
+    """Converts status names such as "pending" or "return requested" to OrderStatus values.
+
+    Raises:
+        ValueError: If a status name is not recognised
+    """
+    parsed = []
+    for name in statuses or []:
+        key = name.strip().lower().replace(" ", "_").replace("-", "_")
+        if not key:
+            continue
+        try:
+            parsed.append(OrderStatus(key))
+        except ValueError:
+            valid = ", ".join(status.value for status in OrderStatus)
+            raise ValueError(f"Unknown order status '{name}'. Valid statuses: {valid}.")
+    return parsed
+
+
+def _filtered_orders_query(user_id, statuses=None, start_date=None, end_date=None):
+    query = Order.query.filter(Order.user_id == user_id)
+    if statuses:
+        query = query.filter(Order.status.in_(statuses))
+    if start_date:
+        query = query.filter(Order.created_at >= start_date)
+    if end_date:
+        query = query.filter(Order.created_at < end_date)
+    return query
+
+
+@read_only()
+def get_order_summary(
+    user_id: int,
+    statuses: Optional[List[OrderStatus]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 5,
+) -> OrderSummary:
+    """Summarise a user's orders without loading the whole history.
+
+    Counts, totals and the date range come from one GROUP BY status query;
+    only the `limit` most recent matching orders are loaded in detail (via
+    get_order_history), so the cost is the same however many orders exist.
+
+    Args:
+        user_id: The ID of the user
+        statuses: Only include orders in these statuses
+        start_date: Only include orders placed at or after this time
+        end_date: Only include orders placed before this time
+        limit: Maximum number of recent orders to load in detail
+
+    Returns:
+        An OrderSummary
+    """
+    rows = (
+        _filtered_orders_query(user_id, statuses, start_date, end_date)
+        .with_entities(
+            Order.status,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total_amount), 0.0),
+            func.min(Order.created_at),
+            func.max(Order.created_at),
+        )
+        .group_by(Order.status)
+        .all()
+    )
+    summary = OrderSummary()
+    for status, count, spent, first_at, last_at in rows:
+        summary.status_counts[status] = count
+        summary.order_count += count
+        summary.total_spent += spent
+        if summary.first_order_at is None or first_at < summary.first_order_at:
+            summary.first_order_at = first_at
+        if summary.last_order_at is None or last_at > summary.last_order_at:
+            summary.last_order_at = last_at
+
+    if summary.order_count and limit > 0:
+        summary.recent_orders = get_order_history(
+            user_id,
+            per_page=limit,
+            statuses=statuses,
+            start_date=start_date,
+            end_date=end_date,
+        ).items
+    return summary
+
+
+@read_only()
+def get_order_history(
+    user_id: int,
+    cursor=None,
+    per_page: int = 10,
+    statuses: Optional[List[OrderStatus]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_items: bool = True,
+    with_total: bool = False,
+) -> CursorPage:
+    """Fetch one page of a user's order history, newest first.
+
+    Uses keyset pagination on (created_at, id) and loads the items (with
+    product names) of every order on the page in one joined query, so a page
+    costs two queries however many orders or items the user has.
+
+    Args:
+        user_id: The ID of the user
+        cursor: The `next_cursor` of the previous page, if any
+        per_page: Maximum number of orders per page
+        statuses: Only include orders in these statuses
+        start_date: Only include orders placed at or after this time
+        end_date: Only include orders placed before this time
+        include_items: Also load the items of each order
+        with_total: Also count all matching orders
+
+    Returns:
+        A CursorPage of OrderHistoryEntry objects
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    page = paginate_by_cursor(
+        _filtered_orders_query(user_id, statuses, start_date, end_date),
+        (Order.created_at, Order.id),
+        cursor=cursor,
+        per_page=per_page,
+        descending=True,
+        with_total=with_total,
+    )
+    entries = [
+        OrderHistoryEntry(
+            id=order.id,
+            status=order.status,
+            created_at=order.created_at,
+            total_amount=order.total_amount,
+        )
+        for order in page.items
+    ]
+
+    if include_items and entries:
+        by_id = {entry.id: entry for entry in entries}
+        rows = db.session.execute(
+            db.select(
+                OrderItem.order_id,
+                OrderItem.product_id,
+                Product.name,
+                OrderItem.quantity,
+                OrderItem.price_per_unit,
+            )
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(OrderItem.order_id.in_(by_id.keys()))
+            .order_by(OrderItem.order_id, OrderItem.id)
+        ).all()
+        for order_id, product_id, name, quantity, price_per_unit in rows:
+            by_id[order_id].items.append(
+                OrderHistoryItem(
+                    product_id=product_id,
+                    product_name=DELETED_PRODUCT_NAME if name is None else name,
+                    quantity=quantity,
+                    price_per_unit=price_per_unit,
+                )
+            )
+
+    page.items = entries
+    return page
+
+
 def get_order_by_id(order_id: int, user_id):
     order = Order.query.get(order_id)
     if user_id and order and order.user_id != user_id:
@@ -91,6 +312,7 @@ def get_order_by_id(order_id: int, user_id):
     return order
 
 
+@read_only()
 def get_order_items(order_id: int):
     return (
         OrderItem.query.options(db.joinedload(OrderItem.product))
@@ -99,45 +321,63 @@ def get_order_items(order_id: int):
     )
 
 
+_CANCELLABLE_STATUSES = (OrderStatus.PENDING, OrderStatus.PROCESSING)
+
+
 def cancel_user_order(user_id: int, order_id) -> str:
-    order_to_cancel = None
+    """Cancel an order (the user's latest cancellable one if `order_id` is empty).
+
+    The status check and change are one guarded UPDATE, so when the same order
+    is cancelled twice at once (a double-click, or web and chat together) only
+    one cancel matches the row; only that one returns the items to stock and
+    updates the counters.
+
+    Raises:
+        ValueError: If the order is not found or a database error occurs
+    """
     if order_id:
         order_to_cancel = get_order_by_id(order_id, user_id)
         if not order_to_cancel:
             raise ValueError(f"Order #{order_id} not found or does not belong to you.")
     else:
-        cancellable_statuses = [OrderStatus.PENDING, OrderStatus.PROCESSING]
         order_to_cancel = (
             Order.query.filter(
-                Order.user_id == user_id, Order.status.in_(cancellable_statuses)
+                Order.user_id == user_id, Order.status.in_(_CANCELLABLE_STATUSES)
             )
             .order_by(Order.created_at.desc())
             .first()
         )
         if not order_to_cancel:
             raise ValueError("No recent orders found that can be cancelled.")
+    order_id = order_to_cancel.id
 
-    if order_to_cancel.status not in [OrderStatus.PENDING, OrderStatus.PROCESSING]:
-        return f"Order #{order_to_cancel.id} cannot be cancelled as its status is {order_to_cancel.status.value}."
-
-    order_to_cancel.status = OrderStatus.CANCELLED
-    order_to_cancel.updated_at = datetime.now()
-
-    items = get_order_items(order_to_cancel.id)
-    product_ids_quantities = {item.product_id: item.quantity for item in items}
-    products_to_update = Product.query.filter(
-        Product.id.in_(product_ids_quantities.keys())
-    ).all()
-
-    for product in products_to_update:
-        if product.id in product_ids_quantities:
-            product.quantity_in_stock += product_ids_quantities[product.id]
-            db.session.add(product)
-
-    db.session.add(order_to_cancel)
+    orders = Order.__table__
     try:
+        cancelled_total = db.session.execute(
+            update(orders)
+            .where(orders.c.id == order_id)
+            .where(orders.c.user_id == order_to_cancel.user_id)
+            .where(orders.c.status.in_(_CANCELLABLE_STATUSES))
+            .values(status=OrderStatus.CANCELLED, updated_at=datetime.now())
+            .returning(orders.c.total_amount)
+        ).scalar()
+        if cancelled_total is None:
+            db.session.rollback()
+            # Rolling back expired the order, so this reads its current status.
+            return f"Order #{order_id} cannot be cancelled as its status is {order_to_cancel.status.value}."
+
+        items = db.session.execute(
+            db.select(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .where(OrderItem.order_id == order_id)
+            .group_by(OrderItem.product_id)
+        ).all()
+        inventory_service.release_stock_bulk(dict(items))
+        user_stats_service.record_order_cancelled(
+            order_to_cancel.user_id, cancelled_total
+        )
+        tool_cache_service.note_user_data_change(order_to_cancel.user_id)
         db.session.commit()
-        return f"Order #{order_to_cancel.id} has been cancelled successfully."
+        return f"Order #{order_id} has been cancelled successfully."
     except Exception:
         db.session.rollback()
         raise ValueError("Could not cancel the order due to a database error.")
@@ -154,6 +394,7 @@ def request_order_return(user_id: int, order_id: int) -> str:
     order.status = OrderStatus.RETURN_REQUESTED
     order.updated_at = datetime.now()
     db.session.add(order)
+    tool_cache_service.note_user_data_change(user_id)
 
     try:
         db.session.commit()
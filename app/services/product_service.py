@@ -1,5 +1,12 @@
 from app.models import Product
 from app.extensions import db
+from app.services import resolver_service
+
+# A fuzzy candidate is accepted without asking the user when it scores at least
+# this well and beats the runner-up by a clear margin.
+MATCH_MIN_SCORE = 0.6
+MATCH_MIN_MARGIN = 0.1
+SUGGESTION_MIN_SCORE = 0.3
 
 
 def find_product_by_name(name: str):
@@ -8,6 +15,53 @@ def find_product_by_name(name: str):
     ).first()  # Exact match, case insensitive
 
 
+def match_product(name: str):
+    """
+    Resolves a free-form product name to a single product if the match is
+    unambiguous, and returns close alternatives otherwise.
+
+    Returns:
+        tuple: (Product or None, list of suggested product names)
+    """
+    return match_products([name])[name]
+
+
+def match_products(names):
+    """
+    Resolves several product names at once; see `match_product`.
+
+    Returns:
+        dict: Each name mapped to (Product or None, list of suggested names).
+    """
+    candidates_by_name = resolver_service.resolve_products_batch(names, k=3)
+    matched_ids = {}
+    results = {}
+    for name, candidates in candidates_by_name.items():
+        if not candidates:
+            results[name] = (None, [])
+            continue
+        best = candidates[0]
+        runner_up = candidates[1].score if len(candidates) > 1 else 0.0
+        if best.score == 1.0 or (
+            best.score >= MATCH_MIN_SCORE and best.score - runner_up >= MATCH_MIN_MARGIN
+        ):
+            matched_ids[name] = best.id
+        else:
+            results[name] = (
+                None,
+                [c.name for c in candidates if c.score >= SUGGESTION_MIN_SCORE],
+            )
+
+    if matched_ids:
+        products = {
+            p.id: p
+            for p in Product.query.filter(Product.id.in_(set(matched_ids.values())))
+        }
+        for name, product_id in matched_ids.items():
+            results[name] = (products.get(product_id), [])
+    return results
+
+
 def get_product_by_id(product_id: int):
     return Product.query.get(product_id)
 
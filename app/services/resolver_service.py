@@ -0,0 +1,187 @@
+import heapq
+import logging
+import re
+import threading
+from collections import Counter, namedtuple
+
+from app.extensions import db
+from app.models import Product
+from app.services import catalog_service
+
+logger = logging.getLogger(__name__)
+
+ResolvedProduct = namedtuple("ResolvedProduct", ["id", "name", "score"])
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize_name(name: str) -> str:
+    """Lowercases a name and collapses it to space-separated alphanumeric words."""
+    return " ".join(_WORD_RE.findall((name or "").lower()))
+
+
+def trigrams(name: str) -> frozenset:
+    """Returns the padded character trigrams of every word in `name`."""
+    grams = set()
+    for word in normalize_name(name).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class ProductNameIndex:
+    """In-memory trigram index over product names for one database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stale_ids = set()
+        self._names = {}
+        self._normalized = {}
+        self._grams = {}
+        self._postings = {}
+
+    def _add(self, product_id, name):
+        self._remove(product_id)
+        grams = trigrams(name)
+        self._names[product_id] = name
+        self._normalized[product_id] = normalize_name(name)
+        self._grams[product_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(product_id)
+
+    def _remove(self, product_id):
+        grams = self._grams.pop(product_id, None)
+        if grams is None:
+            return
+        self._names.pop(product_id, None)
+        self._normalized.pop(product_id, None)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(product_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def _refresh(self):
+        """Loads or patches the index before a lookup (caller holds the lock)."""
+        if not self._loaded:
+            self._names, self._normalized, self._grams, self._postings = {}, {}, {}, {}
+            for product_id, name in db.session.execute(
+                db.select(Product.id, Product.name)
+            ):
+                self._add(product_id, name)
+            self._loaded = True
+            self._stale_ids.clear()
+            logger.info(f"Built product name index with {len(self._names)} names.")
+        elif self._stale_ids:
+            stale_ids = list(self._stale_ids)
+            self._stale_ids.clear()
+            for product_id in stale_ids:
+                self._remove(product_id)
+            for product_id, name in db.session.execute(
+                db.select(Product.id, Product.name).where(Product.id.in_(stale_ids))
+            ):
+                self._add(product_id, name)
+
+    def apply_changes(self, changed, deleted_ids):
+        with self._lock:
+            if not self._loaded:
+                return
+            for product_id, values in changed.items():
+                if self._names.get(product_id) != values["name"]:
+                    self._add(product_id, values["name"])
+            for product_id in deleted_ids:
+                self._remove(product_id)
+
+    def invalidate(self, product_ids=None):
+        with self._lock:
+            if product_ids is None:
+                self._loaded = False
+            else:
+                self._stale_ids.update(product_ids)
+
+    def search(self, name, k):
+        query_normalized = normalize_name(name)
+        query_grams = trigrams(name)
+        if not query_grams:
+            return []
+        with self._lock:
+            self._refresh()
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            scored = []
+            for product_id, overlap in shared.items():
+                if self._normalized[product_id] == query_normalized:
+                    score = 1.0
+                else:
+                    # Dice coefficient, capped below an exact match.
+                    dice = (
+                        2 * overlap / (len(query_grams) + len(self._grams[product_id]))
+                    )
+                    score = min(dice, 0.99)
+                scored.append((score, product_id))
+            best = heapq.nlargest(k, scored)
+            return [
+                ResolvedProduct(
+                    id=product_id, name=self._names[product_id], score=score
+                )
+                for score, product_id in best
+            ]
+
+
+def _get_index() -> ProductNameIndex:
+    key = str(db.engine.url)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(key, ProductNameIndex())
+    return index
+
+
+def resolve_products(name: str, k: int = 5):
+    """
+    Ranks products by how closely their names match `name`.
+
+    Matching is case-insensitive and tolerant of plurals, typos and extra or
+    missing words ("bananas" -> "Banana", "iphone 15 pro max" -> "Apple iPhone
+    15 Pro Max"). An exact (normalized) match always scores 1.0.
+
+    Args:
+        name (str): The product name as given by the user or the model.
+        k (int): Maximum number of candidates to return.
+
+    Returns:
+        list[ResolvedProduct]: Up to `k` (id, name, score) tuples, best first.
+    """
+    return _get_index().search(name, k)
+
+
+def resolve_products_batch(names, k: int = 5):
+    """
+    Resolves several names in one call (e.g. a whole shopping list).
+
+    Returns:
+        dict: Each input name mapped to its list of ResolvedProduct candidates.
+    """
+    index = _get_index()
+    return {name: index.search(name, k) for name in names}
+
+
+def _on_commit(url_key, changed, deleted_ids):
+    index = _indexes.get(url_key)
+    if index is not None:
+        index.apply_changes(changed, deleted_ids)
+
+
+def _on_invalidate(url_key, product_ids):
+    index = _indexes.get(url_key)
+    if index is not None:
+        index.invalidate(product_ids)
+
+
+catalog_service.register_change_listener(_on_commit, _on_invalidate)
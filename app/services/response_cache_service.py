@@ -0,0 +1,119 @@
+# Shared cache of agent answers to generic catalog questions.
+#
+# "tell me about the Apple Watch" gets the same answer for every user until
+# the catalog changes, so answers are cached under the normalized question and
+# the catalog version (which increases on every product write, stock changes
+# included). Only answers whose turn called catalog tools alone, with every
+# argument taken from the question itself, are stored: anything that touched a
+# user's cart, orders or profile, or relied on earlier conversation ("is it in
+# stock?"), is never shared.
+#
+# The model also sees the asking user's earlier conversation, so even a turn
+# that only called catalog tools may quote their cart, orders or name. Answers
+# are therefore only stored from turns run without history. A cacheable answer
+# given in a conversation with history marks its question instead: the next
+# miss of that question is answered in a fresh, empty session (see
+# chatbot_service), and that answer is the one shared.
+
+import logging
+from collections import namedtuple
+
+from flask import current_app
+
+from app import metrics
+from app.agent_tools import CATALOG_TOOL_NAMES
+from app.cache import LRUCache
+from app.extensions import db
+from app.services import catalog_service
+from app.services.intent_service import normalize_message
+from app.services.resolver_service import normalize_name
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL_SECONDS = 600
+
+CachedResponse = namedtuple("CachedResponse", ["text", "tool_names"])
+
+_response_cache = LRUCache(max_entries=2048, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+# Keys of cacheable questions last answered in a conversation with history.
+_history_free_keys = LRUCache(max_entries=2048, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+
+
+def is_enabled() -> bool:
+    return current_app.config.get("CHAT_RESPONSE_CACHE", True)
+
+
+def make_key(message: str):
+    """
+    Returns the cache key of a question under the current catalog version, or
+    None if the cache is disabled. Take the key before the agent runs, so an
+    answer computed while the catalog changed is filed under the old version.
+    """
+    if not is_enabled():
+        return None
+    return (
+        str(db.engine.url),
+        catalog_service.get_catalog_version(),
+        normalize_message(message),
+    )
+
+
+def get_response(key):
+    """Returns the CachedResponse for `key`, or None (counted in app.metrics)."""
+    if key is None:
+        return None
+    cached = _response_cache.get(key)
+    metrics.increment(
+        "chat.response_cache.hits" if cached else "chat.response_cache.misses"
+    )
+    return cached
+
+
+def is_cacheable(message: str, tool_calls) -> bool:
+    """
+    Returns True if an answer produced with `tool_calls` ((name, args) pairs)
+    depends only on the catalog and on `message` itself.
+    """
+    if not tool_calls:
+        return False  # No tool: the answer may rest on the conversation so far
+    question = normalize_name(message)
+    for name, args in tool_calls:
+        if name not in CATALOG_TOOL_NAMES:
+            return False
+        for value in (args or {}).values():
+            if isinstance(value, str) and normalize_name(value) not in question:
+                return False
+    return True
+
+
+def needs_history_free_run(key) -> bool:
+    """
+    Returns True if the question of `key` should be answered in an empty
+    session, so that its answer can be stored.
+    """
+    return key is not None and _history_free_keys.get(key) is not None
+
+
+def store_response(
+    key, message: str, tool_calls, text: str, history_free: bool
+) -> bool:
+    """
+    Caches an agent answer if is_cacheable() allows it and the turn ran without
+    earlier conversation (`history_free`); returns True if stored.
+    """
+    if key is None or not is_cacheable(message, tool_calls):
+        return False
+    if not history_free:
+        _history_free_keys.set(key, True)
+        return False
+    _history_free_keys.pop(key)
+    _response_cache.set(
+        key, CachedResponse(text=text, tool_names=[name for name, _ in tool_calls])
+    )
+    logger.debug(f"Cached agent answer for '{key[2]}'.")
+    return True
+
+
+def clear():
+    _response_cache.clear()
+    _history_free_keys.clear()
@@ -0,0 +1,191 @@
+import logging
+import re
+
+from flask import current_app
+from sqlalchemy import DDL, event, func, literal_column, text
+from sqlalchemy.sql import column, table
+
+from app.extensions import db
+from app.models import Product
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE_NAME = "products_fts"
+
+# Relative weights of the indexed columns (name, description, category) for bm25.
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+# Lightweight handle on the virtual table; it is intentionally kept out of
+# db.metadata so create_all/drop_all never try to manage it as a plain table.
+products_fts = table(
+    FTS_TABLE_NAME,
+    column("rowid"),
+    column("name"),
+    column("description"),
+    column("category"),
+)
+
+# External-content FTS5 table: the index stores only tokens, the text stays in
+# `products`. Triggers keep it in sync with every write to the indexed columns,
+# including bulk SQL that bypasses the ORM. Stock/price updates do not touch it.
+_CREATE_INDEX_STATEMENTS = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE_NAME} USING fts5(
+        name, description, category,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE_NAME}_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE_NAME}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE_NAME}_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE_NAME}_au
+    AFTER UPDATE OF name, description, category ON products BEGIN
+        INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {FTS_TABLE_NAME}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+)
+
+for _statement in _CREATE_INDEX_STATEMENTS:
+    event.listen(
+        Product.__table__,
+        "after_create",
+        DDL(_statement).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    Product.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE_NAME}").execute_if(dialect="sqlite"),
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Database URLs whose index was found. A missing index is looked up again on
+# every search, so one built later (or by another process) is picked up; the
+# fallback warning is only logged once per URL.
+_index_available = set()
+_missing_index_warned = set()
+
+
+def build_match_expression(search_term: str):
+    """
+    Converts free user input into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so FTS5 operators in user input are treated as text)
+    and prefix-matched, and all words must match: "app wat" -> "app"* "wat"*.
+
+    Returns:
+        str or None: The MATCH expression, or None if the term has no words.
+    """
+    tokens = _TOKEN_RE.findall(search_term or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def is_search_index_available() -> bool:
+    """Returns True if FTS search is enabled and its index exists in the database."""
+    if not current_app.config.get("PRODUCT_SEARCH_FTS", True):
+        return False
+    engine = db.engine
+    key = str(engine.url)
+    if key in _index_available:
+        return True
+    available = False
+    if engine.dialect.name == "sqlite":
+        try:
+            available = (
+                db.session.execute(
+                    text(
+                        "SELECT 1 FROM sqlite_master "
+                        "WHERE type = 'table' AND name = :name"
+                    ),
+                    {"name": FTS_TABLE_NAME},
+                ).first()
+                is not None
+            )
+        except Exception as e:
+            logger.error(f"Failed to check for product search index: {e}")
+    if available:
+        _index_available.add(key)
+    elif key not in _missing_index_warned:
+        _missing_index_warned.add(key)
+        logger.warning(
+            "Product search index not found; falling back to ILIKE search. "
+            "Run search_service.ensure_search_index() to build it."
+        )
+    return available
+
+
+def ensure_search_index():
+    """
+    Creates the FTS5 index and its sync triggers on an existing database and
+    rebuilds its contents from the `products` table.
+    """
+    if db.engine.dialect.name != "sqlite":
+        raise ValueError("The product search index requires SQLite (FTS5).")
+    try:
+        for statement in _CREATE_INDEX_STATEMENTS:
+            db.session.execute(text(statement))
+        rebuild_search_index(commit=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    _index_available.add(str(db.engine.url))
+
+
+def rebuild_search_index(commit: bool = True):
+    """Re-tokenizes every product into the FTS5 index (e.g. after a bulk load)."""
+    db.session.execute(
+        text(f"INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}) VALUES ('rebuild')")
+    )
+    if commit:
+        db.session.commit()
+
+
+def apply_search_filter(query, search_term: str, ranked: bool = True):
+    """
+    Restricts a Product query to products matching `search_term`.
+
+    Uses the FTS5 index (prefix matching over name, description and category)
+    when it is available, optionally ordering by bm25 relevance; otherwise falls
+    back to a case-insensitive substring match on the product name.
+
+    Args:
+        query: A Product query to filter.
+        search_term (str): Raw user search input.
+        ranked (bool): Order matches by relevance (best first).
+
+    Returns:
+        Query: The filtered (and possibly ordered) query.
+    """
+    if not is_search_index_available():
+        return query.filter(Product.name.ilike(f"%{search_term}%"))
+
+    match_expression = build_match_expression(search_term)
+    if match_expression is None:
+        # No indexable words (e.g. only punctuation), so only a substring match makes sense.
+        return query.filter(Product.name.ilike(f"%{search_term}%"))
+
+    fts_table = literal_column(FTS_TABLE_NAME)
+    query = query.join(products_fts, products_fts.c.rowid == Product.id).filter(
+        fts_table.op("MATCH")(match_expression)
+    )
+    if ranked:
+        query = query.order_by(func.bm25(fts_table, *BM25_WEIGHTS))
+    return query
@@ -0,0 +1,122 @@
+# Per-user cache of the agent's read tools (cart, orders, profile).
+#
+# A turn often calls view_cart or view_orders several times, and each call
+# re-ran the same queries and formatting. Results are cached under the user's
+# data version, which changes after every committed cart or order write for
+# that user (cart_service, order_service and the cart sweeper call
+# note_user_data_change()). Product edits made through the ORM (names, prices)
+# change a shared generation that is part of the key as well; stock-only
+# updates from inventory_service do not, as none of these tools show stock.
+#
+# Versions live in this process only, so the entries also expire after
+# TOOL_CACHE_TTL_SECONDS to bound staleness when another worker process wrote.
+
+import itertools
+import logging
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.cache import LRUCache
+from app.extensions import db
+from app.services import catalog_service
+
+logger = logging.getLogger(__name__)
+
+TOOL_CACHE_TTL_SECONDS = 60
+
+_tool_cache = LRUCache(max_entries=4096, ttl_seconds=TOOL_CACHE_TTL_SECONDS)
+# A user whose version was evicted gets a fresh number from this counter, which
+# no cached entry can carry, so eviction never revives stale results.
+_user_versions = LRUCache(max_entries=16384)
+_next_version = itertools.count(1)
+_catalog_generations = {}
+
+
+def is_enabled() -> bool:
+    return current_app.config.get("CHAT_TOOL_CACHE", True)
+
+
+def get_user_data_version(user_id: int) -> int:
+    """Returns the current data version of a user in the current database."""
+    key = (str(db.engine.url), user_id)
+    return _user_versions.get_or_set(key, lambda: next(_next_version))
+
+
+def _bump_user_versions(url_key, user_ids):
+    for user_id in user_ids:
+        _user_versions.set((url_key, user_id), next(_next_version))
+
+
+def note_user_data_change(user_id: int):
+    """
+    Records that the current transaction writes a user's cart or orders. The
+    user's cached tool results are invalidated once the transaction commits.
+    """
+    db.session.info.setdefault("user_data_changed_ids", set()).add(user_id)
+
+
+def cached_read(user_id: int, tool_name: str, arguments, compute):
+    """
+    Returns the cached result of a read tool for `user_id`, calling `compute()`
+    on a miss. `arguments` must be hashable. Exceptions from `compute()` are
+    not cached.
+    """
+    if not is_enabled():
+        return compute()
+    url_key = str(db.engine.url)
+    # Take the versions before reading, so a result computed while a write
+    # committed is filed under the old version.
+    key = (
+        url_key,
+        user_id,
+        get_user_data_version(user_id),
+        _catalog_generations.get(url_key, 0),
+        tool_name,
+        arguments,
+    )
+    result = _tool_cache.get(key)
+    if result is not None:
+        metrics.increment("chat.tool_cache.hits")
+        return result
+    metrics.increment("chat.tool_cache.misses")
+    result = compute()
+    _tool_cache.set(key, result)
+    return result
+
+
+def clear():
+    _tool_cache.clear()
+    _user_versions.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_data_changes(session):
+    user_ids = session.info.pop("user_data_changed_ids", None)
+    if user_ids:
+        _bump_user_versions(str(session.get_bind().url), user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_data_changes(session):
+    session.info.pop("user_data_changed_ids", None)
+
+
+def _bump_catalog_generation(url_key):
+    _catalog_generations[url_key] = _catalog_generations.get(url_key, 0) + 1
+
+
+def _on_catalog_commit(url_key, changed, deleted_ids):
+    _bump_catalog_generation(url_key)
+
+
+def _on_catalog_invalidate(url_key, product_ids):
+    # Targeted invalidations come from stock updates; only a full one (None)
+    # may have renamed or repriced products.
+    if product_ids is None:
+        _bump_catalog_generation(url_key)
+
+
+catalog_service.register_change_listener(_on_catalog_commit, _on_catalog_invalidate)
@@ -0,0 +1,293 @@
+# Denormalized per-user counters (models.UserStats and models.ChatUserStats).
+#
+# Pages used to count a user's chat messages and add up their cart on every
+# load. The counters are now kept in one row per user and changed in the same
+# transaction as the data they summarise:
+#
+# - cart_service and the cart sweeper call refresh_cart_stats() after changing
+#   cart items; it recomputes the cart columns from the (small) cart, so the
+#   total always uses current prices. Price edits and cart items changed
+#   through the ORM are picked up at flush time by the listener below.
+# - order_service applies deltas when an order is placed or cancelled.
+# - chat_message_service adds the number of stored messages, and clearing the
+#   history resets it. The chat counter lives in the chat bind, next to the
+#   messages, because one transaction cannot span two database files.
+#
+# Writers only update rows that exist. A missing row (an existing user before
+# the first page load, or rows loaded in bulk) is built from aggregates by the
+# first read, in a single INSERT ... SELECT, so it cannot miss a concurrent
+# write.
+
+import itertools
+import logging
+
+from sqlalchemy import bindparam, event, exists, func, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import (
+    CHAT_BIND_KEY,
+    CartItem,
+    ChatMessage,
+    ChatUserStats,
+    Order,
+    OrderStatus,
+    Product,
+    User,
+    UserStats,
+)
+
+logger = logging.getLogger(__name__)
+
+_user_stats = UserStats.__table__
+_chat_user_stats = ChatUserStats.__table__
+_cart_items = CartItem.__table__
+_orders = Order.__table__
+_products = Product.__table__
+_chat_messages = ChatMessage.__table__
+
+
+def _cart_aggregates(user_id_column):
+    item_count = (
+        select(func.count())
+        .where(_cart_items.c.user_id == user_id_column)
+        .scalar_subquery()
+    )
+    total = (
+        select(func.coalesce(func.sum(_cart_items.c.quantity * _products.c.price), 0.0))
+        .join(_products, _products.c.id == _cart_items.c.product_id)
+        .where(_cart_items.c.user_id == user_id_column)
+        .scalar_subquery()
+    )
+    return item_count, total
+
+
+def _order_aggregates(user_id_column):
+    order_count = (
+        select(func.count())
+        .where(_orders.c.user_id == user_id_column)
+        .scalar_subquery()
+    )
+    spend = (
+        select(func.coalesce(func.sum(_orders.c.total_amount), 0.0))
+        .where(_orders.c.user_id == user_id_column)
+        .where(_orders.c.status != OrderStatus.CANCELLED)
+        .scalar_subquery()
+    )
+    return order_count, spend
+
+
+def _backfill_user_stats(connection, user_ids=None):
+    """Inserts the missing UserStats rows of `user_ids` (all users if None)."""
+    users = User.__table__
+    cart_item_count, cart_total = _cart_aggregates(users.c.id)
+    order_count, lifetime_spend = _order_aggregates(users.c.id)
+    rows = select(
+        users.c.id, cart_item_count, cart_total, order_count, lifetime_spend
+    ).where(~exists().where(_user_stats.c.user_id == users.c.id))
+    if user_ids is not None:
+        rows = rows.where(users.c.id.in_(user_ids))
+    connection.execute(
+        sqlite_insert(_user_stats)
+        .from_select(
+            [
+                "user_id",
+                "cart_item_count",
+                "cart_total",
+                "order_count",
+                "lifetime_spend",
+            ],
+            rows,
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+def _backfill_chat_user_stats(connection, user_id=None):
+    """Inserts the missing ChatUserStats row of `user_id` (of every user with
+    messages if None)."""
+    if user_id is None:
+        rows = (
+            select(_chat_messages.c.user_id, func.count())
+            .where(
+                ~exists().where(_chat_user_stats.c.user_id == _chat_messages.c.user_id)
+            )
+            .group_by(_chat_messages.c.user_id)
+        )
+    else:
+        message_count = (
+            select(func.count())
+            .where(_chat_messages.c.user_id == user_id)
+            .scalar_subquery()
+        )
+        # The WHERE clause keeps SQLite from counting when the row exists.
+        rows = select(
+            bindparam("user_id", user_id, type_=_chat_user_stats.c.user_id.type),
+            message_count,
+        ).where(~exists().where(_chat_user_stats.c.user_id == user_id))
+    connection.execute(
+        sqlite_insert(_chat_user_stats)
+        .from_select(["user_id", "message_count"], rows)
+        .on_conflict_do_nothing()
+    )
+
+
+def backfill_all():
+    """Builds the counter rows of every user, e.g. after a bulk load."""
+    with db.engine.begin() as conn:
+        _backfill_user_stats(conn)
+    with db.engines[CHAT_BIND_KEY].begin() as conn:
+        _backfill_chat_user_stats(conn)
+
+
+def _build_missing_row(model, backfill, *args):
+    """
+    Runs `backfill(connection, *args)` for a counter row that was not found.
+
+    When the session has no write transaction open on the row's database, the
+    row is built and committed on a separate connection, so reading the
+    counters never commits (and expires) the caller's session. When it does,
+    a second connection would wait for the session's lock, so the row is built
+    in the session's transaction and stored when the caller commits.
+    """
+    bind_arguments = {"mapper": model}
+    session_connection = db.session.connection(bind_arguments=bind_arguments)
+    if session_connection.connection.dbapi_connection.in_transaction:
+        backfill(session_connection, *args)
+    else:
+        engine = db.engines[getattr(model, "__bind_key__", None)]
+        with engine.begin() as conn:
+            backfill(conn, *args)
+
+
+def get_user_stats(user_id: int) -> UserStats:
+    """
+    Returns the cart and order counters of a user, building the row from
+    aggregates the first time.
+    """
+    stats = db.session.get(UserStats, user_id, populate_existing=True)
+    if stats is None:
+        _build_missing_row(UserStats, _backfill_user_stats, [user_id])
+        stats = db.session.get(UserStats, user_id)
+    return stats
+
+
+def get_message_count(user_id: int) -> int:
+    """
+    Returns the number of stored chat messages of a user, building the counter
+    from a COUNT the first time.
+    """
+    count_query = select(_chat_user_stats.c.message_count).where(
+        _chat_user_stats.c.user_id == user_id
+    )
+    # A Core select is not routed by table: name the chat bind explicitly.
+    bind_arguments = {"mapper": ChatUserStats}
+    message_count = db.session.scalar(count_query, bind_arguments=bind_arguments)
+    if message_count is None:
+        _build_missing_row(ChatUserStats, _backfill_chat_user_stats, user_id)
+        message_count = db.session.scalar(count_query, bind_arguments=bind_arguments)
+    return message_count
+
+
+def _refresh_cart_stats_statement(user_filter):
+    cart_item_count, cart_total = _cart_aggregates(_user_stats.c.user_id)
+    return (
+        update(_user_stats)
+        .where(user_filter)
+        .values(cart_item_count=cart_item_count, cart_total=cart_total)
+    )
+
+
+def refresh_cart_stats(user_ids):
+    """
+    Recomputes the cart counters of `user_ids` in the current transaction.
+    Call after changing their cart items, before committing.
+    """
+    user_ids = list(user_ids)
+    if user_ids:
+        db.session.execute(
+            _refresh_cart_stats_statement(_user_stats.c.user_id.in_(user_ids))
+        )
+
+
+def record_order_placed(user_id: int, total_amount: float):
+    """Counts a new order in the current transaction."""
+    db.session.execute(
+        update(_user_stats)
+        .where(_user_stats.c.user_id == user_id)
+        .values(
+            order_count=_user_stats.c.order_count + 1,
+            lifetime_spend=_user_stats.c.lifetime_spend + total_amount,
+        )
+    )
+
+
+def record_order_cancelled(user_id: int, total_amount: float):
+    """Removes a cancelled order from the spend in the current transaction."""
+    db.session.execute(
+        update(_user_stats)
+        .where(_user_stats.c.user_id == user_id)
+        .values(lifetime_spend=_user_stats.c.lifetime_spend - total_amount)
+    )
+
+
+def record_messages(connection, message_counts):
+    """
+    Adds {user_id: stored messages} to the chat counters, using `connection`
+    (a Connection or Session of the chat bind) so it joins the transaction
+    that stores the messages.
+    """
+    if message_counts:
+        connection.execute(
+            update(_chat_user_stats)
+            .where(_chat_user_stats.c.user_id == bindparam("counted_user_id"))
+            .values(
+                message_count=_chat_user_stats.c.message_count
+                + bindparam("added_count")
+            ),
+            [
+                {"counted_user_id": user_id, "added_count": count}
+                for user_id, count in message_counts.items()
+            ],
+        )
+
+
+def reset_message_count(user_id: int):
+    """Sets a user's chat counter to zero in the current transaction."""
+    db.session.execute(
+        update(_chat_user_stats)
+        .where(_chat_user_stats.c.user_id == user_id)
+        .values(message_count=0)
+    )
+
+
+# --- Cart changes made through the ORM ---
+# Price edits change the cart total of every user holding the product, and
+# CartItem objects flushed by the ORM (e.g. cascades from a deleted product)
+# bypass cart_service; both are refreshed in the flushing transaction.
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_cart_stats_after_flush(session, flush_context):
+    user_ids = set()
+    repriced_ids = set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, CartItem):
+            user_ids.add(obj.user_id)
+        elif (
+            isinstance(obj, Product)
+            and obj.id is not None
+            and inspect(obj).attrs.price.history.has_changes()
+        ):
+            repriced_ids.add(obj.id)
+    if not user_ids and not repriced_ids:
+        return
+    user_filter = _user_stats.c.user_id.in_(
+        select(_cart_items.c.user_id).where(_cart_items.c.product_id.in_(repriced_ids))
+    )
+    if user_ids:
+        user_filter = user_filter | _user_stats.c.user_id.in_(user_ids)
+    session.connection(bind_arguments={"mapper": inspect(UserStats)}).execute(
+        _refresh_cart_stats_statement(user_filter)
+    )
@@ -0,0 +1,230 @@
+# Per-request and per-agent-turn SQL statistics.
+#
+# Engine events count every statement executed while a QueryLog is active,
+# add up its time, and group statements by fingerprint (the SQL text with
+# whitespace and IN lists collapsed; parameters are already placeholders).
+# A fingerprint executed SQL_N_PLUS_ONE_THRESHOLD times or more in one request
+# or turn is reported as a suspected N+1 pattern: a query issued once per row
+# of an earlier result instead of once for all of them.
+#
+# init_app() tracks every Flask request, adds X-SQL-* response headers in
+# debug mode (or with SQL_INSTRUMENTATION_HEADERS), and logs a summary when
+# the request ends. chatbot_service tracks each agent turn with start() and
+# finish(). Logs are one JSON object per request or turn, also attached to
+# the record as `sql_stats` for structured handlers; they are written at
+# WARNING when an N+1 pattern is suspected, otherwise at DEBUG (INFO with
+# SQL_INSTRUMENTATION_LOG_ALL).
+#
+# The active logs live in a context variable, so coroutines and threads
+# started with a copy of the context (the background event loop,
+# asyncio.to_thread) count towards the request or turn that started them;
+# background writer threads count towards nothing.
+
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+# How many repeated fingerprints a summary lists.
+MAX_REPORTED_STATEMENTS = 5
+MAX_HEADER_STATEMENT_CHARS = 200
+
+# Logs that statements executed in this context are added to, innermost last.
+_active_logs = contextvars.ContextVar("sql_active_logs", default=())
+
+_ActiveLog = namedtuple("_ActiveLog", ["log", "token"])
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def fingerprint(statement: str) -> str:
+    """Returns the SQL text with whitespace and IN (?, ?, ...) lists collapsed."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(?, ...)", statement)
+
+
+class QueryLog:
+    """The statements executed during one request or agent turn."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.fingerprints = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, statement_fingerprint: str, seconds: float):
+        with self._lock:
+            self.query_count += 1
+            self.sql_seconds += seconds
+            self.fingerprints[statement_fingerprint] += 1
+
+    def repeated(self, min_count: int = 2):
+        """Returns [(fingerprint, count)] executed at least `min_count` times,
+        most frequent first."""
+        with self._lock:
+            counts = self.fingerprints.most_common()
+        return [(sql, count) for sql, count in counts if count >= min_count]
+
+    def summary(self, threshold: int) -> dict:
+        repeated = self.repeated()
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "query_count": self.query_count,
+            "sql_ms": round(self.sql_seconds * 1000, 2),
+            "distinct_statements": len(self.fingerprints),
+            "max_repeats": repeated[0][1] if repeated else int(self.query_count > 0),
+            "repeated_statements": [
+                {"sql": sql, "count": count}
+                for sql, count in repeated[:MAX_REPORTED_STATEMENTS]
+            ],
+            "suspected_n_plus_one": [
+                {"sql": sql, "count": count}
+                for sql, count in repeated
+                if count >= threshold
+            ],
+        }
+
+
+def _threshold() -> int:
+    if not has_app_context():
+        return DEFAULT_N_PLUS_ONE_THRESHOLD
+    return current_app.config.get(
+        "SQL_N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD
+    )
+
+
+def is_enabled() -> bool:
+    return current_app.config.get("SQL_INSTRUMENTATION", True)
+
+
+def start(kind: str, name: str):
+    """
+    Starts collecting the statements executed in the current context (and in
+    contexts copied from it) into a new QueryLog. Pass the returned handle to
+    finish() in the same context. Returns None when instrumentation is off.
+    """
+    if not is_enabled():
+        return None
+    log = QueryLog(kind, name)
+    token = _active_logs.set(_active_logs.get() + (log,))
+    return _ActiveLog(log, token)
+
+
+def finish(handle) -> dict:
+    """
+    Stops a QueryLog started with start(), logs and records its summary, and
+    returns the summary (None for a None handle).
+    """
+    if handle is None:
+        return None
+    try:
+        _active_logs.reset(handle.token)
+    except ValueError:
+        # Finished from a copy of the starting context: drop just this log.
+        _active_logs.set(tuple(l for l in _active_logs.get() if l is not handle.log))
+    summary = handle.log.summary(_threshold())
+    _report(summary)
+    return summary
+
+
+def _report(summary):
+    kind = summary["kind"]
+    metrics.record(f"sql.queries_per_{kind}", summary["query_count"])
+    metrics.record(f"sql.ms_per_{kind}", summary["sql_ms"])
+    suspects = summary["suspected_n_plus_one"]
+    if suspects:
+        metrics.increment("sql.n_plus_one_suspected")
+        level = logging.WARNING
+        message = (
+            f"Suspected N+1 queries in {kind} {summary['name']}: "
+            f"{suspects[0]['count']} x {suspects[0]['sql']}"
+        )
+    else:
+        log_all = has_app_context() and current_app.config.get(
+            "SQL_INSTRUMENTATION_LOG_ALL", False
+        )
+        level = logging.INFO if log_all else logging.DEBUG
+        message = f"SQL for {kind} {summary['name']}"
+    if logger.isEnabledFor(level):
+        logger.log(
+            level,
+            f"{message} {json.dumps(summary)}",
+            extra={"sql_stats": summary},
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_logs.get() and context is not None:
+        context._sql_instrumentation_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_instrumentation_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    statement_fingerprint = fingerprint(statement)
+    # An executemany counts as one statement.
+    for log in _active_logs.get():
+        log.add(statement_fingerprint, elapsed)
+
+
+# --- Flask requests ---
+
+
+def _header_value(value) -> str:
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def start_request_log():
+    """Starts the QueryLog of the current request (a before_request hook)."""
+    g.sql_query_log = start("request", f"{request.method} {request.path}")
+
+
+def init_app(app):
+    """Tracks the SQL of every request of the app (see the module comment)."""
+
+    app.before_request(start_request_log)
+
+    @app.after_request
+    def _add_sql_headers(response):
+        handle = g.get("sql_query_log")
+        if handle is None or not (
+            app.debug or app.config.get("SQL_INSTRUMENTATION_HEADERS")
+        ):
+            return response
+        summary = handle.log.summary(_threshold())
+        response.headers["X-SQL-Query-Count"] = str(summary["query_count"])
+        response.headers["X-SQL-Time-Ms"] = f"{summary['sql_ms']:.2f}"
+        response.headers["X-SQL-Max-Repeats"] = str(summary["max_repeats"])
+        suspects = summary["suspected_n_plus_one"]
+        if suspects:
+            response.headers["X-SQL-Suspected-N-Plus-One"] = _header_value(
+                f"{suspects[0]['count']} x "
+                f"{suspects[0]['sql'][:MAX_HEADER_STATEMENT_CHARS]}"
+            )
+        return response
+
+    @app.teardown_request
+    def _finish_request_log(error):
+        handle = g.pop("sql_query_log", None)
+        if handle is not None:
+            finish(handle)
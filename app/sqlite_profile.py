@@ -0,0 +1,264 @@
+# Production SQLite profile (SQLITE_PRODUCTION_PROFILE in Config).
+#
+# With the default rollback journal, every chat message insert, cart update
+# and checkout blocks readers browsing the catalog, and concurrent writers
+# spin in SQLite's busy handler. The profile:
+#
+# - switches the database to WAL, so readers and the writer no longer block
+#   each other, and sets busy_timeout, synchronous, mmap_size and cache_size
+#   on every connection;
+# - routes reads made inside read_only() (browse, order and chat history
+#   service calls) to a separate pool of query_only connections;
+# - serializes ORM writes through one writer lock per database: a session
+#   takes the lock of each database it writes to when it first flushes or runs
+#   an ORM UPDATE/DELETE/INSERT there, and releases them when its transaction
+#   ends, so writers queue in order instead of polling for SQLite's lock. A
+#   session that waits longer than SQLITE_BUSY_TIMEOUT_MS gets a TimeoutError
+#   from the flush or statement: it never writes without the lock, and the
+#   caller rolls back (and may retry). A session on an event-loop thread (chat
+#   tools) never waits for the lock, which would stall every coroutine on the
+#   loop: it takes the lock only if it is free and otherwise writes under
+#   busy_timeout, like Core writes on an engine (the agent session store).
+#
+# Each bind (SQLALCHEMY_BINDS) gets its own reader pool and writer lock, and
+# SQLITE_BIND_SETTINGS can override the pragmas per bind. A session that has
+# written to a database in its current transaction keeps reading it from the
+# writer connection, so it always sees its own uncommitted changes.
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import Session
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "sqlite_profile"
+
+_read_only = contextvars.ContextVar("sqlite_read_only", default=False)
+# session.info key: {engine: writer lock held (None if written without it)}.
+_WRITER_LOCKS_KEY = "sqlite_writer_locks"
+
+
+class _Profile:
+    def __init__(self, readers, write_locks, lock_timeout):
+        # Writer engine -> engine of read-only connections to the same file.
+        self.readers = readers
+        self.write_locks = write_locks
+        self.lock_timeout = lock_timeout
+
+
+class RoutingSession(FlaskSession):
+    """
+    Flask-SQLAlchemy session that sends reads made inside read_only() to the
+    read-only pool of the profile, when one is configured.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (
+            bind is None
+            and _read_only.get()
+            and (clause is None or getattr(clause, "is_select", False))
+            and not self._flushing
+            and engine not in self.info.get(_WRITER_LOCKS_KEY, ())
+        ):
+            profile = current_app.extensions.get(EXTENSION_KEY)
+            if profile is not None:
+                return profile.readers.get(engine, engine)
+        return engine
+
+
+@contextmanager
+def read_only():
+    """
+    Marks the enclosed database reads as read-only, so the production profile
+    may serve them from its pool of read-only connections. Also usable as a
+    decorator: @read_only().
+    """
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def _is_file_database(engine) -> bool:
+    database = engine.url.database
+    return (
+        engine.dialect.name == "sqlite"
+        and bool(database)
+        and database != ":memory:"
+        and "mode=memory" not in str(engine.url)
+    )
+
+
+def _engine_options(app, bind_key):
+    """The create_engine() options of a bind, without its URL."""
+    if bind_key is None:
+        return app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+    value = app.config["SQLALCHEMY_BINDS"][bind_key]
+    if not isinstance(value, dict):
+        return {}
+    return {name: option for name, option in value.items() if name != "url"}
+
+
+def _pragma_listener(settings, query_only):
+    statements = [
+        f"PRAGMA busy_timeout = {int(settings['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous = {settings['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size = {int(settings['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = -{int(settings['SQLITE_CACHE_SIZE_KB'])}",
+    ]
+    statements.insert(
+        0, "PRAGMA query_only = ON" if query_only else "PRAGMA journal_mode = WAL"
+    )
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def init_app(app, db):
+    """
+    Applies the production profile to every SQLite file database of the app,
+    if SQLITE_PRODUCTION_PROFILE is set. Call after db.init_app(app).
+    """
+    if not app.config.get("SQLITE_PRODUCTION_PROFILE"):
+        return
+    with app.app_context():
+        engines = dict(db.engines)
+
+    readers = {}
+    write_locks = {}
+    bind_settings = app.config.get("SQLITE_BIND_SETTINGS", {})
+    for bind_key, engine in engines.items():
+        if not _is_file_database(engine):
+            logger.warning(
+                f"SQLite production profile skipped for bind {bind_key!r}: "
+                f"not a SQLite file database."
+            )
+            continue
+        settings = {**app.config, **bind_settings.get(bind_key, {})}
+        pool_size = int(settings["SQLITE_READ_POOL_SIZE"])
+        event.listen(engine, "connect", _pragma_listener(settings, False))
+        # Connections opened before the listener existed lack the pragmas.
+        engine.dispose()
+        # Switch the file to WAL before any reader connects.
+        with engine.connect():
+            pass
+        reader = create_engine(
+            engine.url,
+            **{
+                **_engine_options(app, bind_key),
+                "pool_size": pool_size,
+                "max_overflow": pool_size,
+            },
+        )
+        event.listen(reader, "connect", _pragma_listener(settings, True))
+        readers[engine] = reader
+        write_locks[engine] = threading.Lock()
+
+    app.extensions[EXTENSION_KEY] = _Profile(
+        readers=readers,
+        write_locks=write_locks,
+        lock_timeout=app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000,
+    )
+
+
+def _get_profile():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _on_event_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _acquire_writer_locks(session, profile, engines):
+    """
+    Takes the writer lock of each of `engines` the session does not hold yet.
+
+    Raises:
+        TimeoutError: If a lock is not free within the busy timeout.
+    """
+    held = session.info.setdefault(_WRITER_LOCKS_KEY, {})
+    on_event_loop = _on_event_loop_thread()
+    # A consistent order keeps two sessions that write to the same databases
+    # from deadlocking; a session that reaches a second database in a later
+    # flush may time out instead.
+    for engine in sorted(engines, key=lambda engine: str(engine.url)):
+        lock = profile.write_locks.get(engine)
+        if lock is None or engine in held:
+            continue
+        if on_event_loop:
+            if lock.acquire(blocking=False):
+                held[engine] = lock
+            else:
+                metrics.increment("db.writer_lock_skipped_on_event_loop")
+                held[engine] = None
+            continue
+        start = time.perf_counter()
+        acquired = lock.acquire(timeout=profile.lock_timeout)
+        metrics.record("db.writer_lock_wait", time.perf_counter() - start)
+        if not acquired:
+            metrics.increment("db.writer_lock_timeouts")
+            raise TimeoutError(
+                f"Waited {profile.lock_timeout}s for the SQLite writer lock of "
+                f"{engine.url}; roll back and retry the transaction."
+            )
+        held[engine] = lock
+
+
+@event.listens_for(Session, "before_flush")
+def _lock_before_flush(session, flush_context, instances):
+    profile = _get_profile()
+    if profile is None:
+        return
+    engines = {
+        session.get_bind(mapper=inspect(instance).mapper)
+        for instance in itertools.chain(session.new, session.dirty, session.deleted)
+    }
+    _acquire_writer_locks(session, profile, engines)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _lock_before_bulk_write(orm_execute_state):
+    profile = _get_profile()
+    if profile is not None and (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        session = orm_execute_state.session
+        engine = session.get_bind(**orm_execute_state.bind_arguments)
+        _acquire_writer_locks(session, profile, [engine])
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_writer_locks(session, transaction):
+    if transaction.parent is not None or _WRITER_LOCKS_KEY not in session.info:
+        return
+    for lock in session.info.pop(_WRITER_LOCKS_KEY).values():
+        if lock is not None:
+            lock.release()
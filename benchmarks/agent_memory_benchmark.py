@@ -0,0 +1,133 @@
+"""
+Compares memory and new-user latency of one LlmAgent/Runner per user (the
+previous design) with the shared agent, using a fake model.
+
+For --users simulated users it reports the memory held by agent objects, and
+for a sample of new users the time of their first chat turn.
+
+Usage:
+    python -m benchmarks.agent_memory_benchmark [--users 10000] [--sample 50]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+
+from google.adk.agents import LlmAgent
+from google.adk.runners import Runner
+
+from app import db
+from app.agent_tools import get_all_adk_tools
+from app.fake_llm import FakeLlm
+from app.models import User
+from app.services import chat_message_service, chatbot_service
+from benchmarks.common import make_app
+
+
+def _per_user_runner(user_id):
+    """Builds a runner the way the per-user design did (user id in the prompt)."""
+    agent = LlmAgent(
+        model=chatbot_service.MODEL_NAME,
+        name="chatstore_agent",
+        instruction=f"The current User ID is: {user_id}.\n"
+        + chatbot_service.AGENT_INSTRUCTION,
+        tools=get_all_adk_tools(),
+        input_schema=chatbot_service.ChatCommandInput,
+        output_key="chatbot_action_result",
+        before_model_callback=chatbot_service._release_db_connection,
+    )
+    return Runner(
+        agent=agent,
+        app_name=chatbot_service.APP_NAME,
+        session_service=chatbot_service._session_service,
+    )
+
+
+def _agent_memory(users, per_user):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    runners = {}
+    for user_id in range(1, users + 1):
+        if per_user:
+            runners[user_id] = _per_user_runner(user_id)
+        else:
+            runners[user_id] = chatbot_service.get_user_runner_and_session(
+                user_id, "bench-key"
+            )[0]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, elapsed, len({id(runner) for runner in runners.values()})
+
+
+def _per_user_lookup(user_id, api_key):
+    adk_user_id, adk_session_id = chatbot_service.get_adk_session_ids(user_id)
+    return _per_user_runner(user_id), adk_user_id, adk_session_id
+
+
+def _first_turns(user_ids, per_user):
+    shared_lookup = chatbot_service.get_user_runner_and_session
+    if per_user:
+        chatbot_service.get_user_runner_and_session = _per_user_lookup
+    try:
+        samples = []
+        for user_id in user_ids:
+            start = time.perf_counter()
+            asyncio.run(
+                chatbot_service.handle_message_async(user_id, "hi", "bench-key")
+            )
+            samples.append(time.perf_counter() - start)
+    finally:
+        chatbot_service.get_user_runner_and_session = shared_lookup
+    return sorted(samples)
+
+
+def run(users, sample):
+    chatbot_service.MODEL_NAME = FakeLlm(latency=0.0)
+    app, db_path = make_app(GOOGLE_API_KEY="bench-key")
+    try:
+        with app.app_context():
+            db.session.add_all(
+                User(email=f"mem{i}@example.com", name=f"Mem {i}", password_hash="x")
+                for i in range(sample * 2)
+            )
+            db.session.commit()
+            chatbot_service.get_runner("bench-key")  # Build the shared agent first
+
+            for label, per_user in (("per-user agents", True), ("shared agent", False)):
+                held, elapsed, distinct = _agent_memory(users, per_user)
+                print(
+                    f"{label:16} {users} users: agent memory={held / 2**20:8.1f} MiB "
+                    f"({held / users:8.0f} B/user) distinct runners={distinct:5} "
+                    f"setup={elapsed * 1000 / users:6.3f}ms/user"
+                )
+
+            for label, per_user, first_id in (
+                ("shared agent", False, 1),
+                ("per-user agents", True, sample + 1),
+            ):
+                samples = _first_turns(range(first_id, first_id + sample), per_user)
+                print(
+                    f"{label:16} first turn of a new user: "
+                    f"p50={statistics.median(samples) * 1000:7.2f}ms "
+                    f"p95={samples[int(len(samples) * 0.95) - 1] * 1000:7.2f}ms"
+                )
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--sample", type=int, default=50)
+    args = parser.parse_args()
+    run(args.users, args.sample)
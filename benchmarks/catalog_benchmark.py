@@ -0,0 +1,67 @@
+"""
+Compares browse filtering served from the NumPy catalog snapshot against SQL.
+
+Usage:
+    python -m benchmarks.catalog_benchmark [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import os
+
+from app.services import browse_service, catalog_service
+from benchmarks.common import (
+    CATEGORIES,
+    format_stats,
+    insert_products,
+    make_app,
+    time_call,
+)
+
+FILTER_SETS = {
+    "no filters": {},
+    "price range": {"min_price": 1000, "max_price": 5000},
+    "2 categories + rating": {"categories": CATEGORIES[:2], "min_rating": 4},
+    "everything": {
+        "categories": CATEGORIES[:5],
+        "min_price": 500,
+        "max_price": 20000,
+        "min_rating": 2,
+    },
+}
+
+
+def run(sizes, repeat):
+    for size in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                insert_products(size)
+                print(f"\n=== {size:,} products ===")
+                app.config["CATALOG_SNAPSHOT_ENABLED"] = True
+                load = time_call(
+                    lambda: catalog_service.get_snapshot().page(), repeat=1
+                )
+                print(f"snapshot load {format_stats(load)}")
+                for use_snapshot in (False, True):
+                    app.config["CATALOG_SNAPSHOT_ENABLED"] = use_snapshot
+                    label = "numpy" if use_snapshot else "sql  "
+                    for name, filters in FILTER_SETS.items():
+                        stats = time_call(
+                            lambda: browse_service.get_filtered_products_page(
+                                with_total=True, **filters
+                            ),
+                            repeat=repeat,
+                        )
+                        print(f"{label} {name:22} {format_stats(stats)}")
+        finally:
+            os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,153 @@
+"""
+Measures how many concurrent chats one worker sustains with a fake model.
+
+Every chat takes `--latency` seconds of (simulated) model time. A burst of N
+chats from N different users is sent at once and the time until each reply
+(including any time queued for a worker thread) is reported: a worker
+sustains N concurrent chats while the p95 stays close to the single-chat time.
+
+Modes:
+    per-request-loop  Old behaviour: a WSGI worker with --threads threads, each
+                      request running asyncio.run(handle_message_async(...)).
+    loop-thread       The /chatbot/chat WSGI route with the same thread count,
+                      submitting turns to the shared background event loop.
+    asgi              The ASGI entry point (app/asgi.py) on a single event loop.
+
+Usage:
+    python -m benchmarks.chat_concurrency_benchmark [--concurrency 1 8 32 128]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.asgi import ChatStoreASGI
+from app.fake_llm import FakeLlm
+from app.models import User
+from app.services import chat_message_service, chatbot_service
+from benchmarks.common import make_app
+
+MODES = ("per-request-loop", "loop-thread", "asgi")
+
+
+def _create_users(app, count):
+    # A single PBKDF2 iteration keeps logging in hundreds of users fast.
+    password_hash = generate_password_hash("bench", method="pbkdf2:sha256:1")
+    with app.app_context():
+        users = [
+            User(
+                email=f"chat{i}@example.com",
+                name=f"Chat {i}",
+                password_hash=password_hash,
+            )
+            for i in range(count)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        return [(user.id, user.email) for user in users]
+
+
+def _login(app, email):
+    client = app.test_client()
+    response = client.post("/auth/login", data={"email": email, "password": "bench"})
+    assert response.status_code == 302, response.status_code
+    return client
+
+
+def _burst_per_request_loop(app, users, threads):
+    start = time.perf_counter()
+
+    def chat(user):
+        user_id, _ = user
+        with app.app_context():
+            asyncio.run(
+                chatbot_service.handle_message_async(
+                    user_id=user_id, user_message="hi", api_key="bench-key"
+                )
+            )
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(chat, users))
+
+
+def _burst_loop_thread(app, users, threads):
+    clients = [_login(app, email) for _, email in users]
+
+    start = time.perf_counter()
+
+    def chat(client):
+        response = client.post("/chatbot/chat", json={"message": "hi"})
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(chat, clients))
+
+
+def _burst_asgi(app, users):
+    cookies = [_login(app, email).get_cookie("session").value for _, email in users]
+    asgi_app = ChatStoreASGI(app)
+
+    async def chat(client, cookie, start):
+        response = await client.post(
+            "/chatbot/chat", json={"message": "hi"}, cookies={"session": cookie}
+        )
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    async def burst():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            start = time.perf_counter()
+            return await asyncio.gather(
+                *(chat(client, cookie, start) for cookie in cookies)
+            )
+
+    return asyncio.run(burst())
+
+
+def run(modes, concurrency_levels, latency, threads):
+    chatbot_service.MODEL_NAME = FakeLlm(latency=latency)
+    app, db_path = make_app(GOOGLE_API_KEY="bench-key")
+    try:
+        users = _create_users(app, max(concurrency_levels))
+        print(f"model latency {latency:.2f}s, WSGI threads {threads}")
+        for mode in modes:
+            for level in concurrency_levels:
+                burst_users = users[:level]
+                if mode == "per-request-loop":
+                    samples = _burst_per_request_loop(app, burst_users, threads)
+                elif mode == "loop-thread":
+                    samples = _burst_loop_thread(app, burst_users, threads)
+                else:
+                    samples = _burst_asgi(app, burst_users)
+                samples.sort()
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+                print(
+                    f"{mode:17} chats={level:4}: p50={statistics.median(samples):6.2f}s "
+                    f"p95={p95:6.2f}s throughput={level / samples[-1]:7.1f} chats/s"
+                )
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=MODES, nargs="+", default=list(MODES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    run(args.mode, args.concurrency, args.latency, args.threads)
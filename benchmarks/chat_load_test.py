@@ -0,0 +1,278 @@
+"""
+Load test of the whole chat pipeline: N simulated users, each logged in with
+its own session cookie, send a scripted mix of shopping messages to
+POST /chatbot/chat on the ASGI app (app/asgi.py). Every turn goes through the
+intent fast path, the response cache, the runner, the tools and the DB writes.
+The model is the offline fake selected with CHAT_MODEL = "fake", so no API key
+or network is needed and runs are repeatable for a given --seed.
+
+Reports throughput, latency percentiles and the time spent in SQLite write
+statements and commits, which is where waits for the database lock show up,
+and the number of write transactions.
+
+Usage:
+    python -m benchmarks.chat_load_test [--users 50] [--turns 10] \
+        [--latency 0.5] [--distribution lognormal] [--think-time 0.5] \
+        [--no-write-behind]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import httpx
+from werkzeug.security import generate_password_hash
+
+from app import db, fake_llm, metrics
+from app.asgi import ChatStoreASGI
+from app.models import Product, User
+from app.services import chat_message_service, chatbot_service
+from benchmarks.common import insert_products, make_app
+
+# (weight, message template); {product} is a random product name.
+MESSAGE_MIX = [
+    (3, "Tell me about the {product}"),
+    (2, "How much does the {product} cost?"),
+    (2, "Could you add 1 {product} to my cart for me?"),
+    (1, "Show my cart"),
+    (1, "what's in my cart right now, and what does it cost?"),
+    (1, "add 2 {product} to my cart"),
+    (1, "have I ordered anything recently? show my order history"),
+    (1, "Hi there, what can you do?"),
+]
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class _WriteTimer:
+    """Collects the duration of every SQLite write statement and commit."""
+
+    def __init__(self):
+        self.samples = []
+        self.locked_errors = 0
+        self.transactions = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, transaction=False):
+        with self._lock:
+            self.samples.append(seconds)
+            self.transactions += transaction
+
+    def reset(self):
+        with self._lock:
+            self.samples = []
+            self.locked_errors = 0
+            self.transactions = 0
+
+
+_write_timer = _WriteTimer()
+
+
+class _TimedCursor(sqlite3.Cursor):
+    def _timed(self, method, sql, *args):
+        if not sql.lstrip().upper().startswith(_WRITE_PREFIXES):
+            return method(sql, *args)
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                _write_timer.locked_errors += 1
+            raise
+        finally:
+            _write_timer.record(time.perf_counter() - start)
+
+    def execute(self, sql, *args):
+        return self._timed(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed(super().executemany, sql, *args)
+
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        # Only commits that end a write transaction are counted as one.
+        transaction = self.in_transaction
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _write_timer.record(time.perf_counter() - start, transaction)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _setup(app, users):
+    # A single PBKDF2 iteration keeps logging in hundreds of users fast.
+    password_hash = generate_password_hash("bench", method="pbkdf2:sha256:1")
+    with app.app_context():
+        insert_products(2000)
+        product_names = [
+            name.lower()
+            for name in db.session.scalars(
+                db.select(Product.name).where(Product.quantity_in_stock > 100)
+            )
+        ]
+        db.session.add_all(
+            User(
+                email=f"load{i}@example.com",
+                name=f"Load {i}",
+                password_hash=password_hash,
+            )
+            for i in range(users)
+        )
+        db.session.commit()
+
+    cookies = []
+    for i in range(users):
+        client = app.test_client()
+        response = client.post(
+            "/auth/login", data={"email": f"load{i}@example.com", "password": "bench"}
+        )
+        assert response.status_code == 302, response.status_code
+        cookies.append(client.get_cookie("session").value)
+    return product_names, cookies
+
+
+async def _simulated_user(asgi_app, cookie, rng, product_names, turns, think_time):
+    weights = [weight for weight, _ in MESSAGE_MIX]
+    templates = [template for _, template in MESSAGE_MIX]
+    results = []
+    # One client per user: a shared client would share one cookie jar, and with
+    # it whichever session cookie the server set last.
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=asgi_app),
+        base_url="http://load",
+        cookies={"session": cookie},
+        timeout=None,
+    ) as client:
+        for _ in range(turns):
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+            message = rng.choices(templates, weights)[0].format(
+                product=rng.choice(product_names)
+            )
+            start = time.perf_counter()
+            response = await client.post("/chatbot/chat", json={"message": message})
+            results.append((time.perf_counter() - start, response.status_code == 200))
+    return results
+
+
+async def _run_load(asgi_app, cookies, product_names, turns, think_time, seed):
+    return await asyncio.gather(
+        *(
+            _simulated_user(
+                asgi_app,
+                cookie,
+                random.Random(seed + i),
+                product_names,
+                turns,
+                think_time,
+            )
+            for i, cookie in enumerate(cookies)
+        )
+    )
+
+
+def main(users, turns, latency, distribution, think_time, seed, write_behind=True):
+    app, db_path = make_app(
+        CHAT_MODEL=chatbot_service.OFFLINE_MODEL,
+        CHAT_MESSAGE_WRITE_BEHIND=write_behind,
+        CHAT_FAKE_LLM_LATENCY=latency,
+        CHAT_FAKE_LLM_LATENCY_DISTRIBUTION=distribution,
+        CHAT_FAKE_LLM_SEED=seed,
+        SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"factory": _TimedConnection}},
+    )
+    chatbot_service._runner = None
+    try:
+        product_names, cookies = _setup(app, users)
+        _write_timer.reset()
+        metrics.reset()
+        print(
+            f"{users} users x {turns} turns, fake model {distribution} latency "
+            f"{latency}s per call, think time {think_time}s, seed {seed}, chat "
+            f"message write-behind {'on' if write_behind else 'off'}"
+        )
+
+        start = time.perf_counter()
+        per_user = asyncio.run(
+            _run_load(
+                ChatStoreASGI(app), cookies, product_names, turns, think_time, seed
+            )
+        )
+        elapsed = time.perf_counter() - start
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+
+        latencies = sorted(t for results in per_user for t, _ in results)
+        errors = sum(1 for results in per_user for _, ok in results if not ok)
+        print(
+            f"turns {len(latencies)} ({errors} errors) in {elapsed:.2f}s: "
+            f"throughput {len(latencies) / elapsed:.1f} turns/s"
+        )
+        print(
+            "latency "
+            + " ".join(
+                f"{name}={_percentile(latencies, fraction) * 1000:.1f}ms"
+                for name, fraction in (
+                    ("p50", 0.5),
+                    ("p90", 0.9),
+                    ("p95", 0.95),
+                    ("p99", 0.99),
+                    ("max", 1.0),
+                )
+            )
+        )
+        waits = sorted(_write_timer.samples)
+        if waits:
+            print(
+                f"db writes {len(waits)} in {_write_timer.transactions} transactions: "
+                f"total {sum(waits):.3f}s "
+                f"({sum(waits) / len(latencies) * 1000:.2f}ms per turn), "
+                f"p95 {_percentile(waits, 0.95) * 1000:.2f}ms, "
+                f"max {waits[-1] * 1000:.2f}ms, "
+                f"'database is locked' errors {_write_timer.locked_errors}"
+            )
+        counters = metrics.snapshot()["counters"]
+        print(f"counters {counters}")
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument(
+        "--distribution", choices=fake_llm.LATENCY_DISTRIBUTIONS, default="lognormal"
+    )
+    parser.add_argument("--think-time", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--no-write-behind",
+        dest="write_behind",
+        action="store_false",
+        help="commit chat messages on the response path",
+    )
+    args = parser.parse_args()
+    main(
+        args.users,
+        args.turns,
+        args.latency,
+        args.distribution,
+        args.think_time,
+        args.seed,
+        args.write_behind,
+    )
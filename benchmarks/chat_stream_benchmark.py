@@ -0,0 +1,78 @@
+"""
+Compares time-to-first-byte of the JSON chat endpoint and the SSE streaming
+endpoint, using a fake model (optionally calling one tool first).
+
+Usage:
+    python -m benchmarks.chat_stream_benchmark [--latency 2.0] [--with-tool]
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.fake_llm import FakeLlm
+from app.models import User
+from app.services import chat_message_service, chatbot_service
+from benchmarks.common import make_app
+
+
+def _measure(client, path, repeat):
+    first_byte, complete = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post(path, json={"message": "hi"}, buffered=False)
+        first = None
+        for _chunk in response.response:
+            if first is None:
+                first = time.perf_counter() - start
+        complete.append(time.perf_counter() - start)
+        first_byte.append(first if first is not None else complete[-1])
+        response.close()
+    return statistics.median(first_byte), statistics.median(complete)
+
+
+def run(latency, with_tool, repeat):
+    chatbot_service.MODEL_NAME = FakeLlm(
+        latency=latency,
+        tool_calls={"view_cart_executor": {}} if with_tool else {},
+    )
+    app, db_path = make_app(GOOGLE_API_KEY="bench-key")
+    try:
+        with app.app_context():
+            db.session.add(
+                User(
+                    email="stream@example.com",
+                    name="Stream",
+                    password_hash=generate_password_hash(
+                        "bench", method="pbkdf2:sha256:1"
+                    ),
+                )
+            )
+            db.session.commit()
+        client = app.test_client()
+        client.post(
+            "/auth/login", data={"email": "stream@example.com", "password": "bench"}
+        )
+        _measure(client, "/chatbot/chat", 1)  # Build the user's agent first
+
+        print(f"model latency {latency:.2f}s per call, tool call: {with_tool}")
+        for path in ("/chatbot/chat", "/chatbot/chat/stream"):
+            ttfb, total = _measure(client, path, repeat)
+            print(f"{path:22} first byte={ttfb:6.2f}s complete={total:6.2f}s")
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--with-tool", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.latency, args.with_tool, args.repeat)
@@ -0,0 +1,56 @@
+"""
+Measures checkout latency as the cart grows; it should stay roughly flat.
+
+Usage:
+    python -m benchmarks.checkout_benchmark [--cart-sizes 1 10 100 1000]
+"""
+
+import argparse
+import os
+import time
+
+from app import db
+from app.models import CartItem, User
+from app.services import order_service
+from benchmarks.common import insert_products, make_app
+
+
+def run(cart_sizes, repeat):
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            insert_products(max(cart_sizes))
+            user = User(email="checkout@example.com", name="Bench", password_hash="x")
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+            for size in cart_sizes:
+                samples = []
+                for _ in range(repeat):
+                    db.session.execute(
+                        CartItem.__table__.insert(),
+                        [
+                            {"user_id": user_id, "product_id": i, "quantity": 1}
+                            for i in range(1, size + 1)
+                        ],
+                    )
+                    db.session.commit()
+                    start = time.perf_counter()
+                    order_service.create_order_from_cart(user_id)
+                    samples.append((time.perf_counter() - start) * 1000)
+                samples.sort()
+                print(
+                    f"cart size {size:5}: p50={samples[len(samples) // 2]:8.2f}ms "
+                    f"max={samples[-1]:8.2f}ms"
+                )
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cart-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.cart_sizes, args.repeat)
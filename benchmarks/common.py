@@ -0,0 +1,142 @@
+import atexit
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app import create_app, db
+from app.config import Config
+from app.models import Product
+
+CATEGORIES = [
+    "Electronics",
+    "Fruits",
+    "Vegetables",
+    "Dairy",
+    "Bakery",
+    "Clothing",
+    "Home & Kitchen",
+    "Sports",
+    "Toys",
+    "Books",
+]
+WORDS = [
+    "apple",
+    "banana",
+    "watch",
+    "phone",
+    "pro",
+    "max",
+    "mini",
+    "organic",
+    "fresh",
+    "smart",
+    "wireless",
+    "classic",
+    "cotton",
+    "steel",
+    "bottle",
+    "lamp",
+    "chair",
+    "table",
+    "shirt",
+    "shoe",
+    "ball",
+    "racket",
+    "novel",
+    "guide",
+    "cheese",
+    "milk",
+    "bread",
+    "cake",
+    "tomato",
+    "onion",
+    "laptop",
+    "tablet",
+    "speaker",
+    "camera",
+    "charger",
+    "cable",
+    "mug",
+    "pan",
+    "knife",
+]
+
+
+def make_app(db_path=None, shared_chat_db=False, **config_overrides):
+    """
+    Creates an app bound to a throwaway SQLite database with fresh tables. The
+    chat bind gets its own throwaway file (removed at exit), as in the default
+    config, so queries sent to the wrong bind fail; with shared_chat_db it
+    shares the main file. Either way it uses the same
+    SQLALCHEMY_ENGINE_OPTIONS, unless SQLALCHEMY_BINDS is overridden.
+    """
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix=".db", prefix="chatstore-bench-")
+        os.close(fd)
+    chat_path = db_path
+    if not shared_chat_db and "SQLALCHEMY_BINDS" not in config_overrides:
+        fd, chat_path = tempfile.mkstemp(suffix=".db", prefix="chatstore-bench-chat-")
+        os.close(fd)
+        atexit.register(_remove_database_files, chat_path)
+    engine_options = config_overrides.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+    attrs = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "SQLALCHEMY_BINDS": {
+            "chat": {"url": f"sqlite:///{chat_path}", **engine_options}
+        },
+        **config_overrides,
+    }
+    app = create_app(type("BenchmarkConfig", (Config,), attrs))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app, db_path
+
+
+def _remove_database_files(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def insert_products(count, seed=42, batch_size=50_000):
+    """Bulk-inserts `count` synthetic products (requires an app context)."""
+    rng = random.Random(seed)
+    table = Product.__table__
+    for start in range(0, count, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, count)):
+            words = rng.sample(WORDS, 3)
+            rows.append(
+                {
+                    "name": f"{' '.join(words).title()} {i}",
+                    "description": f"A {words[0]} {rng.choice(WORDS)} for everyday use.",
+                    "price": round(rng.uniform(10, 50_000), 2),
+                    "quantity_in_stock": rng.randint(0, 500),
+                    "rating": round(rng.uniform(0, 5), 1),
+                    "category": rng.choice(CATEGORIES),
+                }
+            )
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+
+def time_call(func, repeat=20):
+    """Runs `func` `repeat` times and returns latency stats in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def format_stats(stats):
+    return " ".join(f"{key}={value:8.2f}ms" for key, value in stats.items())
@@ -0,0 +1,91 @@
+"""
+Runs one long conversation (every turn calls view_cart on a full cart) with
+conversation compaction disabled and enabled, and reports the prompt size and
+turn latency as the conversation grows.
+
+The fake model's latency grows with the prompt (--per-1k-tokens seconds per
+1000 prompt tokens), like a real model's prompt processing.
+
+Usage:
+    python -m benchmarks.conversation_length_benchmark [--turns 60]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app import db, metrics
+from app.fake_llm import FakeLlm
+from app.models import CartItem, User
+from app.services import chat_message_service, chatbot_service
+from benchmarks.common import insert_products, make_app
+
+CART_SIZE = 25
+
+
+def _run_conversation(compaction, turns, checkpoints):
+    app, db_path = make_app(
+        GOOGLE_API_KEY="bench-key", CHAT_COMPACTION_ENABLED=compaction
+    )
+    rows = []
+    try:
+        with app.app_context():
+            insert_products(CART_SIZE)
+            user = User(email="long@example.com", name="Long", password_hash="x")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all(
+                CartItem(user_id=user.id, product_id=product_id, quantity=1)
+                for product_id in range(1, CART_SIZE + 1)
+            )
+            db.session.commit()
+            user_id = user.id
+            metrics.reset()
+
+            for turn in range(1, turns + 1):
+                start = time.perf_counter()
+                asyncio.run(
+                    chatbot_service.handle_message_async(
+                        user_id, f"What is in my cart now? ({turn})", "bench-key"
+                    )
+                )
+                elapsed = time.perf_counter() - start
+                if turn in checkpoints:
+                    prompt = metrics.get_summary("chat.prompt_tokens")["last"]
+                    rows.append((turn, prompt, elapsed))
+            counters = metrics.snapshot()["counters"]
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+    return rows, counters
+
+
+def main(turns, latency, per_1k_tokens):
+    chatbot_service.MODEL_NAME = FakeLlm(
+        latency=latency,
+        seconds_per_1k_prompt_tokens=per_1k_tokens,
+        tool_calls={"view_cart_executor": {}},
+    )
+    checkpoints = sorted({1, *range(10, turns + 1, 10), turns})
+    print(
+        f"{turns} turns, cart of {CART_SIZE} items, model latency "
+        f"{latency}s + {per_1k_tokens}s per 1k prompt tokens\n"
+    )
+    for compaction in (False, True):
+        chatbot_service._runner = None
+        rows, counters = _run_conversation(compaction, turns, checkpoints)
+        print(f"compaction {'on' if compaction else 'off'}: {counters}")
+        for turn, prompt, elapsed in rows:
+            print(f"  turn {turn:3}: prompt {prompt:6} tokens  turn {elapsed:6.3f}s")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-1k-tokens", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.turns, args.latency, args.per_1k_tokens)
@@ -0,0 +1,112 @@
+"""
+Compares chat latency for plain commands with the intent fast path disabled
+(every message goes to the fake model, which calls one tool before replying)
+and enabled, and reports the router's hit rate and cost on a mixed sample of
+messages.
+
+Usage:
+    python -m benchmarks.intent_fast_path_benchmark [--latency 1.0] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from app import db, metrics
+from app.fake_llm import FakeLlm
+from app.models import CartItem, User
+from app.services import chat_message_service, chatbot_service, intent_service
+from benchmarks.common import insert_products, make_app
+
+COMMANDS = [
+    "Show my cart",
+    "what are my orders?",
+    "show me my delivered orders",
+    "who am I",
+]
+
+# A mix of plain commands and requests that need the model.
+MIXED_MESSAGES = COMMANDS + [
+    "cart",
+    "checkout please",
+    "add 2 bananas to my cart",
+    "remove the milk from my cart",
+    "cancel order #12",
+    "hi",
+    "what's a good gift for my dad under 2000?",
+    "do you have wireless speakers?",
+    "compare the two cheapest laptops",
+    "why was my last order cancelled?",
+    "show my cart and then checkout",
+    "remove everything from my cart",
+    "tell me about the apple watch",
+    "what should I cook tonight?",
+    "is there a discount on cheese?",
+    "show my recent orders",
+]
+
+
+def _run(app, user_id, fast_path, repeat):
+    app.config["CHAT_INTENT_FAST_PATH"] = fast_path
+    samples = []
+    with app.app_context():
+        for _ in range(repeat):
+            for command in COMMANDS:
+                start = time.perf_counter()
+                asyncio.run(
+                    chatbot_service.handle_message_async(user_id, command, "bench-key")
+                )
+                samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def main(latency, repeat):
+    chatbot_service.MODEL_NAME = FakeLlm(
+        latency=latency, tool_calls={"view_cart_executor": {}}
+    )
+    app, db_path = make_app(GOOGLE_API_KEY="bench-key")
+    try:
+        with app.app_context():
+            insert_products(200)
+            user = User(email="fast@example.com", name="Fast", password_hash="x")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all(
+                CartItem(user_id=user.id, product_id=product_id, quantity=2)
+                for product_id in range(1, 6)
+            )
+            db.session.commit()
+            user_id = user.id
+
+        print(f"model latency {latency}s per call, {len(COMMANDS)} commands x {repeat}")
+        for fast_path in (False, True):
+            p50, p95 = _run(app, user_id, fast_path, repeat)
+            label = "on " if fast_path else "off"
+            print(f"fast path {label}: p50={p50 * 1000:9.2f}ms p95={p95 * 1000:9.2f}ms")
+
+        metrics.reset()
+        with app.app_context():
+            start = time.perf_counter()
+            for message in MIXED_MESSAGES:
+                intent_service.route_message(message)
+            elapsed = (time.perf_counter() - start) / len(MIXED_MESSAGES)
+        print(
+            f"\nmixed sample of {len(MIXED_MESSAGES)} messages: hit rate "
+            f"{intent_service.get_hit_rate():.0%}, routing cost "
+            f"{elapsed * 1e6:.1f}us per message"
+        )
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.latency, args.repeat)
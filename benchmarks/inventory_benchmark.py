@@ -0,0 +1,209 @@
+"""
+Multi-threaded stress test for stock reservations: many users race to add the
+same scarce products to their carts (and remove some again). Verifies that no
+stock is oversold or lost and reports throughput.
+
+Then every thread tries to cancel the same freshly placed order at once, for
+several orders in a row. Exactly one cancel per order must succeed, and stock
+and the user's order counters must come out as if it was cancelled once.
+
+Usage:
+    python -m benchmarks.inventory_benchmark [--threads 16] [--stock 500]
+        [--cancel-rounds 20]
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import func
+
+from app import db
+from app.models import CartItem, Order, OrderStatus, Product, User
+from app.services import cart_service, order_service, user_stats_service
+from benchmarks.common import make_app
+
+PRODUCT_COUNT = 5
+
+
+def worker(app, user_id, product_ids, stop_at, counters, lock, seed):
+    rng = random.Random(seed)
+    reserved = added = rejected = removed = errors = 0
+    with app.app_context():
+        while time.perf_counter() < stop_at:
+            product_id = rng.choice(product_ids)
+            try:
+                if rng.random() < 0.2:
+                    cart_service.remove_from_cart(user_id, product_id)
+                    removed += 1
+                else:
+                    cart_service.add_to_cart(user_id, product_id, rng.randint(1, 3))
+                    added += 1
+            except ValueError as e:
+                if "Not enough stock" in str(e) or "not found in your cart" in str(e):
+                    rejected += 1
+                else:
+                    errors += 1
+        db.session.remove()
+    with lock:
+        counters["added"] += added
+        counters["removed"] += removed
+        counters["rejected"] += rejected
+        counters["errors"] += errors
+
+
+def cancel_worker(app, user_id, order_ids, barrier, outcomes, lock):
+    with app.app_context():
+        for order_id in order_ids:
+            barrier.wait()
+            try:
+                message = order_service.cancel_user_order(user_id, order_id)
+                outcome = "cancelled" if "successfully" in message else "refused"
+            except ValueError:
+                outcome = "errors"
+            with lock:
+                outcomes[order_id][outcome] += 1
+            db.session.remove()
+
+
+def race_cancellations(app, threads, rounds, product_ids):
+    """Places `rounds` orders and cancels each from `threads` threads at once."""
+    with app.app_context():
+        user = User(email="canceller@example.com", name="Canceller", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        stock_before = db.session.scalar(db.select(func.sum(Product.quantity_in_stock)))
+        order_ids = []
+        for _ in range(rounds):
+            for product_id in product_ids:
+                cart_service.add_to_cart(user_id, product_id, 1)
+            order_ids.append(order_service.create_order_from_cart(user_id).id)
+
+    outcomes = {
+        order_id: {"cancelled": 0, "refused": 0, "errors": 0} for order_id in order_ids
+    }
+    barrier = threading.Barrier(threads)
+    lock = threading.Lock()
+    pool = [
+        threading.Thread(
+            target=cancel_worker,
+            args=(app, user_id, order_ids, barrier, outcomes, lock),
+        )
+        for _ in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    with app.app_context():
+        stock_after = db.session.scalar(db.select(func.sum(Product.quantity_in_stock)))
+        cancelled = db.session.scalar(
+            db.select(func.count())
+            .where(Order.user_id == user_id)
+            .where(Order.status == OrderStatus.CANCELLED)
+        )
+        stats = user_stats_service.get_user_stats(user_id)
+        order_count, lifetime_spend = stats.order_count, stats.lifetime_spend
+
+    once = sum(1 for o in outcomes.values() if o["cancelled"] == 1)
+    errors = sum(o["errors"] for o in outcomes.values())
+    print(
+        f"cancel race: {rounds} orders x {threads} threads, cancelled once={once} "
+        f"errors={errors} stock {stock_before} -> {stock_after} "
+        f"order_count={order_count} lifetime_spend={lifetime_spend:.2f}"
+    )
+    ok = (
+        once == rounds
+        and errors == 0
+        and cancelled == rounds
+        and stock_after == stock_before
+        and order_count == rounds
+        and abs(lifetime_spend) < 1e-6
+    )
+    print(
+        "PASS: each order cancelled once" if ok else "FAIL: duplicate or failed cancels"
+    )
+    return ok
+
+
+def run(threads, stock, seconds, cancel_rounds):
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            products = [
+                Product(
+                    name=f"Scarce Item {i}",
+                    description=None,
+                    price=100.0,
+                    quantity_in_stock=stock,
+                )
+                for i in range(PRODUCT_COUNT)
+            ]
+            users = [
+                User(email=f"user{i}@example.com", name=f"User {i}", password_hash="x")
+                for i in range(threads)
+            ]
+            db.session.add_all(products + users)
+            db.session.commit()
+            product_ids = [p.id for p in products]
+            user_ids = [u.id for u in users]
+
+        counters = {"added": 0, "removed": 0, "rejected": 0, "errors": 0}
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + seconds
+        pool = [
+            threading.Thread(
+                target=worker,
+                args=(app, user_id, product_ids, stop_at, counters, lock, i),
+            )
+            for i, user_id in enumerate(user_ids)
+        ]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            in_stock = db.session.scalar(db.select(func.sum(Product.quantity_in_stock)))
+            in_carts = db.session.scalar(db.select(func.sum(CartItem.quantity))) or 0
+            negative = db.session.scalar(
+                db.select(func.count()).where(Product.quantity_in_stock < 0)
+            )
+
+        total_ops = sum(counters.values())
+        expected = stock * PRODUCT_COUNT
+        print(f"threads={threads} stock/product={stock} duration={elapsed:.2f}s")
+        print(
+            f"operations={total_ops} ({total_ops / elapsed:,.0f} ops/s) "
+            f"adds={counters['added']} removes={counters['removed']} "
+            f"rejected={counters['rejected']} errors={counters['errors']}"
+        )
+        print(
+            f"stock left={in_stock} in carts={in_carts} "
+            f"sum={in_stock + in_carts} (expected {expected}) negative rows={negative}"
+        )
+        ok = in_stock + in_carts == expected and negative == 0
+        print("PASS: no oversell, no lost updates" if ok else "FAIL: stock mismatch")
+
+        if cancel_rounds:
+            ok = race_cancellations(app, threads, cancel_rounds, product_ids) and ok
+        return ok
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--cancel-rounds", type=int, default=20)
+    args = parser.parse_args()
+    ok = run(args.threads, args.stock, args.seconds, args.cancel_rounds)
+    raise SystemExit(0 if ok else 1)
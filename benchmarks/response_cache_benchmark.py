@@ -0,0 +1,171 @@
+"""
+Many users asking the same generic product questions, with the agent response
+cache disabled and enabled. The fake model looks the product up with
+get_product_info_executor before answering. Halfway through, one product
+write bumps the catalog version, so every question misses once more.
+
+First it checks that an answer quoting one user's earlier conversation is
+never served to another user.
+
+Usage:
+    python -m benchmarks.response_cache_benchmark [--users 25] [--latency 1.0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from app import db, metrics
+from app.fake_llm import FakeLlm
+from app.models import Product, User
+from app.services import chat_message_service, chatbot_service, response_cache_service
+from benchmarks.common import insert_products, make_app
+
+# Users of the history isolation check: one with a secret, the others ask after.
+ISOLATION_USERS = 4
+
+QUESTIONS = [
+    "Tell me about the {name}",
+    "Is the {name} in stock?",
+    "How much does the {name} cost?",
+    "What is the rating of the {name}?",
+]
+
+
+class _HistoryQuotingLlm(FakeLlm):
+    """Like FakeLlm, but quotes the first thing the user said in the conversation."""
+
+    async def generate_content_async(self, llm_request, stream=False):
+        commands = [
+            json.loads(part.text)["command"]
+            for content in llm_request.contents
+            if content.role == "user"
+            for part in content.parts or []
+            if part.text and part.text.startswith("{")
+        ]
+        async for response in super().generate_content_async(llm_request, stream):
+            parts = response.content.parts if response.content else None
+            if len(commands) > 1 and not response.partial and parts and parts[0].text:
+                parts[0].text += f" Earlier you said: {commands[0]}"
+            yield response
+
+
+def check_history_isolation(product_name, user_ids):
+    """
+    Returns True if an answer that quotes one user's conversation is kept from
+    the other users, who still get (and share) a history-free answer.
+    """
+    secret = "my locker code is 4711"
+    question = f"Tell me about the {product_name}"
+    chatbot_service.MODEL_NAME = _HistoryQuotingLlm(
+        latency=0.0,
+        tool_calls={"get_product_info_executor": {"product_name": product_name}},
+    )
+    chatbot_service._runner = None
+    response_cache_service.clear()
+    metrics.reset()
+    owner, *others = user_ids
+
+    async def ask():
+        await chatbot_service.handle_message_async(owner, secret, "bench-key")
+        answers = [
+            await chatbot_service.handle_message_async(owner, question, "bench-key")
+        ]
+        for user_id in others:
+            await chatbot_service.handle_message_async(user_id, "hello", "bench-key")
+            answers.append(
+                await chatbot_service.handle_message_async(
+                    user_id, question, "bench-key"
+                )
+            )
+        return answers
+
+    answers = asyncio.run(ask())
+    hits = metrics.snapshot()["counters"].get("chat.response_cache.hits", 0)
+    ok = (
+        secret in answers[0]
+        and not any(secret in answer for answer in answers[1:])
+        and hits == len(others) - 1
+    )
+    print(
+        "PASS: a history-dependent answer is not shared between users"
+        if ok
+        else f"FAIL: history leaked or not cached (hits={hits}): {answers[1:]}"
+    )
+    return ok
+
+
+async def _ask_all(user_ids, questions):
+    samples = []
+    for user_id in user_ids:
+        for question in questions:
+            start = time.perf_counter()
+            await chatbot_service.handle_message_async(user_id, question, "bench-key")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(users, latency):
+    app, db_path = make_app(GOOGLE_API_KEY="bench-key")
+    try:
+        with app.app_context():
+            insert_products(100)
+            product = db.session.get(Product, 1)
+            questions = [q.format(name=product.name) for q in QUESTIONS]
+            db.session.add_all(
+                User(email=f"user{i}@example.com", name=f"User {i}", password_hash="x")
+                for i in range(users + ISOLATION_USERS)
+            )
+            db.session.commit()
+            isolation_ok = check_history_isolation(
+                product.name, list(range(users + 1, users + ISOLATION_USERS + 1))
+            )
+            chatbot_service.MODEL_NAME = FakeLlm(
+                latency=latency,
+                tool_calls={
+                    "get_product_info_executor": {"product_name": product.name}
+                },
+            )
+            chatbot_service._runner = None
+            user_ids = list(range(1, users + 1))
+            half = users // 2
+
+            print(
+                f"{users} users x {len(questions)} questions, model latency "
+                f"{latency}s per call (two calls per answer)"
+            )
+            for enabled in (False, True):
+                app.config["CHAT_RESPONSE_CACHE"] = enabled
+                response_cache_service.clear()
+                metrics.reset()
+                samples = asyncio.run(_ask_all(user_ids[:half], questions))
+                db.session.get(Product, 1).quantity_in_stock += 1  # New catalog version
+                db.session.commit()
+                samples += asyncio.run(_ask_all(user_ids[half:], questions))
+
+                counters = metrics.snapshot()["counters"]
+                hits = counters.get("chat.response_cache.hits", 0)
+                samples.sort()
+                print(
+                    f"cache {'on ' if enabled else 'off'}: "
+                    f"p50={statistics.median(samples) * 1000:9.2f}ms "
+                    f"p95={samples[int(len(samples) * 0.95)] * 1000:9.2f}ms "
+                    f"mean={statistics.fmean(samples) * 1000:9.2f}ms "
+                    f"hits={hits}/{len(samples)}"
+                )
+            return isolation_ok
+    finally:
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+    raise SystemExit(0 if main(args.users, args.latency) else 1)
@@ -0,0 +1,46 @@
+"""
+Compares browse search latency of the FTS5 index against the ILIKE scan.
+
+Usage:
+    python -m benchmarks.search_benchmark [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import os
+
+from app.services import browse_service
+from benchmarks.common import format_stats, insert_products, make_app, time_call
+
+SEARCH_TERMS = ["watch", "smart phone", "organic ban", "steel bottle 12"]
+
+
+def run(sizes, repeat):
+    for size in sizes:
+        app, db_path = make_app()
+        try:
+            with app.app_context():
+                insert_products(size)
+                print(f"\n=== {size:,} products ===")
+                for use_fts in (False, True):
+                    app.config["PRODUCT_SEARCH_FTS"] = use_fts
+                    label = "fts5 " if use_fts else "ilike"
+                    for term in SEARCH_TERMS:
+                        stats = time_call(
+                            lambda: browse_service.get_filtered_products(
+                                search_term=term
+                            ).items,
+                            repeat=repeat,
+                        )
+                        print(f"{label} {term!r:18} {format_stats(stats)}")
+        finally:
+            os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,118 @@
+"""
+Measures the ADK session store: the cost an agent turn pays to append events
+(in-memory, database write-behind, and database write-through for
+comparison), and the cost of reading a session from the process cache (with
+and without the revision check) versus rehydrating it from the database after
+a restart or in another worker.
+
+Usage:
+    python -m benchmarks.session_store_benchmark [--sessions 200] [--events 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import InMemorySessionService
+from google.genai import types as genai_types
+
+from app.services.agent_session_service import PersistentSessionService
+from benchmarks.common import make_app
+
+APP_NAME = "bench_app"
+
+
+def _event(i):
+    author = "user" if i % 2 == 0 else "chatstore_agent"
+    return Event(
+        author=author,
+        invocation_id=f"inv-{i // 2}",
+        content=genai_types.Content(
+            role="user" if author == "user" else "model",
+            parts=[genai_types.Part(text=f"Message {i}: show me wireless speakers")],
+        ),
+        actions=EventActions(state_delta={"chatbot_action_result": f"result {i}"}),
+    )
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return (
+        f"p50={statistics.median(samples):7.3f}ms "
+        f"p95={samples[int(len(samples) * 0.95)]:7.3f}ms"
+    )
+
+
+async def _append_all(service, sessions, events, write_through=False):
+    """Appends `events` events to each session; returns per-append latencies (ms)."""
+    handles = [
+        await service.create_session(
+            app_name=APP_NAME, user_id=str(n), session_id=f"session-{n}"
+        )
+        for n in range(sessions)
+    ]
+    samples = []
+    for i in range(events):
+        for session in handles:
+            start = time.perf_counter()
+            await service.append_event(session, _event(i))
+            if write_through:
+                service.flush_pending()
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def _read_all(service, sessions):
+    samples = []
+    for n in range(sessions):
+        start = time.perf_counter()
+        session = await service.get_session(
+            app_name=APP_NAME, user_id=str(n), session_id=f"session-{n}"
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, session
+
+
+async def main(sessions, events):
+    print(f"{sessions} sessions x {events} events\n")
+
+    samples = await _append_all(InMemorySessionService(), sessions, events)
+    print(f"append  in-memory               {_percentiles(samples)}")
+
+    for label, write_through in (("write-behind", False), ("write-through", True)):
+        app, _ = make_app()
+        with app.app_context():
+            service = PersistentSessionService()
+            samples = await _append_all(service, sessions, events, write_through)
+            start = time.perf_counter()
+            service.flush_pending()
+            drain = (time.perf_counter() - start) * 1000
+            print(
+                f"append  database {label:14} {_percentiles(samples)}"
+                f"  (final flush {drain:.1f}ms)"
+            )
+            if write_through:
+                continue
+
+            samples, _ = await _read_all(service, sessions)
+            print(f"get     cached                  {_percentiles(samples)}")
+            samples, _ = await _read_all(service, sessions)
+            print(f"get     cached, checked < 1s    {_percentiles(samples)}")
+            restarted = PersistentSessionService()
+            samples, session = await _read_all(restarted, sessions)
+            print(f"get     rehydrate from database {_percentiles(samples)}")
+            print(
+                f"        after restart: {len(session.events)} events, "
+                f"state={session.state}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.events))
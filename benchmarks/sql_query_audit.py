@@ -0,0 +1,148 @@
+"""
+Reports how many SQL statements each main page and each kind of chat turn
+issues, using the per-request and per-turn SQL instrumentation
+(app/sql_instrumentation.py), and lists suspected N+1 patterns. A user with
+a filled cart, order history and chat history is created first; chat turns
+use the offline fake model.
+
+Usage:
+    python -m benchmarks.sql_query_audit [--orders 50] [--threshold 10]
+"""
+
+import argparse
+import logging
+import os
+import random
+
+from werkzeug.security import generate_password_hash
+
+from app import db, sql_instrumentation
+from app.models import MessageSender, User
+from app.services import (
+    cart_service,
+    chat_message_service,
+    chatbot_service,
+    order_service,
+)
+from benchmarks.common import insert_products, make_app
+
+PAGES = [
+    "/",
+    "/profile",
+    "/cart",
+    "/orders",
+    "/browse",
+    "/browse?search=lamp&in_stock=on",
+    "/chatbot/",
+]
+CHAT_MESSAGES = [
+    "Show my cart",
+    "have I ordered anything recently? show my order history",
+    "Tell me about the {product}",
+    "add 2 {product} to my cart",
+]
+CART_ITEMS = 10
+CHAT_HISTORY = 200
+
+
+class _SummaryCollector(logging.Handler):
+    """Keeps the `sql_stats` attached to instrumentation log records."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.summaries = []
+
+    def emit(self, record):
+        summary = getattr(record, "sql_stats", None)
+        if summary is not None:
+            self.summaries.append(summary)
+
+
+def _setup(orders, rng):
+    insert_products(2000)
+    user = User(
+        email="audit@example.com",
+        name="Audit",
+        password_hash=generate_password_hash("audit", method="pbkdf2:sha256:1"),
+    )
+    db.session.add(user)
+    db.session.commit()
+    for _ in range(orders):
+        cart_service.add_to_cart(user.id, rng.randint(1, 2000), 1)
+        cart_service.add_to_cart(user.id, rng.randint(1, 2000), 1)
+        order_service.create_order_from_cart(user.id)
+    for _ in range(CART_ITEMS):
+        cart_service.add_to_cart(user.id, rng.randint(1, 2000), 1)
+    for i in range(CHAT_HISTORY):
+        chat_message_service.queue_message(
+            user.id, MessageSender.USER if i % 2 else MessageSender.AGENT, "hello"
+        )
+    chat_message_service.flush_pending()
+    return user.id
+
+
+def _print_summary(label, summary):
+    print(
+        f"{label:45} {summary['query_count']:4} queries {summary['sql_ms']:8.2f}ms  "
+        f"max repeats {summary['max_repeats']:3}"
+    )
+    for suspect in summary["suspected_n_plus_one"]:
+        print(f"    suspected N+1: {suspect['count']} x {suspect['sql'][:120]}")
+
+
+def main(orders, threshold, seed):
+    app, db_path = make_app(
+        CHAT_MODEL=chatbot_service.OFFLINE_MODEL,
+        CHAT_FAKE_LLM_LATENCY=0.0,
+        CHAT_FAKE_LLM_SEED=seed,
+        SQL_N_PLUS_ONE_THRESHOLD=threshold,
+    )
+    chatbot_service._runner = None
+    collector = _SummaryCollector()
+    instrumentation_logger = logging.getLogger(sql_instrumentation.__name__)
+    instrumentation_logger.addHandler(collector)
+    instrumentation_logger.setLevel(logging.DEBUG)
+    try:
+        rng = random.Random(seed)
+        with app.app_context():
+            user_id = _setup(orders, rng)
+            product_name = cart_service.get_cart_contents(user_id)[0].product.name
+
+        client = app.test_client()
+        response = client.post(
+            "/auth/login", data={"email": "audit@example.com", "password": "audit"}
+        )
+        assert response.status_code == 302, response.status_code
+
+        print(f"Pages ({orders} orders, {CART_ITEMS} cart items):")
+        for page in PAGES:
+            collector.summaries.clear()
+            response = client.get(page)
+            assert response.status_code == 200, (page, response.status_code)
+            _print_summary(f"GET {page}", collector.summaries[-1])
+
+        print("Chat turns (request and agent turn):")
+        for message in CHAT_MESSAGES:
+            message = message.format(product=product_name)
+            collector.summaries.clear()
+            response = client.post("/chatbot/chat", json={"message": message})
+            assert response.status_code == 200, response.status_code
+            for summary in collector.summaries:
+                _print_summary(f"{summary['kind']}: {message[:38]}", summary)
+    finally:
+        instrumentation_logger.removeHandler(collector)
+        chatbot_service._session_service.flush_pending()
+        chat_message_service.flush_pending()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--threshold", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.orders, args.threshold, args.seed)
@@ -0,0 +1,209 @@
+"""
+Mixes catalog browsing and order-history reads with concurrent checkouts
+(add to cart + place order) and chat turns (two stored chat messages) from
+several threads, against the default SQLite setup, the production profile
+(SQLITE_PRODUCTION_PROFILE: WAL, read-only connection pool, serialized
+writer) with chat history in the main database file, and the profile with
+chat history in its own file (the "chat" bind). Reports throughput, latency
+percentiles and database errors (timeouts waiting for the database lock) for
+each workload.
+
+Usage:
+    python -m benchmarks.sqlite_contention_benchmark [--readers 8] \
+        [--writers 4] [--chat-writers 4] [--seconds 5] [--products 20000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import ChatMessage, MessageSender, User
+from app.services import browse_service, cart_service, order_service
+from benchmarks.common import CATEGORIES, WORDS, insert_products, make_app
+
+HISTORY_USERS = 50
+ORDERS_PER_HISTORY_USER = 10
+ITEMS_PER_CHECKOUT = 3
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _add_random_item(user_id, rng, products):
+    # Retry on products that are out of stock.
+    while True:
+        try:
+            return cart_service.add_to_cart(user_id, rng.randint(1, products), 1)
+        except ValueError as e:
+            if "stock" not in str(e):
+                raise
+
+
+def _setup(products, writers, rng):
+    insert_products(products)
+    db.session.add_all(
+        User(email=f"user{i}@example.com", name=f"User {i}", password_hash="x")
+        for i in range(HISTORY_USERS + writers)
+    )
+    db.session.commit()
+    for user_id in range(1, HISTORY_USERS + 1):
+        for _ in range(ORDERS_PER_HISTORY_USER):
+            _add_random_item(user_id, rng, products)
+            order_service.create_order_from_cart(user_id)
+
+
+def _browse(rng):
+    if rng.random() < 0.5:
+        browse_service.get_filtered_products_page(
+            search_term=rng.choice(WORDS), in_stock_only=True
+        )
+    elif rng.random() < 0.5:
+        browse_service.get_filtered_products(
+            categories=[rng.choice(CATEGORIES)], min_price=rng.randint(0, 500)
+        )
+    else:
+        order_service.get_order_history(rng.randint(1, HISTORY_USERS))
+
+
+def _checkout(user_id, rng, products):
+    for _ in range(ITEMS_PER_CHECKOUT):
+        _add_random_item(user_id, rng, products)
+    order_service.create_order_from_cart(user_id)
+
+
+def _worker(app, operation, seconds, samples, errors, barrier):
+    with app.app_context():
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                operation()
+                samples.append(time.perf_counter() - start)
+            except (OperationalError, ValueError) as e:
+                # The services report 'database is locked' as a database error.
+                errors.append(e)
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def _chat_turn(user_id, rng):
+    # The two rows chatbot_service stores for every chat turn.
+    db.session.add(
+        ChatMessage(user_id, MessageSender.USER, f"add {rng.choice(WORDS)} to my cart")
+    )
+    db.session.add(ChatMessage(user_id, MessageSender.AGENT, "Done!"))
+    db.session.commit()
+
+
+def _run(label, overrides, readers, writers, chat_writers, seconds, products, seed):
+    app, db_path = make_app(
+        shared_chat_db=True, CATALOG_SNAPSHOT_ENABLED=False, **overrides
+    )
+    try:
+        with app.app_context():
+            _setup(products, writers + chat_writers, random.Random(seed))
+        workloads = [
+            ("reads", readers, lambda i, rng: lambda: _browse(rng)),
+            (
+                "checkouts",
+                writers,
+                lambda i, rng: lambda: _checkout(HISTORY_USERS + i + 1, rng, products),
+            ),
+            (
+                "chat turns",
+                chat_writers,
+                lambda i, rng: lambda: _chat_turn(HISTORY_USERS + writers + i + 1, rng),
+            ),
+        ]
+        barrier = threading.Barrier(readers + writers + chat_writers)
+        results, errors, threads = {}, [], []
+        for name, count, make_operation in workloads:
+            results[name] = []
+            for i in range(count):
+                rng = random.Random(seed + len(threads))
+                threads.append(
+                    threading.Thread(
+                        target=_worker,
+                        args=(app, make_operation(i, rng), seconds),
+                        kwargs=dict(
+                            samples=results[name], errors=errors, barrier=barrier
+                        ),
+                    )
+                )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name, samples in results.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            print(
+                f"{label:26} {name:10}: {len(ordered) / seconds:7.1f}/s  "
+                f"p50 {_percentile(ordered, 0.5) * 1000:7.2f}ms  "
+                f"p95 {_percentile(ordered, 0.95) * 1000:7.2f}ms  "
+                f"p99 {_percentile(ordered, 0.99) * 1000:7.2f}ms  "
+                f"max {ordered[-1] * 1000:7.2f}ms"
+            )
+        print(f"{label:26} database errors: {len(errors)}")
+    finally:
+        with app.app_context():
+            db_paths = [engine.url.database for engine in db.engines.values()]
+            for engine in db.engines.values():
+                engine.dispose()
+        for path in set(db_paths):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+def main(readers, writers, chat_writers, seconds, products, seed):
+    print(
+        f"{readers} reader threads (browse, search, order history), {writers} "
+        f"checkout threads ({ITEMS_PER_CHECKOUT} items each), {chat_writers} chat "
+        f"threads; {seconds}s each, {products} products"
+    )
+    fd, chat_path = tempfile.mkstemp(suffix=".db", prefix="chatstore-bench-chat-")
+    os.close(fd)
+    configurations = [
+        ("default sqlite", {}),
+        ("production profile", {"SQLITE_PRODUCTION_PROFILE": True}),
+        (
+            "profile + chat database",
+            {
+                "SQLITE_PRODUCTION_PROFILE": True,
+                "SQLALCHEMY_BINDS": {"chat": f"sqlite:///{chat_path}"},
+            },
+        ),
+    ]
+    for label, overrides in configurations:
+        _run(label, overrides, readers, writers, chat_writers, seconds, products, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--chat-writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(
+        args.readers,
+        args.writers,
+        args.chat_writers,
+        args.seconds,
+        args.products,
+        args.seed,
+    )
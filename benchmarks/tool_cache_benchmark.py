@@ -0,0 +1,115 @@
+"""
+Calls the agent's read tools (view_cart, view_orders, profile) the way a busy
+chat does - several reads per turn, with a cart write every few turns - with
+the per-user tool cache disabled and enabled, and reports the cost per call
+and the hit rate. Every read is compared with an uncached read to check that
+no stale result is returned after a write.
+
+Usage:
+    python -m benchmarks.tool_cache_benchmark [--users 20] [--turns 30]
+"""
+
+import argparse
+import os
+import random
+import time
+
+from app import db, metrics
+from app.agent_tools import (
+    get_user_profile_info_executor,
+    view_cart_executor,
+    view_orders_executor,
+)
+from app.agent_tools.context import ServerToolContext
+from app.models import User
+from app.services import cart_service, order_service, tool_cache_service
+from benchmarks.common import insert_products, make_app
+
+CART_SIZE = 15
+ORDERS_PER_USER = 20
+READS_PER_TURN = [
+    (view_cart_executor, {}),
+    (view_orders_executor, {}),
+    (view_cart_executor, {}),
+    (view_orders_executor, {"status": "pending"}),
+    (get_user_profile_info_executor, {}),
+]
+
+
+def _add_random_item(user_id, rng):
+    # Retry on products that are out of stock.
+    while True:
+        try:
+            return cart_service.add_to_cart(user_id, rng.randint(1, 500), 1)
+        except ValueError:
+            continue
+
+
+def _setup(users, rng):
+    insert_products(500)
+    db.session.add_all(
+        User(email=f"user{i}@example.com", name=f"User {i}", password_hash="x")
+        for i in range(users)
+    )
+    db.session.commit()
+    for user_id in range(1, users + 1):
+        for _ in range(ORDERS_PER_USER):
+            _add_random_item(user_id, rng)
+            order_service.create_order_from_cart(user_id)
+        for _ in range(CART_SIZE):
+            _add_random_item(user_id, rng)
+
+
+def _run(app, users, turns, enabled, seed):
+    app.config["CHAT_TOOL_CACHE"] = enabled
+    tool_cache_service.clear()
+    metrics.reset()
+    rng = random.Random(seed)
+    elapsed = 0.0
+    calls = stale = 0
+    for turn in range(turns):
+        for user_id in range(1, users + 1):
+            context = ServerToolContext(user_id)
+            if turn % 3 == 2:
+                _add_random_item(user_id, rng)
+            for executor, arguments in READS_PER_TURN:
+                start = time.perf_counter()
+                result = executor(context, **arguments)
+                elapsed += time.perf_counter() - start
+                calls += 1
+                if enabled:
+                    app.config["CHAT_TOOL_CACHE"] = False
+                    stale += result != executor(context, **arguments)
+                    app.config["CHAT_TOOL_CACHE"] = True
+            db.session.remove()
+    hits = metrics.get_counter("chat.tool_cache.hits")
+    return elapsed / calls, hits / calls, stale
+
+
+def main(users, turns):
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            _setup(users, random.Random(1))
+            print(
+                f"{users} users x {turns} turns, {len(READS_PER_TURN)} tool reads "
+                f"per turn, a cart write every third turn; cart of ~{CART_SIZE} "
+                f"items, {ORDERS_PER_USER} orders per user"
+            )
+            for enabled in (False, True):
+                per_call, hit_rate, stale = _run(app, users, turns, enabled, seed=2)
+                print(
+                    f"cache {'on ' if enabled else 'off'}: "
+                    f"{per_call * 1000:7.3f}ms per call, hit rate {hit_rate:4.0%}"
+                    + (f", stale results {stale}" if enabled else "")
+                )
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+    main(args.users, args.turns)
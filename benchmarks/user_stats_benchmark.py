@@ -0,0 +1,105 @@
+"""
+Compares the per-page aggregates (chat message COUNT, cart total summed over
+the loaded cart items, order COUNT) with reading the user's counter rows, as
+a user's history grows. The counters should stay flat.
+
+Usage:
+    python -m benchmarks.user_stats_benchmark [--history-sizes 100 10000 100000]
+"""
+
+import argparse
+import os
+from datetime import datetime
+
+from app import db
+from app.models import CartItem, ChatMessage, MessageSender, Order, User
+from app.services import cart_service, user_stats_service
+from benchmarks.common import format_stats, insert_products, make_app, time_call
+
+CART_ITEMS = 50
+
+
+def _aggregate_reads(user_id):
+    ChatMessage.query.filter_by(user_id=user_id).count()
+    sum(
+        item.quantity * item.product.price
+        for item in cart_service.get_cart_contents(user_id)
+    )
+    Order.query.filter_by(user_id=user_id).count()
+
+
+def _counter_reads(user_id):
+    user_stats_service.get_message_count(user_id)
+    user_stats_service.get_user_stats(user_id)
+
+
+def run(history_sizes, repeat):
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            insert_products(CART_ITEMS)
+            for size in history_sizes:
+                user = User(
+                    email=f"stats{size}@example.com", name="Bench", password_hash="x"
+                )
+                db.session.add(user)
+                db.session.commit()
+                user_id = user.id
+                now = datetime.now()
+                db.session.execute(
+                    ChatMessage.__table__.insert(),
+                    [
+                        {
+                            "user_id": user_id,
+                            "sender": MessageSender.USER.name,
+                            "message_text": "hello",
+                            "timestamp": now,
+                        }
+                        for _ in range(size)
+                    ],
+                )
+                # The chat bind may share the file: commit before the next write.
+                db.session.commit()
+                db.session.execute(
+                    Order.__table__.insert(),
+                    [
+                        {
+                            "user_id": user_id,
+                            "status": "DELIVERED",
+                            "created_at": now,
+                            "updated_at": now,
+                            "total_amount": 100.0,
+                        }
+                        for _ in range(size // 10)
+                    ],
+                )
+                db.session.execute(
+                    CartItem.__table__.insert(),
+                    [
+                        {"user_id": user_id, "product_id": i, "quantity": 1}
+                        for i in range(1, CART_ITEMS + 1)
+                    ],
+                )
+                db.session.commit()
+                # Build the counter rows, as the first page load would.
+                _counter_reads(user_id)
+
+                aggregates = time_call(lambda: _aggregate_reads(user_id), repeat)
+                counters = time_call(lambda: _counter_reads(user_id), repeat)
+                print(
+                    f"{size:7} messages, {size // 10:6} orders, {CART_ITEMS} cart items"
+                )
+                print(f"  aggregates: {format_stats(aggregates)}")
+                print(f"  counters:   {format_stats(counters)}")
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--history-sizes", type=int, nargs="+", default=[100, 10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.history_sizes, args.repeat)
@@ -38,13 +38,12 @@ document.addEventListener("DOMContentLoaded", function () {
 
   // Define URLs and state variables
   const chatUrl: string = chatPageContainer.dataset.chatUrl || "";
+  const chatStreamUrl: string = chatPageContainer.dataset.chatStreamUrl || "";
   const loadMoreUrl: string = chatPageContainer.dataset.loadMoreUrl || "";
   const clearHistoryUrl: string =
     chatPageContainer.dataset.clearHistoryUrl || "";
-  let currentOffsetForSidebar: number = parseInt(
-    chatPageContainer.dataset.currentOffset || "0",
-    10,
-  );
+  let nextCursorForSidebar: string =
+    chatPageContainer.dataset.nextCursor || "";
   const initialLimit: number = parseInt(
     chatPageContainer.dataset.initialLimit || "10",
     10,
@@ -127,6 +126,13 @@ document.addEventListener("DOMContentLoaded", function () {
     message?: string;
   }
 
+  interface ChatStreamEvent {
+    type: "tool_call" | "tool_result" | "delta" | "final" | "error";
+    name?: string;
+    text?: string;
+    error?: string;
+  }
+
   interface MessageData {
     message_text: string;
     sender: "user" | "agent";
@@ -134,9 +140,115 @@ document.addEventListener("DOMContentLoaded", function () {
 
   interface LoadMoreResponse {
     messages: MessageData[];
+    has_more?: boolean;
+    next_cursor?: string | null;
     error?: string;
   }
 
+  function setBubbleText(messageEl: HTMLDivElement, messageText: string): void {
+    const messageSpan = messageEl.querySelector(".message-bubble span");
+    if (messageSpan) messageSpan.innerHTML = messageText.replace(/\n/g, "<br>");
+  }
+
+  function describeTool(toolName: string): string {
+    return toolName.replace(/_executor$/, "").replace(/_/g, " ");
+  }
+
+  // Reads the Server-Sent Events of a streamed chat turn, rendering tool
+  // progress and partial text as they arrive.
+  async function streamMessage(messageText: string): Promise<void> {
+    const response = await fetch(chatStreamUrl, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify({ message: messageText }),
+    });
+
+    if (!response.ok || !response.body) {
+      let errorMsg = `Error: ${response.statusText}`;
+      try {
+        const data: ChatResponse = await response.json();
+        errorMsg = data.error || errorMsg;
+      } catch (e) {
+        console.error("Parsing error:", e);
+      }
+      addMessageToLiveChat(errorMsg, "agent");
+      addMessageToHistorySidebar(errorMsg, "agent", true);
+      return;
+    }
+
+    let liveMessageEl: HTMLDivElement | null = null;
+    let streamedText = "";
+
+    const showInLiveChat = (text: string): void => {
+      if (loadingIndicator) loadingIndicator.style.display = "none";
+      if (!liveMessageEl) {
+        addMessageToLiveChat(text, "agent");
+        liveMessageEl = chatOutput
+          ? (chatOutput.lastElementChild as HTMLDivElement | null)
+          : null;
+      } else {
+        setBubbleText(liveMessageEl, text);
+      }
+      if (chatOutput) chatOutput.scrollTop = chatOutput.scrollHeight;
+    };
+
+    const handleEvent = (event: ChatStreamEvent): void => {
+      switch (event.type) {
+        case "tool_call":
+          if (loadingIndicator && !liveMessageEl) {
+            loadingIndicator.textContent = `Using ${describeTool(event.name || "a tool")}...`;
+          }
+          break;
+        case "delta":
+          streamedText += event.text || "";
+          showInLiveChat(streamedText);
+          break;
+        case "final":
+          showInLiveChat(event.text || streamedText);
+          addMessageToHistorySidebar(event.text || streamedText, "agent", true);
+          break;
+        case "error":
+          showInLiveChat(event.error || "An error occurred.");
+          addMessageToHistorySidebar(
+            event.error || "An error occurred.",
+            "agent",
+            true,
+          );
+          break;
+      }
+    };
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const data = frame
+          .split("\n")
+          .filter((line) => line.startsWith("data:"))
+          .map((line) => line.slice(5).trim())
+          .join("\n");
+        if (data) {
+          try {
+            handleEvent(JSON.parse(data) as ChatStreamEvent);
+          } catch (e) {
+            console.error("Could not parse stream event:", e);
+          }
+        }
+        boundary = buffer.indexOf("\n\n");
+      }
+    }
+  }
+
   async function sendMessage(): Promise<void> {
     if (!messageInput) return;
 
@@ -149,9 +261,17 @@ document.addEventListener("DOMContentLoaded", function () {
     if (messageInput) messageInput.value = "";
     if (sendButton) sendButton.disabled = true;
     if (messageInput) messageInput.disabled = true;
-    if (loadingIndicator) loadingIndicator.style.display = "block";
+    if (loadingIndicator) {
+      loadingIndicator.textContent = "Thinking...";
+      loadingIndicator.style.display = "block";
+    }
 
     try {
+      if (chatStreamUrl) {
+        await streamMessage(messageText);
+        return;
+      }
+
       if (!chatUrl) {
         throw new Error("Chat URL is not defined");
       }
@@ -192,7 +312,6 @@ document.addEventListener("DOMContentLoaded", function () {
       if (loadingIndicator) loadingIndicator.style.display = "none";
       if (messageInput) messageInput.focus();
       totalMessagesInHistory += 2;
-      currentOffsetForSidebar += 2;
     }
   }
 
@@ -209,7 +328,7 @@ document.addEventListener("DOMContentLoaded", function () {
       }
 
       const response = await fetch(
-        `${loadMoreUrl}?offset=${currentOffsetForSidebar}&limit=${initialLimit}`,
+        `${loadMoreUrl}?cursor=${encodeURIComponent(nextCursorForSidebar)}&limit=${initialLimit}`,
       );
       const data: LoadMoreResponse = await response.json();
 
@@ -217,12 +336,9 @@ document.addEventListener("DOMContentLoaded", function () {
         data.messages.forEach((msg: MessageData) => {
           addMessageToHistorySidebar(msg.message_text, msg.sender, false);
         });
-        currentOffsetForSidebar += data.messages.length;
+        nextCursorForSidebar = data.next_cursor || "";
 
-        if (
-          data.messages.length < initialLimit ||
-          currentOffsetForSidebar >= totalMessagesInHistory
-        ) {
+        if (!data.has_more || !nextCursorForSidebar) {
           if (loadMoreSidebarButton)
             loadMoreSidebarButton.style.display = "none";
         }
@@ -271,7 +387,7 @@ document.addEventListener("DOMContentLoaded", function () {
           }
         }
 
-        currentOffsetForSidebar = 0;
+        nextCursorForSidebar = "";
         totalMessagesInHistory = 0;
         if (loadMoreSidebarButton) loadMoreSidebarButton.style.display = "none";
         alert(data.message || "Chat history cleared.");
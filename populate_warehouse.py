@@ -0,0 +1,546 @@
+"""
+Bulk-loads a synthetic ChatStore dataset (users, products, carts, orders with
+their items, and chat history) into the configured databases (chat history
+goes to the chat bind), replacing what is there. The same --seed always produces the same rows, so benchmarks run
+against it are repeatable.
+
+Rows are written with executemany in batches, one transaction per table.
+Secondary indexes and the product search triggers are dropped before the
+load, then rebuilt once at the end, followed by the per-user counters
+(UserStats) and ANALYZE.
+
+Every user can sign in as user<N>@example.com with the password "password".
+Every order has at least one item, so --order-items is raised to --orders if
+it is lower; otherwise exactly that many items are spread over the orders.
+Cart items reserve their quantity from the product's stock, as adding them in
+the app would, and are dated within the hours before the load (so the cart
+sweeper does not release them at once); every other timestamp is fixed.
+
+Usage:
+    python populate_warehouse.py [--scale small|medium|large] [--seed 42]
+        [--users N] [--products N] [--orders N] [--order-items N]
+        [--cart-items N] [--chat-messages N]
+"""
+
+import argparse
+import hashlib
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text, update
+
+from app import create_app, db
+from app.models import (
+    CHAT_BIND_KEY,
+    CartItem,
+    ChatMessage,
+    MessageSender,
+    Order,
+    OrderItem,
+    OrderStatus,
+    Product,
+    User,
+)
+from app.services import search_service, user_stats_service
+
+# Row counts per scale; any of them can be overridden on the command line.
+SCALES = {
+    "small": {
+        "users": 1_000,
+        "products": 10_000,
+        "orders": 5_000,
+        "order_items": 20_000,
+        "cart_items": 3_000,
+        "chat_messages": 10_000,
+    },
+    "medium": {
+        "users": 10_000,
+        "products": 100_000,
+        "orders": 100_000,
+        "order_items": 500_000,
+        "cart_items": 30_000,
+        "chat_messages": 200_000,
+    },
+    "large": {
+        "users": 100_000,
+        "products": 1_000_000,
+        "orders": 2_500_000,
+        "order_items": 10_000_000,
+        "cart_items": 300_000,
+        "chat_messages": 2_000_000,
+    },
+}
+
+PASSWORD = "password"
+PASSWORD_ITERATIONS = 600_000
+# Fixed reference time, so timestamps do not depend on when the load runs.
+END_TIME = datetime(2025, 1, 1)
+# Cart items are the exception: they are dated up to this many hours before the
+# load, well within CART_RESERVATION_TTL_SECONDS (24h), so the cart sweeper
+# does not expire them as soon as the app starts.
+CART_MAX_AGE_HOURS = 12
+HISTORY_DAYS = 3 * 365
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Akash", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya",
+    "Meera", "Neha", "Nikhil", "Priya", "Rahul", "Riya", "Rohan", "Saanvi",
+    "Sahil", "Sneha", "Tanvi", "Vihaan", "Aditya", "Pooja", "Karan", "Isha",
+]  # fmt: skip
+LAST_NAMES = [
+    "Sharma", "Verma", "Patel", "Reddy", "Iyer", "Nair", "Gupta", "Joshi",
+    "Kulkarni", "Deshmukh", "Mehta", "Chopra", "Rao", "Das", "Singh", "Godse",
+]  # fmt: skip
+
+# Category -> (nouns, price range in rupees).
+CATALOG = {
+    "Electronics": (
+        ["Phone", "Laptop", "Tablet", "Speaker", "Camera", "Charger", "Watch",
+         "Headphones", "Monitor", "Keyboard", "Mouse", "Router"],
+        (299, 150_000),
+    ),
+    "Fruits": (
+        ["Apple", "Banana", "Mango", "Orange", "Grapes", "Papaya", "Guava",
+         "Pineapple", "Pomegranate", "Kiwi"],
+        (20, 800),
+    ),
+    "Vegetables": (
+        ["Tomato", "Onion", "Potato", "Carrot", "Spinach", "Cabbage", "Okra",
+         "Cauliflower", "Capsicum", "Beans"],
+        (10, 300),
+    ),
+    "Dairy": (
+        ["Milk", "Cheese", "Butter", "Yogurt", "Paneer", "Ghee", "Cream"],
+        (25, 900),
+    ),
+    "Bakery": (["Bread", "Cake", "Cookies", "Muffin", "Croissant", "Bun", "Rusk"], (20, 1_200)),
+    "Clothing": (
+        ["Shirt", "T-Shirt", "Jeans", "Kurta", "Jacket", "Saree", "Shoes",
+         "Socks", "Sweater", "Shorts"],
+        (199, 9_999),
+    ),
+    "Home & Kitchen": (
+        ["Mug", "Pan", "Knife", "Lamp", "Chair", "Table", "Bottle", "Pressure Cooker",
+         "Cushion", "Bedsheet"],
+        (99, 25_000),
+    ),
+    "Sports": (["Ball", "Racket", "Bat", "Yoga Mat", "Dumbbell", "Helmet", "Gloves"], (149, 20_000)),
+    "Toys": (["Puzzle", "Doll", "Car", "Blocks", "Kite", "Board Game", "Robot"], (99, 7_999)),
+    "Books": (["Novel", "Guide", "Cookbook", "Atlas", "Biography", "Comic", "Workbook"], (99, 2_499)),
+}  # fmt: skip
+ADJECTIVES = [
+    "Classic", "Smart", "Organic", "Fresh", "Wireless", "Premium", "Compact",
+    "Deluxe", "Eco", "Pro", "Mini", "Max", "Ultra", "Handmade", "Everyday",
+]  # fmt: skip
+BRANDS = ["Acme", "Zenith", "Nova", "Orbit", "Lotus", "Indigo", "Summit", "Kite"]
+
+ORDER_STATUS_WEIGHTS = {
+    OrderStatus.DELIVERED: 55,
+    OrderStatus.SHIPPED: 10,
+    OrderStatus.PROCESSING: 6,
+    OrderStatus.PENDING: 8,
+    OrderStatus.CANCELLED: 12,
+    OrderStatus.RETURN_REQUESTED: 3,
+    OrderStatus.RETURNED: 6,
+}
+# (user message, agent reply) pairs; {product} is a random product name.
+CHAT_EXCHANGES = [
+    ("Tell me about the {product}", "Here's the information for {product}."),
+    ("Is the {product} in stock?", "Yes, {product} is in stock."),
+    (
+        "Add {quantity} {product} to my cart",
+        "Added {quantity} x {product} to your cart.",
+    ),
+    ("Show my cart", "Here's what's in your cart."),
+    ("What are my orders?", "Here are your most recent orders."),
+    ("Remove the {product} from my cart", "Removed {product} from your cart."),
+    ("Checkout please", "Checkout successful! Your order has been created."),
+    ("How much does the {product} cost?", "{product} costs Rs. {price}."),
+]
+
+
+def _password_hash(rng) -> str:
+    """A werkzeug-compatible PBKDF2 hash of PASSWORD with a seeded salt."""
+    salt = "".join(
+        rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(16)
+    )
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", PASSWORD.encode(), salt.encode(), PASSWORD_ITERATIONS
+    ).hex()
+    return f"pbkdf2:sha256:{PASSWORD_ITERATIONS}${salt}${digest}"
+
+
+def _random_time(rng, start, end):
+    return start + timedelta(seconds=rng.uniform(0, (end - start).total_seconds()))
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class WarehouseGenerator:
+    """Produces the rows of each table from one seeded random generator."""
+
+    def __init__(
+        self, seed, users, products, orders, order_items, cart_items, chat_messages
+    ):
+        self.rng = random.Random(seed)
+        self.counts = {
+            "users": users,
+            "products": products,
+            "orders": orders,
+            "order_items": order_items,
+            "cart_items": cart_items,
+            "chat_messages": chat_messages,
+        }
+        self.user_created_at = []
+        self.product_names = []
+        self.product_prices = []
+        # Stock left after the carts' reservations, and {product id: reserved}.
+        self.product_stock = []
+        self.cart_reserved = {}
+        self.load_time = datetime.now()
+
+    def users(self):
+        start = END_TIME - timedelta(days=HISTORY_DAYS)
+        password_hash = _password_hash(self.rng)
+        for i in range(1, self.counts["users"] + 1):
+            created_at = _random_time(self.rng, start, END_TIME - timedelta(days=7))
+            self.user_created_at.append(created_at)
+            yield {
+                "id": i,
+                "email": f"user{i}@example.com",
+                "name": f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                "password_hash": password_hash,
+                "created_at": created_at,
+            }
+
+    def products(self):
+        categories = list(CATALOG)
+        for i in range(1, self.counts["products"] + 1):
+            category = self.rng.choice(categories)
+            nouns, (low, high) = CATALOG[category]
+            noun = self.rng.choice(nouns)
+            adjective = self.rng.choice(ADJECTIVES)
+            # Log-uniform prices: many cheap products, a few expensive ones.
+            price = round(low * (high / low) ** self.rng.random(), 2)
+            name = f"{self.rng.choice(BRANDS)} {adjective} {noun} {i}"
+            stock = 0 if self.rng.random() < 0.05 else self.rng.randint(1, 500)
+            self.product_names.append(name)
+            self.product_prices.append(price)
+            self.product_stock.append(stock)
+            yield {
+                "id": i,
+                "name": name,
+                "description": f"{adjective} {noun.lower()} from our {category.lower()} range.",
+                "price": price,
+                "quantity_in_stock": stock,
+                "rating": round(min(5.0, max(0.0, self.rng.gauss(3.8, 0.8))), 1),
+                "category": category,
+            }
+
+    def _random_product(self):
+        product_id = self.rng.randint(1, self.counts["products"])
+        return product_id, self.product_prices[product_id - 1]
+
+    def orders_and_items(self):
+        """Yields ("order", row) and ("item", row) pairs, each order before its items."""
+        orders, items = self.counts["orders"], self.counts["order_items"]
+        if not orders or not self.counts["users"] or not self.counts["products"]:
+            return
+        # Every order has at least one item, so there are at least as many items
+        # as orders. The rest are spread at random around the average still left
+        # per order, and the last order takes what remains, so the total is exact.
+        items_left = max(items, orders)
+        statuses = list(ORDER_STATUS_WEIGHTS)
+        weights = list(ORDER_STATUS_WEIGHTS.values())
+        item_id = 0
+        for order_id in range(1, orders + 1):
+            # Skewed towards low ids: some customers order far more than others.
+            user_id = 1 + int(self.counts["users"] * self.rng.random() ** 2)
+            created_at = _random_time(
+                self.rng, self.user_created_at[user_id - 1], END_TIME
+            )
+            status = self.rng.choices(statuses, weights)[0]
+            orders_left = orders - order_id + 1
+            extra_per_order = items_left / orders_left - 1
+            item_count = 1 + int(self.rng.uniform(0, 2 * extra_per_order) + 0.5)
+            if orders_left == 1:
+                item_count = items_left
+            else:
+                # Leave at least one item for each later order.
+                item_count = min(item_count, items_left - (orders_left - 1))
+            items_left -= item_count
+            order_items = []
+            total = 0.0
+            for _ in range(item_count):
+                item_id += 1
+                product_id, price = self._random_product()
+                quantity = self.rng.choice((1, 1, 1, 2, 2, 3, 5))
+                total += quantity * price
+                order_items.append(
+                    {
+                        "id": item_id,
+                        "order_id": order_id,
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "price_per_unit": price,
+                    }
+                )
+            yield "order", {
+                "id": order_id,
+                "user_id": user_id,
+                "status": status.name,
+                "created_at": created_at,
+                "updated_at": created_at + timedelta(hours=self.rng.randint(0, 240)),
+                "total_amount": round(total, 2),
+            }
+            for item in order_items:
+                yield "item", item
+
+    def cart_items(self):
+        remaining = self.counts["cart_items"]
+        if not remaining or not self.counts["users"]:
+            return
+        products = self.counts["products"]
+        # Carts hold 1-7 items (4 on average); a third more carts than needed
+        # on average, so the loop stops at the requested count.
+        cart_count = min(self.counts["users"], max(1, remaining // 3))
+        item_id = 0
+        for user_id in sorted(
+            self.rng.sample(range(1, self.counts["users"] + 1), cart_count)
+        ):
+            size = min(remaining, self.rng.randint(1, 7), products)
+            for product_id in self.rng.sample(range(1, products + 1), size):
+                # A cart item holds stock reserved from its product, as
+                # add_to_cart does; products out of stock are left out.
+                stock = self.product_stock[product_id - 1]
+                if not stock:
+                    continue
+                quantity = min(self.rng.randint(1, 4), stock)
+                self.product_stock[product_id - 1] = stock - quantity
+                self.cart_reserved[product_id] = (
+                    self.cart_reserved.get(product_id, 0) + quantity
+                )
+                item_id += 1
+                remaining -= 1
+                yield {
+                    "id": item_id,
+                    "user_id": user_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "added_at": _random_time(
+                        self.rng,
+                        self.load_time - timedelta(hours=CART_MAX_AGE_HOURS),
+                        self.load_time,
+                    ),
+                }
+            if not remaining:
+                break
+
+    def chat_messages(self):
+        remaining = self.counts["chat_messages"]
+        if not remaining or not self.counts["users"] or not self.counts["products"]:
+            return
+        message_id = 0
+        while remaining:
+            user_id = self.rng.randint(1, self.counts["users"])
+            timestamp = _random_time(
+                self.rng, self.user_created_at[user_id - 1], END_TIME
+            )
+            for _ in range(self.rng.randint(1, 10)):
+                product_id, price = self._random_product()
+                values = {
+                    "product": self.product_names[product_id - 1],
+                    "price": price,
+                    "quantity": self.rng.randint(1, 5),
+                }
+                for sender, template in zip(
+                    (MessageSender.USER, MessageSender.AGENT),
+                    self.rng.choice(CHAT_EXCHANGES),
+                ):
+                    message_id += 1
+                    timestamp += timedelta(seconds=self.rng.randint(2, 90))
+                    yield {
+                        "id": message_id,
+                        "user_id": user_id,
+                        "timestamp": timestamp,
+                        "sender": sender.name,
+                        "message_text": template.format(**values),
+                    }
+                    remaining -= 1
+                    if not remaining:
+                        return
+
+
+def _prepare_for_load(conn):
+    # The load is rebuilt from scratch on failure, so skip fsyncs.
+    conn.exec_driver_sql("PRAGMA synchronous = OFF")
+    conn.exec_driver_sql("PRAGMA cache_size = -262144")
+    conn.exec_driver_sql("PRAGMA temp_store = MEMORY")
+    conn.commit()
+
+
+def _drop_secondary_indexes(conn, metadata):
+    """Drops every index declared on the tables of `metadata` and returns them."""
+    indexes = [index for table in metadata.sorted_tables for index in table.indexes]
+    with conn.begin():
+        for index in indexes:
+            index.drop(conn)
+    return indexes
+
+
+def _create_indexes(conn, indexes):
+    with conn.begin():
+        for index in indexes:
+            index.create(conn)
+
+
+def _load_table(conn, table, rows, batch_size):
+    start = time.perf_counter()
+    count = 0
+    with conn.begin():
+        for batch in _batches(rows, batch_size):
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {table.name:14} {count:>11,} rows in {elapsed:7.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)"
+    )
+    return count
+
+
+def _reserve_cart_stock(conn, generator):
+    """Takes the loaded cart quantities out of their products' stock."""
+    products = Product.__table__
+    reserved = [
+        {"reserved_product_id": product_id, "reserved_quantity": quantity}
+        for product_id, quantity in generator.cart_reserved.items()
+    ]
+    if not reserved:
+        return
+    with conn.begin():
+        conn.execute(
+            update(products)
+            .where(products.c.id == bindparam("reserved_product_id"))
+            .values(
+                quantity_in_stock=products.c.quantity_in_stock
+                - bindparam("reserved_quantity")
+            ),
+            reserved,
+        )
+
+
+def _load_orders(conn, generator, batch_size):
+    start = time.perf_counter()
+    orders, items = [], []
+    order_count = item_count = 0
+    with conn.begin():
+        for kind, row in generator.orders_and_items():
+            if kind == "order":
+                orders.append(row)
+            else:
+                items.append(row)
+            if len(items) >= batch_size:
+                conn.execute(Order.__table__.insert(), orders)
+                conn.execute(OrderItem.__table__.insert(), items)
+                order_count += len(orders)
+                item_count += len(items)
+                orders, items = [], []
+        if orders:
+            conn.execute(Order.__table__.insert(), orders)
+            order_count += len(orders)
+        if items:
+            conn.execute(OrderItem.__table__.insert(), items)
+            item_count += len(items)
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {'orders':14} {order_count:>11,} rows, order_items {item_count:,} rows "
+        f"in {elapsed:7.1f}s ({(order_count + item_count) / max(elapsed, 1e-9):,.0f} rows/s)"
+    )
+
+
+def populate(counts, seed, batch_size):
+    app = create_app()
+    with app.app_context():
+        print(
+            f"Populating {app.config['SQLALCHEMY_DATABASE_URI']} and "
+            f"{app.config['SQLALCHEMY_BINDS'][CHAT_BIND_KEY]} (seed {seed})..."
+        )
+        db.drop_all()
+        db.create_all()
+        generator = WarehouseGenerator(seed, **counts)
+
+        started = time.perf_counter()
+        chat_engine = db.engines[CHAT_BIND_KEY]
+        with db.engine.connect() as conn, chat_engine.connect() as chat_conn:
+            _prepare_for_load(conn)
+            _prepare_for_load(chat_conn)
+            indexes = _drop_secondary_indexes(conn, db.metadata)
+            chat_indexes = _drop_secondary_indexes(
+                chat_conn, db.metadatas[CHAT_BIND_KEY]
+            )
+            with conn.begin():
+                for suffix in ("ai", "ad", "au"):
+                    conn.execute(
+                        text(
+                            "DROP TRIGGER IF EXISTS "
+                            f"{search_service.FTS_TABLE_NAME}_{suffix}"
+                        )
+                    )
+
+            _load_table(conn, User.__table__, generator.users(), batch_size)
+            _load_table(conn, Product.__table__, generator.products(), batch_size)
+            _load_orders(conn, generator, batch_size)
+            _load_table(conn, CartItem.__table__, generator.cart_items(), batch_size)
+            _reserve_cart_stock(conn, generator)
+            _load_table(
+                chat_conn, ChatMessage.__table__, generator.chat_messages(), batch_size
+            )
+
+            index_start = time.perf_counter()
+            _create_indexes(conn, indexes)
+            _create_indexes(chat_conn, chat_indexes)
+            print(
+                f"  built {len(indexes) + len(chat_indexes)} indexes in "
+                f"{time.perf_counter() - index_start:.1f}s"
+            )
+
+        search_start = time.perf_counter()
+        search_service.ensure_search_index()
+        print(
+            f"  built the product search index in {time.perf_counter() - search_start:.1f}s"
+        )
+        stats_start = time.perf_counter()
+        user_stats_service.backfill_all()
+        print(
+            f"  built the per-user counters in {time.perf_counter() - stats_start:.1f}s"
+        )
+        for engine in (db.engine, chat_engine):
+            with engine.connect() as conn:
+                conn.exec_driver_sql("ANALYZE")
+        print(f"Done in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name)
+    args = parser.parse_args()
+    counts = {
+        name: getattr(args, name) if getattr(args, name) is not None else default
+        for name, default in SCALES[args.scale].items()
+    }
+    populate(counts, args.seed, args.batch_size)